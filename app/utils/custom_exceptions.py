@@ -12,3 +12,15 @@ class CanNotGetCurrenciesFromService(Exception):
 
 class CanNotFindNewBaseCurrency(Exception):
     pass
+
+
+class DataBaseIsNotReachable(Exception):
+    pass
+
+
+class ConfigFieldHasIncorrectValue(Exception):
+    pass
+
+
+class LatestRatesCacheIsNotAvailable(Exception):
+    pass
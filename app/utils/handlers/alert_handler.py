@@ -0,0 +1,122 @@
+import logging
+import operator
+from app.utils.rate_records import RateHistory
+from app.utils.custom_exceptions import ConfigFieldHasIncorrectValue
+
+
+class AlertHandler:
+    """
+    Evaluates alert rules on every new extraction. Rules types:
+        - "threshold" - sale or purchase rate is compared with value, e.g. USD sale > 30
+        - "change" - mid rate moved more than "percent" within "window_sec", e.g. EUR moved > 1% in 1h
+        - "divergence" - the latest mid rates of different resources diverge more than "percent"
+    History of mid rates is kept in array-backed ring buffer per resource and currency, so DB is never queried.
+    Rates of resources older than "max_rate_age_sec" are not compared by "divergence" rules, since resource
+    could be disabled or failing for a long time.
+    Alert is raised only once, when rule becomes triggered, and is raised again after rule was released.
+    """
+    OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+    FIELDS = {'sale': 0, 'purchase': 1}
+    RULE_TYPES = ('threshold', 'change', 'divergence')
+
+    def __init__(self, rules: list = None, window_size: int = 1000, max_rate_age_sec: int = 86400):
+        self.window_size = window_size
+        self.max_rate_age_sec = max_rate_age_sec
+        self.rules_by_currency = {}
+        self.max_window_by_currency = {}
+        for rule_index, rule in enumerate(rules or []):
+            self._validate_rule(rule)
+            rule = dict(rule, index=rule_index)
+            self.rules_by_currency.setdefault(rule['currency'], []).append(rule)
+            if rule['type'] == 'change':
+                self.max_window_by_currency[rule['currency']] = max(
+                    self.max_window_by_currency.get(rule['currency'], 0), rule['window_sec']
+                )
+        # (resource name, currency) -> ring buffer of (timestamp, mid rate)
+        self.history = {}
+        # currency -> {resource name: (timestamp, the latest mid rate)}
+        self.latest_rates = {}
+        # (rule index, resource name) of currently triggered rules
+        self.triggered = set()
+
+    def _validate_rule(self, rule: dict) -> None:
+        try:
+            if rule['type'] not in self.RULE_TYPES:
+                raise KeyError('type')
+            rule['currency']
+            if rule['type'] == 'threshold':
+                self.FIELDS[rule['field']]
+                self.OPERATORS[rule['op']]
+                float(rule['value'])
+            else:
+                float(rule['percent'])
+            if rule['type'] == 'change':
+                float(rule['window_sec'])
+        except (KeyError, TypeError, ValueError) as e:
+            logging.error(f'Alert rule {rule} has incorrect field "{e}"')
+            raise ConfigFieldHasIncorrectValue
+
+    def _check_threshold(self, rule: dict, resource_name: str, rates: tuple, history: RateHistory):
+        rate = rates[self.FIELDS[rule['field']]]
+        if self.OPERATORS[rule['op']](rate, rule['value']):
+            return f'{rule["currency"]} {rule["field"]} {rate} {rule["op"]} {rule["value"]} ({resource_name})'
+
+    def _check_change(self, rule: dict, resource_name: str, rates: tuple, history: RateHistory):
+        current_ts, current_rate = history[-1]
+        for ts, rate in history:
+            if ts >= current_ts - rule['window_sec']:
+                break
+        if rate and abs(current_rate - rate) / rate * 100 > rule['percent']:
+            return (
+                f'{rule["currency"]} moved from {rate} to {current_rate} within {rule["window_sec"]} sec '
+                f'({resource_name})'
+            )
+
+    def _check_divergence(self, rule: dict, resource_name: str, rates: tuple, history: RateHistory):
+        latest_rates = {name: rate for name, (ts, rate) in self.latest_rates[rule['currency']].items()}
+        min_rate, max_rate = min(latest_rates.values()), max(latest_rates.values())
+        if min_rate and (max_rate - min_rate) / min_rate * 100 > rule['percent']:
+            return f'{rule["currency"]} rates of resources diverge: {latest_rates}'
+
+    def evaluate(self, resource_name: str, currencies: dict, ts: float) -> list:
+        """
+        Updating rates history by new extraction and evaluating rules of extracted currencies
+
+        :param resource_name: name of the resource
+        :param currencies: extracted currencies of interest
+        :param ts: unix timestamp of extraction
+        :return: list of alerts messages
+        """
+        alerts = []
+        for currency, (sale, purchase) in currencies.items():
+            if sale is None or purchase is None:
+                continue
+
+            mid_rate = (sale + purchase) / 2
+            history = self.history.get((resource_name, currency))
+            if history is None:
+                history = self.history[(resource_name, currency)] = RateHistory(maxlen=self.window_size)
+            if not history or history[-1][0] < ts:
+                history.append((ts, mid_rate))
+            # dropping rates, which are out of the longest window
+            max_window = self.max_window_by_currency.get(currency, 0)
+            while len(history) > 1 and history[0][0] < ts - max_window:
+                history.popleft()
+            latest_rates = self.latest_rates.setdefault(currency, {})
+            latest_rates[resource_name] = (ts, mid_rate)
+            # dropping rates of resources, which were not updated for too long
+            for name in [name for name, (rate_ts, _) in latest_rates.items() if rate_ts < ts - self.max_rate_age_sec]:
+                del latest_rates[name]
+
+            for rule in self.rules_by_currency.get(currency, ()):
+                message = getattr(self, f'_check_{rule["type"]}')(rule, resource_name, (sale, purchase), history)
+                rule_key = (rule['index'], None if rule['type'] == 'divergence' else resource_name)
+                if message is None:
+                    self.triggered.discard(rule_key)
+                elif rule_key not in self.triggered:
+                    self.triggered.add(rule_key)
+                    alerts.append(message)
+
+        if alerts:
+            logging.warning(f'Alerts of resource "{resource_name}": {alerts}')
+        return alerts
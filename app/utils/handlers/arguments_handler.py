@@ -14,4 +14,13 @@ class ArgumentsParser:
         parser.add_argument(
             '--config_path', type=str, help='Path to config file', default='',
         )
+        parser.add_argument(
+            '--rebuild_rollups', action='store_true', help='Rebuild hourly and daily rollups from all records and exit',
+        )
+        parser.add_argument(
+            '--reprocess', action='store_true', help='Re-extract currencies from archived raw responses and exit',
+        )
+        parser.add_argument(
+            '--repair_gaps', action='store_true', help='Re-fetch rates missing in history of resources and exit',
+        )
         return parser
@@ -0,0 +1,187 @@
+import json
+import queue
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class Subscription:
+    """
+    Queue of rates updates of one subscriber. Updates are filtered by currencies and resources of interest
+    (all of them if filter is not set). If subscriber is too slow, the oldest updates are dropped
+    """
+    def __init__(self, currencies: list = None, resources: list = None, max_queue_size: int = 1000):
+        self.currencies = set(currencies) if currencies else None
+        self.resources = set(resources) if resources else None
+        self._queue = queue.Queue(maxsize=max_queue_size)
+
+    def filter_update(self, update: dict):
+        """
+        Getting part of update, which subscriber is interested in
+
+        :param update: rates update
+        :return: filtered update or None if there is nothing of interest
+        """
+        if self.resources is not None and update['resource_name'] not in self.resources:
+            return None
+        if self.currencies is None:
+            return update
+        currencies = {
+            currency: rates for currency, rates in update['currencies'].items() if currency in self.currencies
+        }
+        return dict(update, currencies=currencies) if currencies else None
+
+    def put(self, update: dict) -> None:
+        while True:
+            try:
+                self._queue.put_nowait(update)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float = None):
+        """
+        Getting the next rates update
+
+        :param timeout: max time to wait for update in seconds, waits forever if it is None
+        :return: rates update or None if there was no update within timeout
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class _EventsRequestHandler(BaseHTTPRequestHandler):
+    broadcast_handler = None
+
+    def log_message(self, format, *args) -> None:
+        logging.info(f'Broadcast server: {format % args}')
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != '/events':
+            self.send_error(404)
+            return
+        query = parse_qs(url.query)
+        subscription = self.broadcast_handler.subscribe(
+            currencies=[currency for value in query.get('currency', []) for currency in value.split(',')],
+            resources=[resource for value in query.get('resource', []) for resource in value.split(',')],
+        )
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(b': subscribed\n\n')
+            self.wfile.flush()
+            while not self.broadcast_handler.is_stopped.is_set():
+                update = subscription.get(timeout=self.broadcast_handler.keepalive_sec)
+                if update is None:
+                    # comment line keeps connection alive through proxies
+                    self.wfile.write(b': keepalive\n\n')
+                else:
+                    self.wfile.write(f'event: rates\ndata: {json.dumps(update)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.broadcast_handler.unsubscribe(subscription)
+
+
+class BroadcastHandler:
+    """
+    Pushes fresh rates to subscribers right after they were extracted, so consumers do not need to poll DB.
+    Only changed rates are pushed, subscribers are served in process ("subscribe")
+    or by Server-Sent Events endpoint "GET /events?currency=USD,EUR&resource=PrivatBank" ("start_server").
+    """
+    def __init__(self, max_queue_size: int = 1000, keepalive_sec: float = 15.0):
+        self.max_queue_size = max_queue_size
+        self.keepalive_sec = keepalive_sec
+        self.is_stopped = threading.Event()
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        # (resource name, currency) -> the latest published rates
+        self._last_rates = {}
+        self._server = None
+
+    def subscribe(self, currencies: list = None, resources: list = None) -> Subscription:
+        subscription = Subscription(currencies, resources, self.max_queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def restore_last_rates(self, resource_name: str, currencies: dict) -> None:
+        """
+        Restoring the last published rates of resource, e.g. from checkpoint after restart,
+        so unchanged rates are not pushed again
+
+        :param resource_name: name of the resource
+        :param currencies: the last published currencies
+        :return: None
+        """
+        for currency, rates in currencies.items():
+            self._last_rates[(resource_name, currency)] = tuple(rates)
+
+    def publish(self, resource_name: str, currencies: dict, provider_ts: int) -> int:
+        """
+        Pushing changed rates of resource to subscribers, which are interested in them
+
+        :param resource_name: name of the resource
+        :param currencies: extracted currencies
+        :param provider_ts: unix timestamp of rates update reported by resource
+        :return: quantity of subscribers, which got update
+        """
+        changed_currencies = {}
+        for currency, rates in currencies.items():
+            if self._last_rates.get((resource_name, currency)) != rates:
+                self._last_rates[(resource_name, currency)] = rates
+                changed_currencies[currency] = rates
+        if not changed_currencies:
+            return 0
+
+        update = {'resource_name': resource_name, 'provider_ts': provider_ts, 'currencies': changed_currencies}
+        delivered_quantity = 0
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription_update = subscription.filter_update(update)
+            if subscription_update is not None:
+                subscription.put(subscription_update)
+                delivered_quantity += 1
+        logging.info(
+            f'Changed rates of "{resource_name}" ({len(changed_currencies)} currencies) '
+            f'were pushed to {delivered_quantity} subscribers'
+        )
+        return delivered_quantity
+
+    def start_server(self, host: str = '127.0.0.1', port: int = 8090) -> int:
+        """
+        Starting Server-Sent Events endpoint in background thread
+
+        :param host: host to listen
+        :param port: port to listen, 0 means any free port
+        :return: port which server listens
+        """
+        request_handler = type('EventsRequestHandler', (_EventsRequestHandler,), {'broadcast_handler': self})
+        self._server = ThreadingHTTPServer((host, port), request_handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='BroadcastServer', daemon=True).start()
+        port = self._server.server_address[1]
+        logging.info(f'Rates updates are available on http://{host}:{port}/events')
+        return port
+
+    def stop_server(self) -> None:
+        self.is_stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
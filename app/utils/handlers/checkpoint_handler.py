@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import logging
+
+
+class CheckpointHandler:
+    """
+    Keeps warm state of container run in "path" file, so restarted container resumes right away:
+        - the latest rates of resources, they warm up validation, broadcast and latest rates cache
+        - validators (ETag, Last-Modified) and bodies of the last responses for conditional requests
+        - polling schedule and planned time of the next run, resources are not re-fetched before it
+        - resources skipped by shutdown request, they are processed right after restart
+    File is replaced atomically after every run, so it is never partially written, even if process is killed.
+    """
+    def __init__(self, path: str = 'checkpoint.json'):
+        self.path = path
+        self.state = self._load()
+        # planned time of the next run before restart, it is used by the first run only
+        self.resume_ts = self.state.get('next_run_ts', 0)
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as checkpoint_file:
+                state = json.load(checkpoint_file)
+        except ValueError as e:
+            logging.error(f'Can not parse checkpoint "{self.path}". The run will be started cold!\nError: {e}')
+            return {}
+        logging.info(f'Checkpoint "{self.path}" was loaded')
+        return state
+
+    def save(self) -> None:
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump(self.state, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temp_path, self.path)
+
+    def update(self, **state) -> None:
+        """
+        Updating parts of the state and saving checkpoint
+
+        :param state: parts of the state, e.g. validators, polling_schedule
+        :return: None
+        """
+        self.state.update(state)
+        self.save()
+
+    def observe(self, resource_name: str, currencies, provider_ts: int) -> None:
+        """
+        Keeping the latest rates of resource, they are saved with the next checkpoint
+
+        :param resource_name: name of the resource
+        :param currencies: extracted currencies
+        :param provider_ts: unix timestamp of rates update reported by resource
+        :return: None
+        """
+        self.state.setdefault('latest_rates', {})[resource_name] = {
+            'provider_ts': provider_ts,
+            'currencies': {currency: list(rates) for currency, rates in currencies.items()},
+        }
+
+    def get_latest_rates(self) -> dict:
+        """
+        Getting the latest rates of resources from checkpoint
+
+        :return: resource name -> (currencies, provider timestamp)
+        """
+        return {
+            resource_name: (
+                {currency: tuple(rates) for currency, rates in record['currencies'].items()}, record['provider_ts']
+            )
+            for resource_name, record in self.state.get('latest_rates', {}).items()
+        }
+
+    def get_resume_delay(self, now: float = None) -> float:
+        """
+        Getting time until the run, which was planned before restart
+
+        :param now: current unix timestamp
+        :return: time in seconds, 0 if the run is due
+        """
+        now = time.time() if now is None else now
+        return max(self.resume_ts - now, 0)
+
+    def get_pending_resources(self) -> tuple:
+        """
+        Getting resources, which were skipped by shutdown request of the run before restart
+
+        :return: names of resources
+        """
+        return tuple(self.state.get('pending_resources', ()))
+
+    def plan_next_run(self, delay: float, now: float = None) -> float:
+        """
+        Saving planned time of the next run. If the run after restart was skipped, the next run is the one,
+        which was planned before restart. If the run was cut by shutdown request, the next run is due right away
+
+        :param delay: time until the next run in seconds
+        :param now: current unix timestamp
+        :return: time until the next run in seconds
+        """
+        now = time.time() if now is None else now
+        resume_delay = self.get_resume_delay(now)
+        if self.get_pending_resources():
+            delay = 0
+        elif resume_delay:
+            delay = resume_delay
+        self.resume_ts = 0
+        self.update(next_run_ts=now + delay)
+        return delay
@@ -1,4 +1,3 @@
-import yaml
 import logging
 
 from app.utils.custom_exceptions import ConfigFileDoesNotFound, ConfigMandatoryFieldDoesNotFound
@@ -13,6 +12,9 @@ class ConfigHandler:
         :param path: path to config file
         :return: pythonic dict object with configs from file
         """
+        # YAML parser is imported once config is read, so it is not paid by imports of the app
+        import yaml
+
         try:
             with open(path, 'r') as file:
                 configs = yaml.load(file, Loader=yaml.FullLoader)
@@ -40,10 +42,29 @@ class ConfigHandler:
             logging.error(f'Mandatory filed "{e}" was not specified in config file!')
             raise ConfigMandatoryFieldDoesNotFound
 
+    def get_main_currencies(self) -> tuple:
+        try:
+            return tuple(dict.fromkeys(self.service_configs['main_currencies'].split()))
+        except KeyError as e:
+            logging.error(f'Mandatory filed "{e}" was not specified in config file!')
+            raise ConfigMandatoryFieldDoesNotFound
+
     def get_currencies_of_interest(self) -> tuple:
+        """
+        Getting currencies, which are extracted from resources: main currencies and currencies of all profiles.
+        Main records and notifications contain only main currencies (see "get_main_currencies")
+
+        :return: codes of currencies
+        """
         try:
             main_currencies = self.service_configs['main_currencies'].split()  # list for currencies
             main_currencies = set(main_currencies)  # left only unique currencies
+            # currencies of all profiles are extracted by the same requests, profiles views are derived from them,
+            # UAH is not extracted, since extracted rates are prices in UAH
+            for profile in (self.service_configs.get('profiles') or {}).values():
+                main_currencies.update(currency for currency in profile['main_currencies'].split() if currency != 'UAH')
+                if profile.get('base_currency', 'UAH') != 'UAH':
+                    main_currencies.add(profile['base_currency'])
             return tuple(main_currencies)
         except KeyError as e:
             logging.error(f'Mandatory filed "{e}" was not specified in config file!')
@@ -78,3 +99,122 @@ class ConfigHandler:
         except KeyError as e:
             logging.error(f'Mandatory filed "{e}" was not specified in config file!')
             raise ConfigMandatoryFieldDoesNotFound
+
+    def get_spool_config(self) -> dict:
+        try:
+            return self.service_configs['spool']
+        except KeyError:
+            logging.warning('Can not find spool config! Default spool config will be used')
+            return {}
+
+    def get_work_distribution_config(self) -> dict:
+        try:
+            return self.service_configs['work_distribution']
+        except KeyError:
+            logging.warning('Can not find work distribution config! All resources will be processed by this worker')
+            return {}
+
+    def get_consensus_config(self) -> dict:
+        try:
+            return self.service_configs['consensus']
+        except KeyError:
+            logging.warning('Can not find consensus config! Default consensus config will be used')
+            return {}
+
+    def get_alerts_config(self) -> dict:
+        try:
+            return self.service_configs['alerts']
+        except KeyError:
+            logging.warning('Can not find alerts config! Alerts won\'t be evaluated')
+            return {}
+
+    def get_statistics_config(self) -> dict:
+        try:
+            return self.service_configs['statistics']
+        except KeyError:
+            logging.warning('Can not find statistics config! Default statistics config will be used')
+            return {}
+
+    def get_raw_archive_config(self) -> dict:
+        try:
+            return self.service_configs['raw_archive']
+        except KeyError:
+            logging.warning('Can not find raw archive config! Raw responses won\'t be archived')
+            return {}
+
+    def get_profiles_config(self) -> dict:
+        try:
+            return self.service_configs['profiles']
+        except KeyError:
+            logging.warning('Can not find profiles config! Only main currencies will be extracted')
+            return {}
+
+    def get_validation_config(self) -> dict:
+        try:
+            return self.service_configs['validation']
+        except KeyError:
+            logging.warning('Can not find validation config! Extracted rates will not be validated')
+            return {}
+
+    def get_rates_precision_config(self) -> dict:
+        try:
+            return self.service_configs['rates_precision']
+        except KeyError:
+            logging.warning('Can not find rates precision config! Rates will be shown with 2 decimal places')
+            return {}
+
+    def get_gap_repair_config(self) -> dict:
+        try:
+            return self.service_configs['gap_repair']
+        except KeyError:
+            logging.warning('Can not find gap repair config! Gaps in history will not be repaired')
+            return {}
+
+    def get_latest_rates_cache_config(self) -> dict:
+        try:
+            return self.service_configs['latest_rates_cache']
+        except KeyError:
+            logging.warning('Can not find latest rates cache config! The latest rates will not be shared')
+            return {}
+
+    def get_checkpoint_config(self) -> dict:
+        try:
+            return self.service_configs['checkpoint']
+        except KeyError:
+            logging.warning('Can not find checkpoint config! Container run will be started cold after restart')
+            return {}
+
+    def get_conversion_config(self) -> dict:
+        try:
+            return self.service_configs['conversion']
+        except KeyError:
+            logging.warning('Can not find conversion config! Default conversion settings will be used')
+            return {}
+
+    def get_adaptive_polling_config(self) -> dict:
+        try:
+            return self.service_configs['adaptive_polling']
+        except KeyError:
+            logging.warning('Can not find adaptive polling config! All resources will be polled every run')
+            return {}
+
+    def get_broadcast_config(self) -> dict:
+        try:
+            return self.service_configs['broadcast']
+        except KeyError:
+            logging.warning('Can not find broadcast config! Rates won\'t be pushed to subscribers')
+            return {}
+
+    def get_tracing_config(self) -> dict:
+        try:
+            return self.service_configs['tracing']
+        except KeyError:
+            logging.warning('Can not find tracing config! Spans won\'t be exported')
+            return {}
+
+    def get_recording_config(self) -> dict:
+        try:
+            return self.service_configs['recording']
+        except KeyError:
+            logging.warning('Can not find recording config! Responses won\'t be recorded')
+            return {}
@@ -0,0 +1,103 @@
+import time
+import logging
+import statistics
+
+
+class ConsensusHandler:
+    """
+    Reconciles rates of several resources into one consensus rate per currency.
+    Rates of source, which deviate from median more than "max_deviation", are rejected as outliers,
+    sources with rates update time older than "max_age_sec" are rejected as stale.
+    """
+    def __init__(self, max_deviation: float = 0.02, max_age_sec: int = 172800, weights: dict = None):
+        self.max_deviation = max_deviation
+        self.max_age_sec = max_age_sec
+        self.weights = weights or {}
+        self.sources = []
+
+    def add_source(self, resource_name: str, currencies: dict, provider_ts: int) -> None:
+        """
+        Adding extracted currencies of resource to consensus
+
+        :param resource_name: name of the resource
+        :param currencies: extracted currencies of interest
+        :param provider_ts: unix timestamp of rates update reported by resource
+        :return: None
+        """
+        self.sources.append((resource_name, currencies, provider_ts))
+
+    def add_latest_sources(self, resource_names: list, db_client) -> None:
+        """
+        Adding the latest stored rates of resources, which were not processed in this run
+        (they were not due by adaptive polling or they were processed by other workers),
+        so consensus is built from all sources. Stale ones are rejected in the same way as the others
+
+        :param resource_names: names of all resources
+        :param db_client: instance of MongoDBHandler
+        :return: None
+        """
+        added_resource_names = {source[0] for source in self.sources}
+        for resource_name in resource_names:
+            if resource_name in added_resource_names:
+                continue
+            record = db_client.get_rates_snapshot(resource_name)
+            if record is not None:
+                self.add_source(resource_name, record['currencies'], record['provider_ts'])
+
+    def get_consensus(self) -> dict:
+        """
+        Calculating consensus record: weighted mid rate of not rejected sources per currency
+
+        :return: consensus DB payload
+        """
+        now = time.time()
+        stale_sources = []
+        # currency -> list of (resource name, sale, purchase, mid rate)
+        rates_by_currency = {}
+        for resource_name, currencies, provider_ts in self.sources:
+            if now - provider_ts > self.max_age_sec:
+                stale_sources.append(resource_name)
+                continue
+            for currency, (sale, purchase) in currencies.items():
+                if sale is None or purchase is None:
+                    continue
+                mid_rate = (sale + purchase) / 2
+                rates_by_currency.setdefault(currency, []).append((resource_name, sale, purchase, mid_rate))
+
+        consensus_currencies = {}
+        for currency, rates in rates_by_currency.items():
+            median = statistics.median(rate[3] for rate in rates)
+            accepted_rates = []
+            outliers = []
+            for rate in rates:
+                if median and abs(rate[3] - median) / median > self.max_deviation:
+                    outliers.append(rate[0])
+                else:
+                    accepted_rates.append(rate)
+
+            if outliers:
+                logging.warning(f'Rates of {outliers} for "{currency}" deviate from median {median} and were rejected')
+            if not accepted_rates:
+                logging.warning(f'All sources of "{currency}" were rejected as outliers')
+                continue
+            total_weight = sum(self.weights.get(rate[0], 1) for rate in accepted_rates)
+            if not total_weight:
+                logging.warning(f'There are no sources with non-zero weight for "{currency}"')
+                continue
+            consensus_currencies[currency] = {
+                'rate': sum(rate[3] * self.weights.get(rate[0], 1) for rate in accepted_rates) / total_weight,
+                'sale': statistics.median(rate[1] for rate in accepted_rates),
+                'purchase': statistics.median(rate[2] for rate in accepted_rates),
+                'sources': [rate[0] for rate in accepted_rates],
+                'outliers': outliers,
+            }
+
+        if stale_sources:
+            logging.warning(f'Rates of {stale_sources} are older than {self.max_age_sec} sec and were rejected')
+
+        return {
+            'utc_time': now,
+            'utc_offset': time.timezone,
+            'stale_sources': stale_sources,
+            'currencies': consensus_currencies,
+        }
@@ -0,0 +1,181 @@
+import json
+import time
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from app.utils.custom_exceptions import (
+    DataBaseIsNotReachable, ConfigFieldHasIncorrectValue, LatestRatesCacheIsNotAvailable
+)
+
+# stored rates are prices of currencies in UAH, as CurrencyExtractionHandler.change_currency_base makes them
+BASE_CURRENCY = 'UAH'
+RATE_FIELDS = ('mid', 'sale', 'purchase')
+
+
+class _ConversionRequestHandler(BaseHTTPRequestHandler):
+    conversion_handler = None
+
+    def log_message(self, format, *args) -> None:
+        logging.info(f'Conversion server: {format % args}')
+
+    def _send_json(self, status_code: int, data: dict) -> None:
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        if self.path != '/convert':
+            self._send_json(404, {'error': 'Not Found'})
+            return
+        try:
+            request_data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            results = self.conversion_handler.convert_batch(request_data['conversions'])
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            self._send_json(400, {'error': f'Incorrect conversions: {e}'})
+        except DataBaseIsNotReachable:
+            self._send_json(503, {'error': 'DB is not reachable'})
+        else:
+            self._send_json(200, {'results': results})
+
+
+class ConversionHandler:
+    """
+    Converts batches of amounts between currencies by stored rates, at the latest or historical dates.
+    Conversions are grouped by date and resource, so every rates snapshot is read from DB once,
+    historical snapshots are kept in LRU cache of "cache_size" snapshots. Conversion factor is calculated once per
+    currencies pair of snapshot. Only found snapshots of past timestamps are cached, the latest snapshot and
+    snapshot of the current day are updated by every run and missing rates could be repaired later.
+    The latest rates are read from shared latest rates cache if it is provided, DB is used if resource is not in it
+    or cache is not available.
+    """
+    def __init__(
+            self, db_client, resource_name: str = 'PrivatBank', cache_size: int = 256, rate_field: str = 'mid',
+            latest_rates_cache=None
+    ):
+        if rate_field not in RATE_FIELDS:
+            logging.error(f'Rate field has to be one of {RATE_FIELDS}, got "{rate_field}"')
+            raise ConfigFieldHasIncorrectValue
+        self.db_client = db_client
+        self.resource_name = resource_name
+        self.cache_size = cache_size
+        self.rate_field = rate_field
+        # optional instance of LatestRatesCacheHandler opened for reading
+        self.latest_rates_cache = latest_rates_cache
+        # (resource name, unix timestamp) -> {currency: price in UAH}
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+        self._server = None
+
+    @staticmethod
+    def get_snapshot_ts(date):
+        """
+        Getting unix timestamp of rates snapshot for conversion date, rates of the whole day (UTC) are used for dates
+
+        :param date: None (the latest rates), unix timestamp, datetime, date or "YYYY-MM-DD" string
+        :return: unix timestamp or None for the latest rates
+        """
+        if date is None or isinstance(date, (int, float)):
+            return date
+        if isinstance(date, str):
+            date = datetime.date.fromisoformat(date)
+        if isinstance(date, datetime.datetime):
+            return date.timestamp()
+        day_end = datetime.datetime.combine(date, datetime.time.max, tzinfo=datetime.timezone.utc)
+        return int(day_end.timestamp())
+
+    def _get_price(self, rates):
+        sale, purchase = rates
+        if self.rate_field == 'sale':
+            return sale
+        if self.rate_field == 'purchase':
+            return purchase
+        return None if sale is None or purchase is None else (sale + purchase) / 2
+
+    def _get_snapshot(self, resource_name: str, ts) -> dict:
+        key = (resource_name, ts)
+        if ts is not None:
+            with self._lock:
+                if key in self._snapshots:
+                    self._snapshots.move_to_end(key)
+                    return self._snapshots[key]
+
+        record = None
+        if ts is None and self.latest_rates_cache is not None:
+            try:
+                record = self.latest_rates_cache.get_resource(resource_name)
+            except LatestRatesCacheIsNotAvailable:
+                logging.warning(f'The latest rates of "{resource_name}" will be read from DB')
+        if record is None:
+            record = self.db_client.get_rates_snapshot(resource_name, ts)
+        prices = {BASE_CURRENCY: 1.0}
+        if record is None:
+            logging.warning(f'There are no rates of "{resource_name}" for {ts}')
+        else:
+            for currency, rates in record['currencies'].items():
+                prices[currency] = self._get_price(rates)
+
+        if record is not None and ts is not None and ts < time.time():
+            with self._lock:
+                self._snapshots[key] = prices
+                if len(self._snapshots) > self.cache_size:
+                    self._snapshots.popitem(last=False)
+        return prices
+
+    def convert_batch(self, conversions: list) -> list:
+        """
+        Converting batch of amounts
+
+        :param conversions: list of (amount, from currency, to currency, date) or
+            (amount, from currency, to currency, date, resource name), date format is described in "get_snapshot_ts"
+        :return: list of converted amounts in the same order, None if rate of currency is unknown
+        """
+        # (resource name, unix timestamp) -> indexes of conversions
+        groups = {}
+        for index, conversion in enumerate(conversions):
+            resource_name = conversion[4] if len(conversion) > 4 else self.resource_name
+            groups.setdefault((resource_name, self.get_snapshot_ts(conversion[3])), []).append(index)
+
+        results = [None] * len(conversions)
+        for (resource_name, ts), indexes in groups.items():
+            prices = self._get_snapshot(resource_name, ts)
+            # currencies pair -> conversion factor
+            factors = {}
+            for index in indexes:
+                amount, from_currency, to_currency = conversions[index][:3]
+                pair = (from_currency, to_currency)
+                if pair not in factors:
+                    from_price, to_price = prices.get(from_currency), prices.get(to_currency)
+                    factors[pair] = from_price / to_price if from_price and to_price else None
+                if factors[pair] is not None:
+                    results[index] = amount * factors[pair]
+        logging.info(f'{len(conversions)} amounts were converted by {len(groups)} rates snapshots')
+        return results
+
+    def start_server(self, host: str = '127.0.0.1', port: int = 8091) -> int:
+        """
+        Starting conversion endpoint "POST /convert" in background thread.
+        Request body: {"conversions": [[amount, from, to, date], ...]}, response body: {"results": [...]}
+
+        :param host: host to listen
+        :param port: port to listen, 0 means any free port
+        :return: port which server listens
+        """
+        request_handler = type('ConversionRequestHandler', (_ConversionRequestHandler,), {'conversion_handler': self})
+        self._server = ThreadingHTTPServer((host, port), request_handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='ConversionServer', daemon=True).start()
+        port = self._server.server_address[1]
+        logging.info(f'Conversion endpoint is available on http://{host}:{port}/convert')
+        return port
+
+    def stop_server(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -1,32 +1,43 @@
 import os
 import json
+import time
 import logging
 import datetime
 from typing import Optional
 
+from app.utils.rate_records import RateTable
+from app.utils.rate_math import rebase_rates
+from app.utils.handlers import tracing_handler
 from app.utils.handlers.requests_handler import get_with_retry
 from app.utils.handlers.config_handler import ConfigHandler
 from app.utils.custom_exceptions import CanNotGetCurrenciesFromService, CanNotFindNewBaseCurrency
 
 
 class CurrencyExtractionHandler:
-    @staticmethod
-    def get_currency_from_resource(url: str, *args, **kwargs) -> Optional[dict]:
+    # optional instance of RawArchiveHandler to keep raw responses
+    raw_archive = None
+
+    @classmethod
+    def get_currency_from_resource(cls, url: str, *args, resource_name: str = None, **kwargs) -> Optional[dict]:
         """
         Executes GET request to specified URL to get currency exchange rate
 
         :param url: request URL
+        :param resource_name: name of the resource, raw response is archived by it
         :return: dict of JSON response from service
         """
         logging.info(f'Trying to get currencies from:\nURL: {url}')
         response = get_with_retry(url, *args, **kwargs)
         try:
-            response_data = response.json()
+            with tracing_handler.span('parse_response'):
+                response_data = response.json()
         except json.JSONDecodeError as e:
             logging.error(f'Error during response parsing.\nURL: {url}\nResponse: {response.text}\nError: {e}')
             raise CanNotGetCurrenciesFromService
         else:
             logging.info(f'Got response from {url}\nResponse: {response_data}')
+            if cls.raw_archive is not None and resource_name is not None:
+                cls.raw_archive.save(resource_name, response.content)
             return response_data
 
     @staticmethod
@@ -44,29 +55,52 @@ class CurrencyExtractionHandler:
             logging.error(f'Can not find "{new_base}" in {exchange_rates}')
             raise CanNotFindNewBaseCurrency
 
-        new_base_currencies = {}
-        for currency in exchange_rates:
-            if currency == current_base:
-                new_base_currencies[currency] = exchange_rates[new_base]
-            else:
-                new_base_currencies[currency] = round(exchange_rates[new_base] / exchange_rates[currency], 4)
+        with tracing_handler.span('change_currency_base', rates_count=len(exchange_rates)):
+            return rebase_rates(current_base, new_base_value, exchange_rates)
 
-        return new_base_currencies
+    @staticmethod
+    def get_provider_timestamp(resource_name: str, provider_ts: Optional[int], response_ts: float = None) -> int:
+        """
+        Validates rates update time reported by resource. Time of response receiving is used in case resource
+        did not report it, local time is used if it is unknown as well
+
+        :param resource_name: name of the resource for currency extraction
+        :param provider_ts: unix timestamp of rates update from resource response
+        :param response_ts: unix timestamp of receiving of already received response (e.g. archived one)
+        :return: unix timestamp of rates update
+        """
+        if provider_ts is None and response_ts is not None:
+            logging.warning(f'Resource "{resource_name}" did not report rates update time. Response time will be used')
+            return int(response_ts)
+        if provider_ts is None:
+            logging.warning(f'Resource "{resource_name}" did not report rates update time. Local time will be used')
+            return int(time.time())
+        return int(provider_ts)
 
     @classmethod
-    def handle_privat_bank(cls, config_helper: ConfigHandler) -> dict:
+    def handle_privat_bank(
+            cls, config_helper: ConfigHandler, response_data: dict = None, date: datetime.date = None,
+            response_ts: float = None
+    ) -> tuple:
         """
         PrivatBank currency extraction handler
 
         :param config_helper: instance of ConfigHelper to get information about currencies of interest
-        :return: exchange rate of currencies of interest
+        :param response_data: already received response (e.g. archived one), resource is requested if it is None
+        :param response_ts: unix timestamp of receiving of already received response
+        :param date: date of rates to request from PrivatBank archive, today rates are requested if it is None
+        :return: exchange rate of currencies of interest and unix timestamp of rates update
         """
-        params = {
-            'date': datetime.datetime.now().strftime('%d.%m.%Y'),
-            'json': ''
-        }
-        resource_url = config_helper.get_resource_url('PrivatBank')
-        response_data = cls.get_currency_from_resource(resource_url, params)
+        if response_data is None:
+            params = {
+                'date': (date or datetime.datetime.now()).strftime('%d.%m.%Y'),
+                'json': ''
+            }
+            resource_url = config_helper.get_resource_url('PrivatBank')
+            # rates of past dates are requested once by gap repair, so their validators are not kept
+            response_data = cls.get_currency_from_resource(
+                resource_url, params, resource_name='PrivatBank', conditional=date is None
+            )
         currencies_of_interest = config_helper.get_currencies_of_interest()
         extracted_currencies = dict()
         for currency in response_data['exchangeRate'][1:]:  # skip first record, because it is UAH
@@ -83,25 +117,35 @@ class CurrencyExtractionHandler:
                 )
                 continue
 
-        return extracted_currencies
+        provider_ts = None
+        if response_data.get('date'):
+            provider_ts = datetime.datetime.strptime(response_data['date'], '%d.%m.%Y').replace(
+                tzinfo=datetime.timezone.utc
+            ).timestamp()
+        return RateTable(extracted_currencies), cls.get_provider_timestamp('PrivatBank', provider_ts, response_ts)
 
     @classmethod
-    def handle_open_exchange_api(cls, config_helper: ConfigHandler) -> dict:
+    def handle_open_exchange_api(
+            cls, config_helper: ConfigHandler, response_data: dict = None, response_ts: float = None
+    ) -> tuple:
         """
         OpenExchangeRateAPI currency extraction handler.
         Additionally, changing currency base to UAH
 
         :param config_helper: instance of ConfigHelper to get information about currencies of interest
-        :return: exchange rate of currencies of interest
+        :param response_data: already received response (e.g. archived one), resource is requested if it is None
+        :param response_ts: unix timestamp of receiving of already received response
+        :return: exchange rate of currencies of interest and unix timestamp of rates update
         """
-        resource_url = config_helper.get_resource_url('OpenExchangeRateAPI')
-        response_data = cls.get_currency_from_resource(resource_url)
+        if response_data is None:
+            resource_url = config_helper.get_resource_url('OpenExchangeRateAPI')
+            response_data = cls.get_currency_from_resource(resource_url, resource_name='OpenExchangeRateAPI')
 
         if response_data['result'] == 'success':
             usd_base_currencies = response_data['rates']
         else:
             logging.error('Can not get correct response from OpenExchangeRateAPI!')
-            return {}
+            return {}, None
 
         # changing base currency from USD to UAH
         new_base_currencies = cls.change_currency_base(response_data['base_code'], 'UAH', usd_base_currencies)
@@ -111,27 +155,35 @@ class CurrencyExtractionHandler:
         for currency in new_base_currencies:
             if currency in currencies_of_interest:
                 extracted_currencies[currency] = (new_base_currencies[currency], new_base_currencies[currency])
-        return extracted_currencies
+        provider_ts = cls.get_provider_timestamp(
+            'OpenExchangeRateAPI', response_data.get('time_last_update_unix'), response_ts
+        )
+        return RateTable(extracted_currencies), provider_ts
 
     @classmethod
-    def handle_currency_api(cls, config_helper: ConfigHandler) -> dict:
+    def handle_currency_api(
+            cls, config_helper: ConfigHandler, response_data: dict = None, response_ts: float = None
+    ) -> tuple:
         """
         CurrencyAPI currency extraction handler.
         Additionally, changing currency base to UAH
 
         :param config_helper: instance of ConfigHelper to get information about currencies of interest
-        :return: exchange rate of currencies of interest
+        :param response_data: already received response (e.g. archived one), resource is requested if it is None
+        :param response_ts: unix timestamp of receiving of already received response
+        :return: exchange rate of currencies of interest and unix timestamp of rates update
         """
-        resource_url = config_helper.get_resource_url('CurrencyAPI')
-        params = {
-            'key': os.environ.get('CURRENCY_API_KEY')
-        }
-        response_data = cls.get_currency_from_resource(resource_url, params=params)
+        if response_data is None:
+            resource_url = config_helper.get_resource_url('CurrencyAPI')
+            params = {
+                'key': os.environ.get('CURRENCY_API_KEY')
+            }
+            response_data = cls.get_currency_from_resource(resource_url, params=params, resource_name='CurrencyAPI')
 
         # checking status
         if response_data.get('valid', False) is not True:
             logging.error('Got incorrect response from CurrencyAPI! Empty data will be returned!')
-            return {}
+            return {}, None
 
         currencies = response_data['rates']
         # changing base currency from USD to UAH
@@ -142,4 +194,5 @@ class CurrencyExtractionHandler:
         for currency in uah_base_currencies:
             if currency in currencies_of_interest:
                 extracted_currencies[currency] = (uah_base_currencies[currency], uah_base_currencies[currency])
-        return extracted_currencies
+        provider_ts = cls.get_provider_timestamp('CurrencyAPI', response_data.get('updated'), response_ts)
+        return RateTable(extracted_currencies), provider_ts
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import logging
+import datetime
+
+from app.utils.rate_records import RateRecord, select_currencies
+from app.utils.handlers import tracing_handler
+from app.utils.custom_exceptions import CanNotGetCurrenciesFromService, DataBaseIsNotReachable
+
+
+class GapRepairHandler:
+    """
+    Finds holes in history of resources (e.g. after container restart or resource outage) and re-fetches missing rates.
+    History of all resources is read by one aggregation pass, gap is interval between neighbour records, which is
+    longer than "tolerance" expected intervals of resource ("expected_intervals_sec" or median interval of its history).
+    Missing rates are re-fetched only for resources with repair handler, which can request rates for past date
+    (e.g. PrivatBank archive). Re-fetches are done by "workers" threads and at most "max_repairs" per run,
+    so repairs do not starve live polling. Gap, which is still missing after re-fetch, is retried with exponential
+    backoff from "retry_backoff_sec" and given up after "max_attempts", so permanent holes do not take all repairs.
+    Attempts are kept in "state_path" file, so they are shared by separate runs.
+    """
+    def __init__(
+            self, db_client, config_helper, repair_handlers: dict, expected_intervals_sec: dict = None,
+            tolerance: float = 1.5, lookback_sec: float = 2592000, workers: int = 2, max_repairs: int = 30,
+            state_path: str = None, retry_backoff_sec: float = 3600, max_attempts: int = 5, validation_handler=None,
+            main_currencies: tuple = None
+    ):
+        self.db_client = db_client
+        self.config_helper = config_helper
+        # resource name -> handler(config_helper, date=...), which extracts rates of resource for past date
+        self.repair_handlers = repair_handlers
+        self.expected_intervals_sec = expected_intervals_sec or {}
+        self.tolerance = tolerance
+        self.lookback_sec = lookback_sec
+        self.workers = workers
+        self.max_repairs = max_repairs
+        self.state_path = state_path
+        self.retry_backoff_sec = retry_backoff_sec
+        self.max_attempts = max_attempts
+        # optional instance of ValidationHandler, re-fetched rates are checked as live ones except jumps
+        self.validation_handler = validation_handler
+        # currencies of records, other re-fetched currencies (of profiles) are skipped, all are kept if not given
+        self.main_currencies = main_currencies
+        # "<resource name>:<missing provider timestamp>" -> count of re-fetches and time of the next one
+        self.attempts = self._load()
+
+    def _load(self) -> dict:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as state_file:
+                return json.load(state_file)
+        except ValueError as e:
+            logging.error(f'Can not parse gap repair attempts "{self.state_path}". They will be reset!\nError: {e}')
+            return {}
+
+    def save(self) -> None:
+        if not self.state_path:
+            return
+        temp_path = f'{self.state_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as state_file:
+            json.dump(self.attempts, state_file)
+        os.replace(temp_path, self.state_path)
+
+    @staticmethod
+    def _get_attempt_key(resource_name: str, missing_ts: float) -> str:
+        return f'{resource_name}:{missing_ts}'
+
+    def _observe_attempts(self, tasks: list, now: float) -> None:
+        for resource_name, missing_ts in tasks:
+            attempt = self.attempts.setdefault(self._get_attempt_key(resource_name, missing_ts), {'count': 0})
+            attempt['count'] += 1
+            attempt['retry_at'] = now + self.retry_backoff_sec * 2 ** (attempt['count'] - 1)
+
+    @staticmethod
+    def get_median_interval(timestamps: list):
+        """
+        Getting (lower) median interval between neighbour records, it is robust to gaps themselves
+
+        :param timestamps: sorted provider timestamps
+        :return: interval in seconds or None if there are less than 2 records
+        """
+        intervals = sorted(ts - previous_ts for previous_ts, ts in zip(timestamps, timestamps[1:]) if ts > previous_ts)
+        if not intervals:
+            return None
+        return intervals[(len(intervals) - 1) // 2]
+
+    def find_gaps(self, resource_name: str, timestamps: list) -> list:
+        """
+        Finding provider timestamps, which are missing in history of resource
+
+        :param resource_name: name of the resource
+        :param timestamps: sorted provider timestamps of resource records
+        :return: missing provider timestamps
+        """
+        interval = self.expected_intervals_sec.get(resource_name) or self.get_median_interval(timestamps)
+        if not interval:
+            return []
+
+        missing_timestamps = []
+        for previous_ts, ts in zip(timestamps, timestamps[1:]):
+            if ts - previous_ts <= interval * self.tolerance:
+                continue
+            missing_ts = previous_ts + interval
+            while missing_ts <= ts - interval / 2:
+                missing_timestamps.append(missing_ts)
+                missing_ts += interval
+        return missing_timestamps
+
+    def get_repair_tasks(self, history_index: dict, now: float = None) -> list:
+        """
+        Getting queue of re-fetches for repairable resources, the latest gaps are repaired first.
+        Gaps, which were re-fetched before, are skipped until their backoff is over
+
+        :param history_index: resource name -> sorted provider timestamps, as MongoDBHandler.get_history_index returns
+        :param now: current unix timestamp
+        :return: list of (resource name, missing provider timestamp), at most "max_repairs" of them
+        """
+        now = time.time() if now is None else now
+        tasks = []
+        missing_keys = set()
+        backed_off_quantity = 0
+        for resource_name, timestamps in history_index.items():
+            missing_timestamps = self.find_gaps(resource_name, timestamps)
+            if not missing_timestamps:
+                continue
+            if resource_name not in self.repair_handlers:
+                logging.warning(
+                    f'{len(missing_timestamps)} records of "{resource_name}" are missing, '
+                    f'but resource can not be requested for past dates'
+                )
+                continue
+            logging.info(f'{len(missing_timestamps)} records of "{resource_name}" are missing')
+            for missing_ts in missing_timestamps:
+                key = self._get_attempt_key(resource_name, missing_ts)
+                missing_keys.add(key)
+                attempt = self.attempts.get(key)
+                if attempt is not None and (attempt['count'] >= self.max_attempts or attempt['retry_at'] > now):
+                    backed_off_quantity += 1
+                    continue
+                tasks.append((resource_name, missing_ts))
+        if backed_off_quantity:
+            logging.info(f'{backed_off_quantity} missing records were not repaired by previous re-fetches, skipping')
+        # attempts of repaired gaps and of gaps out of lookback are not needed anymore
+        self.attempts = {key: attempt for key, attempt in self.attempts.items() if key in missing_keys}
+        tasks.sort(key=lambda task: task[1], reverse=True)
+        return tasks[:self.max_repairs]
+
+    def _repair_gap(self, task: tuple):
+        resource_name, missing_ts = task
+        date = datetime.datetime.fromtimestamp(missing_ts, tz=datetime.timezone.utc).date()
+        try:
+            with tracing_handler.span('repair_gap', resource_name=resource_name, missing_ts=missing_ts):
+                return self._refetch_gap(resource_name, date)
+        except CanNotGetCurrenciesFromService:
+            logging.error(f'Can not re-fetch rates of "{resource_name}" for {date}')
+        except Exception as e:
+            # failure of one re-fetch (network, unexpected archive response, DB) does not stop the others,
+            # it is counted as failed attempt
+            logging.error(f'Can not repair gap of "{resource_name}" for {date}.\nError: {e!r}')
+        return None
+
+    def _refetch_gap(self, resource_name: str, date: datetime.date):
+        extracted_currencies, provider_ts = self.repair_handlers[resource_name](self.config_helper, date=date)
+        if not extracted_currencies:
+            logging.warning(f'Resource "{resource_name}" has no rates for {date}')
+            return None
+        if self.validation_handler is not None:
+            extracted_currencies, quarantine_payload = self.validation_handler.validate(
+                resource_name, extracted_currencies, provider_ts, check_jumps=False
+            )
+            if quarantine_payload is not None:
+                try:
+                    self.db_client.insert_quarantine(quarantine_payload)
+                except DataBaseIsNotReachable:
+                    logging.warning('Quarantine record was not saved, since DB is not reachable')
+            if not extracted_currencies:
+                logging.error(f'All re-fetched rates of "{resource_name}" for {date} are invalid')
+                return None
+        if self.main_currencies is not None:
+            extracted_currencies = select_currencies(extracted_currencies, self.main_currencies)
+            if not extracted_currencies:
+                logging.warning(f'Resource "{resource_name}" has no rates of main currencies for {date}')
+                return None
+        return RateRecord(
+            utc_time=time.time(),
+            utc_offset=time.timezone,
+            provider_ts=provider_ts,
+            resource_name=resource_name,
+            currencies=extracted_currencies,
+        )
+
+    def repair(self, now: float = None) -> int:
+        """
+        Finding gaps in history of the last "lookback_sec" and inserting re-fetched rates for them.
+        Already existing records are never overwritten
+
+        :param now: current unix timestamp
+        :return: quantity of repaired records
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        now = time.time() if now is None else now
+        tasks = self.get_repair_tasks(self.db_client.get_history_index(since_ts=now - self.lookback_sec), now)
+        if not tasks:
+            self.save()
+            logging.info('There are no gaps to repair in history of resources')
+            return 0
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='GapRepair') as executor:
+            payloads = [payload for payload in executor.map(self._repair_gap, tasks) if payload is not None]
+        repaired_quantity = self.db_client.upsert_records(payloads)
+        # repaired gaps are not found again, so attempts are left only for the failed ones
+        self._observe_attempts(tasks, now)
+        self.save()
+        logging.info(f'{repaired_quantity}/{len(tasks)} missing records were repaired')
+        return repaired_quantity
@@ -0,0 +1,211 @@
+import os
+import mmap
+import time
+import zlib
+import struct
+import logging
+
+from app.utils.rate_records import NO_RATE
+from app.utils.custom_exceptions import LatestRatesCacheIsNotAvailable
+
+CACHE_MAGIC = b'CMLR'
+CACHE_LAYOUT_VERSION = 1
+# magic, layout version, max entries, sequence counter (it is odd while writer updates entries)
+CACHE_HEADER = struct.Struct('<4sHxxI4xQ')
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 16
+ENTRIES_OFFSET = 32
+# resource name, currency, provider timestamp, sale, purchase
+CACHE_ENTRY = struct.Struct('<24s8sddd')
+MAX_READ_ATTEMPTS = 1000
+
+
+def _from_rate(value: float):
+    return None if value != value else value  # NaN is the only value, which is not equal to itself
+
+
+class LatestRatesCacheHandler:
+    """
+    Keeps the latest rates of every (resource, currency) in fixed-layout memory-mapped file, so local processes
+    (readers, API workers) get current rates without DB round trip and without their own copy of them.
+    Entry position is CRC32 of (resource, currency) with linear probing, entries are read in place from mapped file.
+    Entries are written by one writer process under seqlock: sequence counter is odd while entries are updated,
+    readers retry if counter was odd or changed during read, so they never get partially updated rates of resource.
+    """
+    def __init__(self, path: str, max_entries: int = 4096, writable: bool = False):
+        self.path = path
+        self.writable = writable
+        self._mmap = self._create(path, max_entries) if writable else self._open(path)
+        self.max_entries = CACHE_HEADER.unpack_from(self._mmap)[2]
+        # (resource name, currency) -> entry position, it is kept by writer only
+        self._positions = {}
+
+    @staticmethod
+    def _get_size(max_entries: int) -> int:
+        return ENTRIES_OFFSET + max_entries * CACHE_ENTRY.size
+
+    def _create(self, path: str, max_entries: int) -> mmap.mmap:
+        """
+        Mapping cache file for writer. Existing file with the same layout is reused, so readers keep
+        the latest rates during writer restart
+
+        :param path: path to cache file
+        :param max_entries: max quantity of (resource, currency) entries
+        :return: mapped file
+        """
+        size = self._get_size(max_entries)
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            logging.info(f'Creating latest rates cache "{path}" for {max_entries} entries')
+            temp_path = f'{path}.tmp'
+            with open(temp_path, 'wb') as cache_file:
+                cache_file.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_LAYOUT_VERSION, max_entries, 0))
+                cache_file.truncate(size)
+            os.replace(temp_path, path)
+
+        with open(path, 'r+b') as cache_file:
+            cache_mmap = mmap.mmap(cache_file.fileno(), size)
+        magic, layout_version, _, sequence = CACHE_HEADER.unpack_from(cache_mmap)
+        if magic != CACHE_MAGIC or layout_version != CACHE_LAYOUT_VERSION:
+            cache_mmap.close()
+            logging.error(f'File "{path}" is not latest rates cache of layout version {CACHE_LAYOUT_VERSION}')
+            raise LatestRatesCacheIsNotAvailable
+        if sequence & 1:
+            # previous writer was stopped during update
+            SEQUENCE.pack_into(cache_mmap, SEQUENCE_OFFSET, sequence + 1)
+        return cache_mmap
+
+    @staticmethod
+    def _open(path: str) -> mmap.mmap:
+        try:
+            with open(path, 'rb') as cache_file:
+                cache_mmap = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logging.error(f'Can not open latest rates cache "{path}".\nError: {e}')
+            raise LatestRatesCacheIsNotAvailable
+        magic, layout_version, max_entries, _ = CACHE_HEADER.unpack_from(cache_mmap)
+        if magic != CACHE_MAGIC or layout_version != CACHE_LAYOUT_VERSION:
+            cache_mmap.close()
+            logging.error(f'File "{path}" is not latest rates cache of layout version {CACHE_LAYOUT_VERSION}')
+            raise LatestRatesCacheIsNotAvailable
+        return cache_mmap
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def _find_position(self, resource_key: bytes, currency_key: bytes):
+        """
+        Finding position of entry by linear probing from its hash
+
+        :param resource_key: encoded resource name
+        :param currency_key: encoded currency
+        :return: position of entry or the first free position on its probing path, None if cache is full
+        """
+        position = zlib.crc32(resource_key + b'\0' + currency_key) % self.max_entries
+        for _ in range(self.max_entries):
+            offset = ENTRIES_OFFSET + position * CACHE_ENTRY.size
+            entry_resource_key = self._mmap[offset:offset + 24].rstrip(b'\0')
+            if not entry_resource_key:
+                return position
+            if entry_resource_key == resource_key and self._mmap[offset + 24:offset + 32].rstrip(b'\0') == currency_key:
+                return position
+            position = (position + 1) % self.max_entries
+        return None
+
+    def _read(self, read_entries):
+        for _ in range(MAX_READ_ATTEMPTS):
+            sequence = SEQUENCE.unpack_from(self._mmap, SEQUENCE_OFFSET)[0]
+            if not sequence & 1:
+                result = read_entries()
+                if SEQUENCE.unpack_from(self._mmap, SEQUENCE_OFFSET)[0] == sequence:
+                    return result
+            time.sleep(0)
+        logging.error(f'Latest rates cache "{self.path}" is being updated for too long')
+        raise LatestRatesCacheIsNotAvailable
+
+    def publish(self, resource_name: str, currencies: dict, provider_ts: int) -> int:
+        """
+        Writing the latest rates of resource, all of them become visible to readers at once
+
+        :param resource_name: name of the resource
+        :param currencies: extracted currencies
+        :param provider_ts: unix timestamp of rates update reported by resource
+        :return: quantity of written entries
+        """
+        resource_key = resource_name.encode('utf-8')
+        if len(resource_key) > 24:
+            logging.warning(f'Resource name "{resource_name}" is too long for latest rates cache, it will be skipped')
+            return 0
+
+        written_quantity = 0
+        sequence = SEQUENCE.unpack_from(self._mmap, SEQUENCE_OFFSET)[0]
+        SEQUENCE.pack_into(self._mmap, SEQUENCE_OFFSET, sequence + 1)
+        try:
+            for currency, (sale, purchase) in currencies.items():
+                currency_key = currency.encode('utf-8')
+                position = self._positions.get((resource_key, currency_key))
+                if position is None and len(currency_key) <= 8:
+                    # new entry is written right away, so the next new entries do not get the same free position
+                    position = self._positions[(resource_key, currency_key)] = self._find_position(
+                        resource_key, currency_key
+                    )
+                if position is None:
+                    logging.warning(f'There is no room for "{currency}" of "{resource_name}" in latest rates cache')
+                    continue
+                CACHE_ENTRY.pack_into(
+                    self._mmap, ENTRIES_OFFSET + position * CACHE_ENTRY.size, resource_key, currency_key,
+                    provider_ts or 0, NO_RATE if sale is None else sale, NO_RATE if purchase is None else purchase,
+                )
+                written_quantity += 1
+        finally:
+            SEQUENCE.pack_into(self._mmap, SEQUENCE_OFFSET, sequence + 2)
+        return written_quantity
+
+    def get(self, resource_name: str, currency: str):
+        """
+        Getting the latest rates of currency
+
+        :param resource_name: name of the resource
+        :param currency: currency name
+        :return: (sale, purchase) or None if there are no rates of currency
+        """
+        resource_key, currency_key = resource_name.encode('utf-8'), currency.encode('utf-8')
+
+        def read_entry():
+            position = self._find_position(resource_key, currency_key)
+            if position is None:
+                return None
+            entry_resource_key, _, _, sale, purchase = CACHE_ENTRY.unpack_from(
+                self._mmap, ENTRIES_OFFSET + position * CACHE_ENTRY.size
+            )
+            if not entry_resource_key.rstrip(b'\0'):
+                return None
+            return _from_rate(sale), _from_rate(purchase)
+
+        return self._read(read_entry)
+
+    def get_resource(self, resource_name: str):
+        """
+        Getting the latest rates of all currencies of resource
+
+        :param resource_name: name of the resource
+        :return: record of the same format as DB one or None if there are no rates of resource
+        """
+        resource_key = resource_name.encode('utf-8')
+
+        def read_entries():
+            currencies, provider_ts = {}, None
+            for position in range(self.max_entries):
+                entry_resource_key, currency_key, entry_provider_ts, sale, purchase = CACHE_ENTRY.unpack_from(
+                    self._mmap, ENTRIES_OFFSET + position * CACHE_ENTRY.size
+                )
+                if entry_resource_key.rstrip(b'\0') != resource_key:
+                    continue
+                currency = currency_key.rstrip(b'\0').decode('utf-8', 'replace')
+                currencies[currency] = _from_rate(sale), _from_rate(purchase)
+                provider_ts = entry_provider_ts if provider_ts is None else max(provider_ts, entry_provider_ts)
+            return currencies, provider_ts
+
+        currencies, provider_ts = self._read(read_entries)
+        if not currencies:
+            return None
+        return {'resource_name': resource_name, 'provider_ts': provider_ts, 'currencies': currencies}
@@ -1,46 +1,662 @@
 import os
 import logging
+import datetime
+import threading
 
-from pymongo import MongoClient
+from app.utils.rate_records import to_document
+from app.utils.handlers import tracing_handler
+from app.utils.custom_exceptions import DataBaseIsNotReachable
+
+# rollup collection name -> rollup period in seconds
+ROLLUP_PERIODS = {
+    'currencies_hourly': 3600,
+    'currencies_daily': 86400,
+}
 
 
 class MongoDBHandler:
-    def __init__(self, db_path: str = None, db_name: str = None):
+    """
+    MongoDB client is created on the first DB access (write of the first record), pymongo is imported there as well,
+    since it is the most expensive import of the script.
+    Server selection timeout is short, so writes fail fast and are spooled while DB is not reachable.
+    """
+    def __init__(self, db_path: str = None, db_name: str = None, server_selection_timeout_ms: int = 2000):
+        self.db_path = db_path
         self.db_name = db_name
-        if db_path is None:
-            logging.warning('Path to remote MongoDB was not specified. Using local MongoDB')
-            self.client = MongoClient(os.environ.get('MONGO_DB_ADDR'), int(os.environ.get('MONGO_DB_PORT')))
-        else:
-            self.client = MongoClient(db_path)
+        self.server_selection_timeout_ms = server_selection_timeout_ms
+        self._client = None
+        self._client_lock = threading.Lock()
+        # names of databases and collections, which existence was already checked
+        self._checked_databases = set()
+        self._checked_collections = set()
+        self._is_currencies_index_created = False
+        self._is_leases_index_created = False
+        self._is_workers_index_created = False
+        self._is_consensus_index_created = False
+        self._is_rollups_index_created = False
+        self._is_profiles_index_created = False
+        # rollup collection name -> updates of stored records, which failed and have to be retried
+        self._pending_rollup_updates = {collection_name: [] for collection_name in ROLLUP_PERIODS}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from pymongo import MongoClient
+
+                    if self.db_path is None:
+                        logging.warning('Path to remote MongoDB was not specified. Using local MongoDB')
+                        self._client = MongoClient(
+                            os.environ.get('MONGO_DB_ADDR'), int(os.environ.get('MONGO_DB_PORT')),
+                            serverSelectionTimeoutMS=self.server_selection_timeout_ms,
+                        )
+                    else:
+                        self._client = MongoClient(
+                            self.db_path, serverSelectionTimeoutMS=self.server_selection_timeout_ms
+                        )
+        return self._client
 
     def _get_database_or_create_new(self, database_name: str):
-        if database_name not in self.client.list_database_names():
-            logging.warning(
-                f'Database with name {database_name} was not found. New database {database_name} will be created!'
-            )
+        # existence is checked once per process, not on every write
+        if database_name not in self._checked_databases:
+            if database_name not in self.client.list_database_names():
+                logging.warning(
+                    f'Database with name {database_name} was not found. New database {database_name} will be created!'
+                )
+            self._checked_databases.add(database_name)
         return self.client[database_name]
 
     def _get_collection_or_create_new(self, collection_name: str):
         db = self._get_database_or_create_new(self.db_name)
-        if collection_name not in db.list_collection_names():
-            logging.warning(
-                f'Collection with name "{collection_name}" was not found. '
-                f'Collection "{collection_name}" will be created'
-            )
+        if collection_name not in self._checked_collections:
+            if collection_name not in db.list_collection_names():
+                logging.warning(
+                    f'Collection with name "{collection_name}" was not found. '
+                    f'Collection "{collection_name}" will be created'
+                )
+            self._checked_collections.add(collection_name)
         return db[collection_name]
 
+    def _get_currencies_collection(self):
+        """
+        Getting 'currencies' collection with unique index by (resource_name, provider_ts).
+        Records without "provider_ts" (created before it was introduced) are not covered by index.
+
+        :return: 'currencies' collection
+        """
+        from pymongo import ASCENDING
+
+        currencies_collection = self._get_collection_or_create_new('currencies')
+        if not self._is_currencies_index_created:
+            currencies_collection.create_index(
+                [('resource_name', ASCENDING), ('provider_ts', ASCENDING)],
+                name='resource_name_provider_ts',
+                unique=True,
+                partialFilterExpression={'provider_ts': {'$exists': True}},
+            )
+            self._is_currencies_index_created = True
+        return currencies_collection
+
+    @staticmethod
+    def _prepare_upsert(payload: dict, overwrite: bool = False) -> tuple:
+        upsert_filter = {'resource_name': payload['resource_name'], 'provider_ts': payload['provider_ts']}
+        return upsert_filter, {'$set' if overwrite else '$setOnInsert': payload}
+
     def insert_record(self, payload: dict) -> bool:
         """
-        Inserting record into 'currencies' collection in MongoDB
+        Upserting record into 'currencies' collection in MongoDB.
+        Record is matched by (resource_name, provider_ts), so already stored rates are not duplicated
 
-        :param payload: payload to insert into DB
+        :param payload: payload to insert into DB (instance of RateRecord or DB document)
         :return: boolean status of insertion
         """
-        currencies_collection = self._get_collection_or_create_new('currencies')
-        result = currencies_collection.insert_one(payload)
-        if result.inserted_id is not None:
-            logging.info(f'Record was successfully created! Record ID: {result.inserted_id}')
+        from pymongo.errors import PyMongoError
+
+        payload = to_document(payload)
+        try:
+            with tracing_handler.span('insert_record', resource_name=payload['resource_name']):
+                currencies_collection = self._get_currencies_collection()
+                result = currencies_collection.update_one(*self._prepare_upsert(payload), upsert=True)
+        except PyMongoError as e:
+            logging.error(f'Can not insert record into MongoDB.\nError: {e}')
+            raise DataBaseIsNotReachable
+        if result.upserted_id is not None:
+            logging.info(f'Record was successfully created! Record ID: {result.upserted_id}')
+            self._update_rollups([payload])
+            return True
+        elif result.matched_count:
+            logging.info(
+                f'Record of "{payload["resource_name"]}" with provider time {payload["provider_ts"]} already exists'
+            )
             return True
         else:
             logging.error(f'Record was not created...')
             return False
+
+    def upsert_records(self, payloads: list, overwrite: bool = False) -> int:
+        """
+        Bulk upserting records into 'currencies' collection in MongoDB.
+        Records are matched by (resource_name, provider_ts), so replaying the same payloads does not create duplicates
+
+        :param payloads: list of payloads to upsert into DB (instances of RateRecord or DB documents)
+        :param overwrite: overwrite already existing records (e.g. by reprocessed ones)
+        :return: quantity of inserted records
+        """
+        return len(self._upsert_records(payloads, overwrite))
+
+    def replay_records(self, payloads: list) -> list:
+        """
+        Bulk upserting replayed records into 'currencies' collection in MongoDB.
+        The same record could be spooled several times, only the first one is inserted
+
+        :param payloads: list of replayed payloads (instances of RateRecord or DB documents)
+        :return: DB documents of inserted records
+        """
+        return self._upsert_records(payloads)
+
+    def _upsert_records(self, payloads: list, overwrite: bool = False) -> list:
+        from pymongo import UpdateOne
+        from pymongo.errors import PyMongoError
+
+        if not payloads:
+            return []
+
+        payloads = [to_document(payload) for payload in payloads]
+        requests = [UpdateOne(*self._prepare_upsert(payload, overwrite), upsert=True) for payload in payloads]
+        try:
+            currencies_collection = self._get_currencies_collection()
+            result = currencies_collection.bulk_write(requests, ordered=False)
+        except PyMongoError as e:
+            logging.error(f'Can not upsert records into MongoDB.\nError: {e}')
+            raise DataBaseIsNotReachable
+
+        logging.info(
+            f'Records were successfully upserted! Inserted records: {result.upserted_count}, '
+            f'already existing records: {result.matched_count}'
+        )
+        # only new records are added to rollups, otherwise they would be counted twice
+        inserted_payloads = [payloads[index] for index in sorted(result.upserted_ids)]
+        self._update_rollups(inserted_payloads)
+        return inserted_payloads
+
+    def _get_profile_currencies_collection(self):
+        from pymongo import ASCENDING
+
+        profile_currencies_collection = self._get_collection_or_create_new('profile_currencies')
+        if not self._is_profiles_index_created:
+            profile_currencies_collection.create_index(
+                [('profile', ASCENDING), ('resource_name', ASCENDING), ('provider_ts', ASCENDING)],
+                name='profile_resource_name_provider_ts',
+                unique=True,
+            )
+            self._is_profiles_index_created = True
+        return profile_currencies_collection
+
+    def upsert_profile_records(self, payloads: list) -> int:
+        """
+        Bulk upserting rates views of profiles into 'profile_currencies' collection in MongoDB.
+        Records are matched by (profile, resource_name, provider_ts)
+
+        :param payloads: list of profile payloads to upsert into DB
+        :return: quantity of inserted or updated records
+        """
+        from pymongo import UpdateOne
+        from pymongo.errors import PyMongoError
+
+        if not payloads:
+            return 0
+
+        requests = [
+            UpdateOne(
+                {
+                    'profile': payload['profile'],
+                    'resource_name': payload['resource_name'],
+                    'provider_ts': payload['provider_ts'],
+                },
+                {'$setOnInsert': payload},
+                upsert=True,
+            )
+            for payload in payloads
+        ]
+        try:
+            result = self._get_profile_currencies_collection().bulk_write(requests, ordered=False)
+        except PyMongoError as e:
+            logging.error(f'Can not upsert profile records into MongoDB.\nError: {e}')
+            raise DataBaseIsNotReachable
+
+        affected_quantity = result.upserted_count + result.matched_count
+        logging.info(f'Profile records were successfully upserted! Affected records: {affected_quantity}')
+        return affected_quantity
+
+    def get_rates_snapshot(self, resource_name: str, ts: float = None):
+        """
+        Getting the latest record of resource, which rates were updated not later than "ts", by index lookup
+
+        :param resource_name: name of the resource
+        :param ts: unix timestamp, the latest record is returned if it is None
+        :return: record or None if there are no records
+        """
+        from pymongo import DESCENDING
+        from pymongo.errors import PyMongoError
+
+        provider_ts_filter = {'$exists': True}
+        if ts is not None:
+            provider_ts_filter['$lte'] = ts
+        try:
+            return self._get_currencies_collection().find_one(
+                {'resource_name': resource_name, 'provider_ts': provider_ts_filter},
+                sort=[('provider_ts', DESCENDING)],
+            )
+        except PyMongoError as e:
+            logging.error(f'Can not get rates snapshot from MongoDB.\nError: {e}')
+            raise DataBaseIsNotReachable
+
+    def get_history_index(self, since_ts: float = None) -> dict:
+        """
+        Getting provider timestamps of all records grouped by resource in one pass over (resource_name, provider_ts)
+        index. Query is covered by index, so rates themselves are not fetched, timestamps are streamed by cursor
+        instead of being grouped into one document per resource, which is limited by 16MB
+
+        :param since_ts: unix timestamp, older records are skipped
+        :return: resource name -> sorted list of provider timestamps
+        """
+        from pymongo import ASCENDING
+        from pymongo.errors import PyMongoError
+
+        provider_ts_filter = {'$exists': True}
+        if since_ts is not None:
+            provider_ts_filter['$gte'] = since_ts
+        history_index = {}
+        try:
+            cursor = self._get_currencies_collection().find(
+                {'provider_ts': provider_ts_filter},
+                projection={'_id': False, 'resource_name': True, 'provider_ts': True},
+                sort=[('resource_name', ASCENDING), ('provider_ts', ASCENDING)],
+                hint='resource_name_provider_ts',
+                batch_size=10000,
+            )
+            for document in cursor:
+                history_index.setdefault(document['resource_name'], []).append(document['provider_ts'])
+        except PyMongoError as e:
+            logging.error(f'Can not get history index from MongoDB.\nError: {e}')
+            raise DataBaseIsNotReachable
+        return history_index
+
+    @staticmethod
+    def _create_rollup_index(rollup_collection) -> None:
+        from pymongo import ASCENDING
+
+        rollup_collection.create_index(
+            [('resource_name', ASCENDING), ('currency', ASCENDING), ('bucket_ts', ASCENDING)],
+            name='resource_name_currency_bucket_ts',
+        )
+
+    def _get_rollup_collection(self, collection_name: str):
+        rollup_collection = self._get_collection_or_create_new(collection_name)
+        if not self._is_rollups_index_created:
+            for name in ROLLUP_PERIODS:
+                self._create_rollup_index(self._get_collection_or_create_new(name))
+            self._is_rollups_index_created = True
+        return rollup_collection
+
+    @staticmethod
+    def _prepare_rollup_updates(payloads: list, period: int) -> list:
+        """
+        Preparing upserts of rollup buckets (open, high, low, close and count of mid rate) by new records
+
+        :param payloads: new records
+        :param period: rollup period in seconds
+        :return: list of bulk write requests
+        """
+        from pymongo import UpdateOne
+
+        requests = []
+        for payload in payloads:
+            bucket_ts = int(payload['provider_ts']) - int(payload['provider_ts']) % period
+            for currency, (sale, purchase) in payload['currencies'].items():
+                if sale is None or purchase is None:
+                    continue
+                mid_rate = (sale + purchase) / 2
+                requests.append(UpdateOne(
+                    {'_id': f'{payload["resource_name"]}:{currency}:{bucket_ts}'},
+                    {
+                        '$setOnInsert': {
+                            'resource_name': payload['resource_name'],
+                            'currency': currency,
+                            'bucket_ts': bucket_ts,
+                            'open': mid_rate,
+                        },
+                        '$set': {'close': mid_rate},
+                        '$max': {'high': mid_rate},
+                        '$min': {'low': mid_rate},
+                        '$inc': {'count': 1},
+                    },
+                    upsert=True,
+                ))
+        return requests
+
+    def _update_rollups(self, payloads: list) -> bool:
+        """
+        Adding new records to rollups together with failed before updates.
+        Records are already stored at this point, so failure is not raised (otherwise the records would be spooled
+        and replayed as existing ones, which are not added to rollups), failed updates are kept to be retried
+
+        :param payloads: new records
+        :return: boolean status, True if there are no failed updates left
+        """
+        from pymongo.errors import PyMongoError, BulkWriteError
+
+        is_updated = True
+        for collection_name, period in ROLLUP_PERIODS.items():
+            requests = self._pending_rollup_updates[collection_name] + self._prepare_rollup_updates(payloads, period)
+            if not requests:
+                continue
+            try:
+                self._get_rollup_collection(collection_name).bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                # updates are not idempotent ("count" is incremented), so only failed ones are retried
+                requests = [requests[write_error['index']] for write_error in e.details.get('writeErrors', [])]
+                logging.error(f'Can not update rollup "{collection_name}" by {len(requests)} updates.\nError: {e}')
+            except PyMongoError as e:
+                logging.error(f'Can not update rollup "{collection_name}" in MongoDB.\nError: {e}')
+            else:
+                requests = []
+            self._pending_rollup_updates[collection_name] = requests
+            is_updated = is_updated and not requests
+        return is_updated
+
+    def flush_rollups(self) -> bool:
+        """
+        Retrying failed before updates of rollups.
+        If they fail again, they are lost with the process and rollups have to be rebuilt by "--rebuild_rollups"
+
+        :return: boolean status, True if there are no failed updates left
+        """
+        if not any(self._pending_rollup_updates.values()) or self._update_rollups([]):
+            return True
+        logging.error('Rollups miss some stored records. Rebuild them by running with "--rebuild_rollups"')
+        return False
+
+    def get_rollups(self, period_name: str, resource_name: str, currency: str, start_ts: int, end_ts: int) -> list:
+        """
+        Getting rollup buckets of currency for time range
+
+        :param period_name: "hourly" or "daily"
+        :param resource_name: name of the resource
+        :param currency: currency name
+        :param start_ts: unix timestamp of range start
+        :param end_ts: unix timestamp of range end (excluded)
+        :return: list of rollup buckets sorted by time
+        """
+        from pymongo import ASCENDING
+        from pymongo.errors import PyMongoError
+
+        try:
+            rollup_collection = self._get_rollup_collection(f'currencies_{period_name}')
+            return list(rollup_collection.find(
+                {'resource_name': resource_name, 'currency': currency, 'bucket_ts': {'$gte': start_ts, '$lt': end_ts}},
+                sort=[('bucket_ts', ASCENDING)],
+            ))
+        except PyMongoError as e:
+            logging.error(f'Can not get rollups from MongoDB.\nError: {e}')
+            raise DataBaseIsNotReachable
+
+    def rebuild_rollups(self) -> None:
+        """
+        Rebuilding rollup collections from all records of 'currencies' collection on MongoDB side.
+        Rollup is built into temporary collection, which replaces the old one by rename, so rollups stay readable.
+        Rates, which miss sale or purchase, are skipped in the same way as on write
+
+        :return: None
+        """
+        from pymongo import ASCENDING
+        from pymongo.errors import PyMongoError
+
+        for collection_name, period in ROLLUP_PERIODS.items():
+            rebuilt_collection_name = f'{collection_name}_rebuilt'
+            bucket_ts = {'$subtract': ['$provider_ts', {'$mod': ['$provider_ts', period]}]}
+            pipeline = [
+                {'$match': {'provider_ts': {'$exists': True}}},
+                {'$sort': {'provider_ts': ASCENDING}},
+                {'$project': {
+                    'resource_name': 1, 'provider_ts': 1, 'currencies': {'$objectToArray': '$currencies'}
+                }},
+                {'$unwind': '$currencies'},
+                {'$match': {'currencies.v.0': {'$ne': None}, 'currencies.v.1': {'$ne': None}}},
+                {'$addFields': {'mid_rate': {'$avg': '$currencies.v'}}},
+                {'$group': {
+                    '_id': {'$concat': ['$resource_name', ':', '$currencies.k', ':', {'$toString': bucket_ts}]},
+                    'resource_name': {'$first': '$resource_name'},
+                    'currency': {'$first': '$currencies.k'},
+                    'bucket_ts': {'$first': bucket_ts},
+                    'open': {'$first': '$mid_rate'},
+                    'close': {'$last': '$mid_rate'},
+                    'high': {'$max': '$mid_rate'},
+                    'low': {'$min': '$mid_rate'},
+                    'count': {'$sum': 1},
+                }},
+                {'$out': rebuilt_collection_name},
+            ]
+            try:
+                self._get_currencies_collection().aggregate(pipeline, allowDiskUse=True)
+                rebuilt_collection = self._get_collection_or_create_new(rebuilt_collection_name)
+                self._create_rollup_index(rebuilt_collection)
+                rebuilt_collection.rename(collection_name, dropTarget=True)
+            except PyMongoError as e:
+                logging.error(f'Can not rebuild rollups in MongoDB.\nError: {e}')
+                raise DataBaseIsNotReachable
+            logging.info(f'Rollup collection "{collection_name}" was rebuilt')
+
+    def _get_leases_collection(self):
+        """
+        Getting 'resource_leases' collection with TTL index, so expired leases are removed by MongoDB itself
+
+        :return: 'resource_leases' collection
+        """
+        leases_collection = self._get_collection_or_create_new('resource_leases')
+        if not self._is_leases_index_created:
+            leases_collection.create_index('expires_at', name='expires_at_ttl', expireAfterSeconds=0)
+            self._is_leases_index_created = True
+        return leases_collection
+
+    def acquire_lease(self, resource_name: str, worker_id: str, ttl_sec: int) -> bool:
+        """
+        Trying to lease resource for worker. Lease is acquired if resource is not leased,
+        lease is expired or it is already leased by the same worker (in this case lease is extended)
+
+        :param resource_name: name of the resource to lease
+        :param worker_id: unique ID of worker
+        :param ttl_sec: lease time to live in seconds
+        :return: boolean status of lease acquiring
+        """
+        from pymongo.errors import PyMongoError, DuplicateKeyError
+
+        now = datetime.datetime.utcnow()
+        lease_filter = {
+            '_id': resource_name,
+            '$or': [{'expires_at': {'$lte': now}}, {'worker_id': worker_id}],
+        }
+        lease = {'worker_id': worker_id, 'expires_at': now + datetime.timedelta(seconds=ttl_sec)}
+        try:
+            self._get_leases_collection().update_one(lease_filter, {'$set': lease}, upsert=True)
+        except DuplicateKeyError:
+            # lease document exists, but does not match filter - resource is leased by another worker
+            logging.info(f'Resource "{resource_name}" is leased by another worker')
+            return False
+        except PyMongoError as e:
+            logging.error(f'Can not acquire lease for resource "{resource_name}".\nError: {e}')
+            raise DataBaseIsNotReachable
+        logging.info(f'Resource "{resource_name}" was leased by worker "{worker_id}" for {ttl_sec} sec')
+        return True
+
+    def renew_leases(self, resource_names: list, worker_id: str, ttl_sec: int) -> int:
+        """
+        Extending leases of resources, which are still leased by worker
+
+        :param resource_names: names of leased resources
+        :param worker_id: unique ID of worker
+        :param ttl_sec: lease time to live in seconds
+        :return: quantity of renewed leases
+        """
+        from pymongo.errors import PyMongoError
+
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=ttl_sec)
+        try:
+            result = self._get_leases_collection().update_many(
+                {'_id': {'$in': list(resource_names)}, 'worker_id': worker_id}, {'$set': {'expires_at': expires_at}}
+            )
+        except PyMongoError as e:
+            logging.error(f'Can not renew leases of worker "{worker_id}".\nError: {e}')
+            raise DataBaseIsNotReachable
+        return result.matched_count
+
+    def release_leases(self, resource_names: list, worker_id: str) -> int:
+        """
+        Releasing leases of resources, which are still leased by worker, so other workers can lease them right away
+
+        :param resource_names: names of leased resources
+        :param worker_id: unique ID of worker
+        :return: quantity of released leases
+        """
+        from pymongo.errors import PyMongoError
+
+        try:
+            result = self._get_leases_collection().delete_many(
+                {'_id': {'$in': list(resource_names)}, 'worker_id': worker_id}
+            )
+        except PyMongoError as e:
+            logging.error(f'Can not release leases of worker "{worker_id}".\nError: {e}')
+            raise DataBaseIsNotReachable
+        return result.deleted_count
+
+    def _get_workers_collection(self):
+        workers_collection = self._get_collection_or_create_new('workers')
+        if not self._is_workers_index_created:
+            workers_collection.create_index('expires_at', name='expires_at_ttl', expireAfterSeconds=0)
+            self._is_workers_index_created = True
+        return workers_collection
+
+    def register_worker(self, worker_id: str, ttl_sec: int) -> int:
+        """
+        Registering worker as live one for "ttl_sec"
+
+        :param worker_id: unique ID of worker
+        :param ttl_sec: registration time to live in seconds
+        :return: quantity of live workers, including this one
+        """
+        from pymongo.errors import PyMongoError
+
+        now = datetime.datetime.utcnow()
+        try:
+            workers_collection = self._get_workers_collection()
+            workers_collection.update_one(
+                {'_id': worker_id}, {'$set': {'expires_at': now + datetime.timedelta(seconds=ttl_sec)}}, upsert=True
+            )
+            # TTL monitor removes expired documents once per minute only
+            return workers_collection.count_documents({'expires_at': {'$gt': now}})
+        except PyMongoError as e:
+            logging.error(f'Can not register worker "{worker_id}".\nError: {e}')
+            raise DataBaseIsNotReachable
+
+    def _get_consensus_collection(self):
+        from pymongo import DESCENDING
+
+        consensus_collection = self._get_collection_or_create_new('consensus_rates')
+        if not self._is_consensus_index_created:
+            consensus_collection.create_index([('utc_time', DESCENDING)], name='utc_time_desc')
+            self._is_consensus_index_created = True
+        return consensus_collection
+
+    def insert_consensus(self, payload: dict) -> bool:
+        """
+        Inserting consensus record into 'consensus_rates' collection in MongoDB
+
+        :param payload: consensus payload to insert into DB
+        :return: boolean status of insertion
+        """
+        from pymongo.errors import PyMongoError
+
+        try:
+            result = self._get_consensus_collection().insert_one(payload)
+        except PyMongoError as e:
+            logging.error(f'Can not insert consensus record into MongoDB.\nError: {e}')
+            raise DataBaseIsNotReachable
+        if result.inserted_id is not None:
+            logging.info(f'Consensus record was successfully created! Record ID: {result.inserted_id}')
+            return True
+        else:
+            logging.error(f'Consensus record was not created...')
+            return False
+
+    def insert_quarantine(self, payload: dict) -> bool:
+        """
+        Inserting rates, which did not pass validation, into 'quarantine' collection in MongoDB
+
+        :param payload: quarantine payload to insert into DB
+        :return: boolean status of insertion
+        """
+        from pymongo.errors import PyMongoError
+
+        try:
+            result = self._get_collection_or_create_new('quarantine').insert_one(payload)
+        except PyMongoError as e:
+            logging.error(f'Can not insert quarantine record into MongoDB.\nError: {e}')
+            raise DataBaseIsNotReachable
+        if result.inserted_id is not None:
+            logging.info(f'Quarantine record was successfully created! Record ID: {result.inserted_id}')
+            return True
+        else:
+            logging.error(f'Quarantine record was not created...')
+            return False
+
+    def get_latest_consensus(self):
+        """
+        Getting the latest consensus record by index lookup
+
+        :return: the latest consensus record or None if there are no records
+        """
+        from pymongo import DESCENDING
+        from pymongo.errors import PyMongoError
+
+        try:
+            return self._get_consensus_collection().find_one(sort=[('utc_time', DESCENDING)])
+        except PyMongoError as e:
+            logging.error(f'Can not get consensus record from MongoDB.\nError: {e}')
+            raise DataBaseIsNotReachable
+
+    def get_currency_statistics(self, resource_name: str, currency: str):
+        """
+        Getting statistics rollup of currency by ID lookup
+
+        :param resource_name: name of the resource
+        :param currency: currency name
+        :return: statistics rollup or None if there are no statistics yet
+        """
+        from pymongo.errors import PyMongoError
+
+        try:
+            statistics_collection = self._get_collection_or_create_new('currency_statistics')
+            return statistics_collection.find_one({'_id': f'{resource_name}:{currency}'})
+        except PyMongoError as e:
+            logging.error(f'Can not get currency statistics from MongoDB.\nError: {e}')
+            raise DataBaseIsNotReachable
+
+    def upsert_currency_statistics(self, rollups: list) -> int:
+        """
+        Bulk upserting statistics rollups into 'currency_statistics' collection in MongoDB
+
+        :param rollups: list of statistics rollups
+        :return: quantity of inserted or updated rollups
+        """
+        from pymongo import ReplaceOne
+        from pymongo.errors import PyMongoError
+
+        requests = [ReplaceOne({'_id': rollup['_id']}, rollup, upsert=True) for rollup in rollups]
+        try:
+            statistics_collection = self._get_collection_or_create_new('currency_statistics')
+            result = statistics_collection.bulk_write(requests, ordered=False)
+        except PyMongoError as e:
+            logging.error(f'Can not upsert currency statistics into MongoDB.\nError: {e}')
+            raise DataBaseIsNotReachable
+        return result.upserted_count + result.matched_count
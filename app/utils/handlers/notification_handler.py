@@ -1,51 +1,177 @@
-import os
+import queue
+import time
 import logging
 import platform
+import threading
+import subprocess
+
+from app.utils.handlers import tracing_handler
 
 
 class NotificationHandler:
-    def __init__(self, title: str = None, subtitle: str = None, description: str = None):
+    """
+    Sends push-notifications in background thread, so caller is never blocked by notification tool.
+    Notifications, which were sent within "coalesce_sec" one after another, are combined into one digest.
+    """
+    def __init__(
+            self, title: str = None, subtitle: str = None, description: str = None, webhook_url: str = None,
+            coalesce_sec: float = 1.0
+    ):
         self.title = title
         self.description = description
         self.subtitle = subtitle
+        self.webhook_url = webhook_url
+        self.coalesce_sec = coalesce_sec
+        self._queue = queue.Queue()
+        self._dispatcher = None
+
+    @staticmethod
+    def _run_command(command: list) -> None:
+        try:
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
+        except (OSError, subprocess.SubprocessError) as e:
+            logging.error(f'Can not execute notifier command: {command}\nError: {e}')
+        else:
+            logging.info(f'Notifier command: {command}\nReturned status: {result.returncode}')
 
-    def _send_notification_windows(self):
-        pass
+    def _send_notification_linux(self, notification: dict) -> None:
+        """
+        Using "notify-send" util and sends push-notification in Linux with currency information
 
-    def _send_notification_linux(self):
-        pass
+        :param notification: notification to send
+        :return: None
+        """
+        self._run_command([
+            'notify-send',
+            '--app-name', notification['title'] or '',
+            f'{notification["title"]}: {notification["subtitle"]}',
+            notification['description'] or '',
+        ])
 
-    def _send_notification_mac_os(self, group_id: int = 1, sound_type: str = 'default') -> None:
+    def _send_notification_mac_os(self, notification: dict) -> None:
         """
         Using "terminal-notifier" util and sends push-notification in macOS with currency information
 
-        :param group_id: int value for "terminal-notifier" util to determine, should old notification wil be deleted
-        :param sound_type: type of sound for notification
+        :param notification: notification to send, its "group_id" is used by "terminal-notifier" util to determine,
+            should old notification wil be deleted
         :return: None
         """
-        command = (
-            f'terminal-notifier -title {self.title} '
-            f'-subtitle "{self.subtitle}" '
-            f'-message "{self.description}" '
-            f'-group {group_id} '
-            f'-sound {sound_type}'
-        )
-        command_status = os.system(command)
-        logging.info(f'macOS Notifier command: {command}\nReturned status: {command_status}')
+        self._run_command([
+            'terminal-notifier',
+            '-title', notification['title'] or '',
+            '-subtitle', notification['subtitle'] or '',
+            '-message', notification['description'] or '',
+            '-group', str(notification['group_id']),
+            '-sound', notification['sound_type'],
+        ])
 
-    def send_push_notification(self, *args, **kwargs) -> None:
+    def _send_notification_webhook(self, notification: dict) -> None:
         """
-        Send push notification with currency information, depending on OS type
+        Sends notification as JSON to webhook URL, it works in any OS and in Docker as well
 
-        :param args: any positional arguments
-        :param kwargs: any keyword arguments
+        :param notification: notification to send
         :return: None
         """
-        if platform.system() == 'Linux':
-            raise NotImplementedError
+        import requests
+
+        try:
+            response = requests.post(self.webhook_url, json=notification, timeout=10)
+        except requests.RequestException as e:
+            logging.error(f'Can not send notification to webhook: {self.webhook_url}\nError: {e}')
+        else:
+            logging.info(
+                f'Webhook notification was sent to {self.webhook_url}\nReturned status: {response.status_code}'
+            )
+
+    def _get_sender(self):
+        """
+        Choosing notification backend, depending on config and OS type
+
+        :return: method, which sends notification
+        """
+        if self.webhook_url:
+            return self._send_notification_webhook
+        elif platform.system() == 'Linux':
+            return self._send_notification_linux
         elif platform.system() == 'Darwin':
-            self._send_notification_mac_os(*args, **kwargs)
+            return self._send_notification_mac_os
         elif platform.system() == 'Windows':
             raise NotImplementedError
         else:
             raise NotImplementedError
+
+    @staticmethod
+    def _make_digest(notifications: list) -> dict:
+        if len(notifications) == 1:
+            return notifications[0]
+        return {
+            'title': notifications[0]['title'],
+            'subtitle': f'{len(notifications)} updates',
+            'description': '\n'.join(
+                f'{notification["subtitle"]}\n{notification["description"]}' for notification in notifications
+            ),
+            'group_id': notifications[-1]['group_id'],
+            'sound_type': notifications[-1]['sound_type'],
+        }
+
+    def _dispatch(self, sender) -> None:
+        is_stopped = False
+        while not is_stopped:
+            notification = self._queue.get()
+            if notification is None:
+                break
+
+            # collecting burst of notifications into one digest
+            notifications = [notification]
+            deadline = time.monotonic() + self.coalesce_sec
+            while True:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    notification = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if notification is None:
+                    is_stopped = True
+                    break
+                notifications.append(notification)
+
+            # spans of dispatcher thread have no parent, since notifications of several resources are combined
+            with tracing_handler.span('send_notification_digest', notifications_count=len(notifications)):
+                sender(self._make_digest(notifications))
+
+    def send_push_notification(self, group_id: int = 1, sound_type: str = 'default') -> None:
+        """
+        Queues push notification with currency information, it will be sent in background depending on OS type
+
+        :param group_id: int value to determine, should old notification wil be deleted
+        :param sound_type: type of sound for notification
+        :return: None
+        """
+        with tracing_handler.span('send_push_notification', group_id=group_id):
+            sender = self._get_sender()
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch, args=(sender,), name='NotificationDispatcher', daemon=True
+                )
+                self._dispatcher.start()
+            self._queue.put({
+                'title': self.title,
+                'subtitle': self.subtitle,
+                'description': self.description,
+                'group_id': group_id,
+                'sound_type': sound_type,
+            })
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Sending queued notifications and stopping background thread
+
+        :param timeout: max time in seconds to wait for queued notifications
+        :return: None
+        """
+        if self._dispatcher is not None:
+            self._queue.put(None)
+            self._dispatcher.join(timeout)
+            self._dispatcher = None
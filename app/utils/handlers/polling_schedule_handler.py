@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import logging
+
+# weight of the latest observed update interval in estimation of resource update cadence
+CADENCE_SMOOTHING = 0.3
+
+
+class PollingScheduleHandler:
+    """
+    Decides when every resource has to be polled next time, instead of polling all of them every run:
+        - update cadence of resource is learned from provider timestamps of rates changes
+        - the next poll is scheduled right after expected publish time ("publish_grace_sec" after it)
+        - if rates did not change, interval grows by "backoff_factor" from "min_interval_sec" to "max_interval_sec"
+    Schedule is kept in "state_path" file, so it is shared by separate runs (e.g. cron ones).
+    """
+    def __init__(
+            self, state_path: str = 'polling_schedule.json', min_interval_sec: float = 300,
+            max_interval_sec: float = 86400, backoff_factor: float = 2.0, publish_grace_sec: float = 60
+    ):
+        self.state_path = state_path
+        self.min_interval_sec = min_interval_sec
+        self.max_interval_sec = max_interval_sec
+        self.backoff_factor = backoff_factor
+        self.publish_grace_sec = publish_grace_sec
+        # resource name -> schedule state
+        self.schedule = self._load()
+
+    def _load(self) -> dict:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as state_file:
+                return json.load(state_file)
+        except ValueError as e:
+            logging.error(f'Can not parse polling schedule "{self.state_path}". It will be learned again!\nError: {e}')
+            return {}
+
+    def save(self) -> None:
+        if not self.state_path:
+            return
+        temp_path = f'{self.state_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as state_file:
+            json.dump(self.schedule, state_file)
+        os.replace(temp_path, self.state_path)
+
+    def get_due_resources(self, resources: list, now: float = None) -> list:
+        """
+        Getting resources, which have to be polled now. Unknown resources are always polled
+
+        :param resources: names of resources
+        :param now: current unix timestamp
+        :return: names of resources to poll
+        """
+        now = time.time() if now is None else now
+        due_resources = [
+            resource_name for resource_name in resources
+            if self.schedule.get(resource_name, {}).get('next_poll_ts', 0) <= now
+        ]
+        skipped_resources = [resource_name for resource_name in resources if resource_name not in due_resources]
+        if skipped_resources:
+            logging.info(f'Resources {skipped_resources} are not due yet and will be skipped')
+        return due_resources
+
+    def get_sleep_time(self, now: float = None) -> float:
+        """
+        Getting time until the next due resource, but not less than "min_interval_sec"
+
+        :param now: current unix timestamp
+        :return: time to sleep in seconds
+        """
+        now = time.time() if now is None else now
+        next_poll_ts = min(
+            (state['next_poll_ts'] for state in self.schedule.values()), default=now + self.max_interval_sec
+        )
+        return min(max(next_poll_ts - now, self.min_interval_sec), self.max_interval_sec)
+
+    def _get_backoff_interval(self, misses: int) -> float:
+        return min(self.min_interval_sec * self.backoff_factor ** max(misses - 1, 0), self.max_interval_sec)
+
+    def observe(self, resource_name: str, currencies: dict, provider_ts: int = None, now: float = None) -> float:
+        """
+        Updating schedule of resource by result of its poll
+
+        :param resource_name: name of the resource
+        :param currencies: extracted currencies, empty if resource was not polled successfully
+        :param provider_ts: unix timestamp of rates update reported by resource
+        :param now: current unix timestamp
+        :return: unix timestamp of the next poll
+        """
+        now = time.time() if now is None else now
+        state = self.schedule.setdefault(resource_name, {
+            'cadence_sec': None, 'last_provider_ts': None, 'last_rates': None, 'misses': 0, 'next_poll_ts': 0,
+        })
+        rates = {currency: list(currency_rates) for currency, currency_rates in currencies.items()}
+
+        if rates and rates != state['last_rates']:
+            last_provider_ts = state['last_provider_ts']
+            if last_provider_ts is not None and provider_ts is not None and provider_ts > last_provider_ts:
+                observed_interval = provider_ts - last_provider_ts
+                if state['cadence_sec'] is None:
+                    state['cadence_sec'] = observed_interval
+                else:
+                    state['cadence_sec'] += CADENCE_SMOOTHING * (observed_interval - state['cadence_sec'])
+            state.update(last_provider_ts=provider_ts, last_rates=rates, misses=0)
+        else:
+            state['misses'] += 1
+
+        expected_publish_ts = None
+        if state['cadence_sec'] is not None and state['last_provider_ts'] is not None:
+            expected_publish_ts = state['last_provider_ts'] + state['cadence_sec'] + self.publish_grace_sec
+        if expected_publish_ts is not None and expected_publish_ts > now:
+            # nothing new is expected before publish time, backoff starts from "min_interval_sec" after it
+            next_poll_ts = max(expected_publish_ts, now + self.min_interval_sec)
+            state['misses'] = 0
+        else:
+            next_poll_ts = now + self._get_backoff_interval(state['misses'])
+        state['next_poll_ts'] = min(next_poll_ts, now + self.max_interval_sec)
+
+        logging.info(
+            f'Resource "{resource_name}" will be polled in {state["next_poll_ts"] - now:.0f} sec '
+            f'(cadence: {state["cadence_sec"]}, polls without changes: {state["misses"]})'
+        )
+        return state['next_poll_ts']
@@ -0,0 +1,72 @@
+import time
+import logging
+
+from app.utils.rate_math import cross_rates
+
+# extracted rates are prices of currencies in UAH, as CurrencyExtractionHandler.change_currency_base makes them
+SOURCE_BASE_CURRENCY = 'UAH'
+
+
+class ProfileHandler:
+    """
+    Derives rates views of several profiles (watchlists of teams) with their own currencies and base currency.
+    Resources are requested once per run for currencies of all profiles (see ConfigHandler.get_currencies_of_interest),
+    view of every profile is filtered and rebased from these shared rates in memory,
+    so quantity of requests to resources does not grow with quantity of profiles.
+    """
+    def __init__(self, profiles: dict):
+        # profile name -> (currencies, base currency)
+        self.profiles = {
+            profile_name: (
+                tuple(dict.fromkeys(profile['main_currencies'].split())),
+                profile.get('base_currency', SOURCE_BASE_CURRENCY),
+            )
+            for profile_name, profile in profiles.items()
+        }
+
+    def get_view(self, profile_name: str, currencies) -> dict:
+        """
+        Getting rates of profile currencies in profile base currency
+
+        :param profile_name: name of the profile
+        :param currencies: extracted currencies, prices in UAH
+        :return: currency -> (sale, purchase) in profile base, None if profile base was not extracted
+        """
+        profile_currencies, base_currency = self.profiles[profile_name]
+        if base_currency != SOURCE_BASE_CURRENCY:
+            if base_currency not in currencies:
+                return None
+            currencies = dict(currencies)
+            currencies[SOURCE_BASE_CURRENCY] = (1.0, 1.0)
+            currencies = cross_rates(currencies, base_currency)
+        return {currency: currencies[currency] for currency in profile_currencies if currency in currencies}
+
+    def derive(self, resource_name: str, currencies, provider_ts: int) -> list:
+        """
+        Deriving rates views of all profiles from extracted currencies of resource
+
+        :param resource_name: name of the resource
+        :param currencies: extracted currencies, prices in UAH
+        :param provider_ts: unix timestamp of rates update reported by resource
+        :return: list of profile payloads
+        """
+        utc_time = time.time()
+        payloads = []
+        for profile_name, (_, base_currency) in self.profiles.items():
+            view = self.get_view(profile_name, currencies)
+            if view is None:
+                logging.warning(
+                    f'Base currency "{base_currency}" of profile "{profile_name}" was not extracted from '
+                    f'"{resource_name}". Profile view will be skipped'
+                )
+                continue
+            payloads.append({
+                'utc_time': utc_time,
+                'utc_offset': time.timezone,
+                'provider_ts': provider_ts,
+                'resource_name': resource_name,
+                'profile': profile_name,
+                'base_currency': base_currency,
+                'currencies': view,
+            })
+        return payloads
@@ -0,0 +1,136 @@
+import os
+import sys
+import signal
+import logging
+import datetime
+import threading
+import tracemalloc
+import contextlib
+from collections import Counter
+
+# allocations of these files are the profiler own ones
+TRACEMALLOC_IGNORED_FILES = (tracemalloc.__file__, '<frozen importlib._bootstrap>', __file__)
+
+
+class ProfilingHandler:
+    """
+    Profiles cycles of long-running process without its restart:
+        - CPU - call stacks of all threads are sampled every "interval_sec" by background thread,
+          they are saved in collapsed stack format ("cpu_<time>.folded"), which is input of flamegraph.pl or speedscope
+        - memory - tracemalloc snapshot is taken after every cycle and compared with snapshot of previous cycle,
+          the top "top_stats" growing allocations are saved into "memory_<time>.txt"
+    Profiling is enabled from start by "enabled" or toggled by signal at any time, it takes effect from the next cycle.
+    """
+    def __init__(
+            self, path: str = 'profiles', interval_sec: float = 0.01, top_stats: int = 20, enabled: bool = False,
+            tracemalloc_frames: int = 10
+    ):
+        self.path = path
+        self.interval_sec = interval_sec
+        self.top_stats = top_stats
+        self.enabled = enabled
+        self.tracemalloc_frames = tracemalloc_frames
+        self._stacks = Counter()
+        self._sampler = None
+        self._sampler_stop = threading.Event()
+        self._previous_snapshot = None
+
+    def toggle(self, *args) -> None:
+        """
+        Switching profiling on/off, can be used as signal handler
+
+        :return: None
+        """
+        self.enabled = not self.enabled
+        logging.warning(f'Profiling is {"enabled" if self.enabled else "disabled"} from the next cycle')
+
+    def install_signal_handler(self, signal_number: int = signal.SIGUSR1) -> None:
+        signal.signal(signal_number, self.toggle)
+
+    @staticmethod
+    def _collapse_stack(thread_name: str, frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        stack.append(thread_name)
+        return ';'.join(reversed(stack))
+
+    def _sample(self) -> None:
+        sampler_id = threading.get_ident()
+        while not self._sampler_stop.wait(self.interval_sec):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != sampler_id:
+                    self._stacks[self._collapse_stack(thread_names.get(thread_id, str(thread_id)), frame)] += 1
+
+    def start_cycle(self) -> None:
+        if not self.enabled:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+                self._previous_snapshot = None
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+        self._stacks.clear()
+        self._sampler_stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name='ProfilingSampler', daemon=True)
+        self._sampler.start()
+
+    def _save_cpu_profile(self, cycle_time: str) -> str:
+        profile_path = os.path.join(self.path, f'cpu_{cycle_time}.folded')
+        with open(profile_path, 'w', encoding='utf-8') as profile_file:
+            for stack, samples_count in self._stacks.most_common():
+                profile_file.write(f'{stack} {samples_count}\n')
+        return profile_path
+
+    def _save_memory_profile(self, cycle_time: str) -> str:
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, file_name) for file_name in TRACEMALLOC_IGNORED_FILES]
+        )
+        if self._previous_snapshot is None:
+            title = 'Top allocations (the first profiled cycle)'
+            stats = snapshot.statistics('lineno')
+        else:
+            title = 'Top allocations growth since the previous profiled cycle'
+            stats = snapshot.compare_to(self._previous_snapshot, 'lineno')
+        self._previous_snapshot = snapshot
+
+        current_size, peak_size = tracemalloc.get_traced_memory()
+        profile_path = os.path.join(self.path, f'memory_{cycle_time}.txt')
+        with open(profile_path, 'w', encoding='utf-8') as profile_file:
+            profile_file.write(f'Traced memory: current {current_size} B, peak {peak_size} B\n{title}:\n')
+            for stat in stats[:self.top_stats]:
+                profile_file.write(f'{stat}\n')
+        return profile_path
+
+    def stop_cycle(self) -> tuple:
+        """
+        Stopping sampling and saving CPU and memory profiles of the cycle
+
+        :return: paths to CPU and memory profiles or Nones if cycle was not profiled
+        """
+        if self._sampler is None:
+            return None, None
+        self._sampler_stop.set()
+        self._sampler.join()
+        self._sampler = None
+
+        os.makedirs(self.path, exist_ok=True)
+        cycle_time = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        cpu_profile_path = self._save_cpu_profile(cycle_time)
+        memory_profile_path = self._save_memory_profile(cycle_time)
+        logging.info(
+            f'Cycle was profiled by {sum(self._stacks.values())} samples: {cpu_profile_path}, {memory_profile_path}'
+        )
+        return cpu_profile_path, memory_profile_path
+
+    @contextlib.contextmanager
+    def profile_cycle(self):
+        self.start_cycle()
+        try:
+            yield
+        finally:
+            self.stop_cycle()
@@ -0,0 +1,208 @@
+import os
+import math
+import time
+import json
+import zlib
+import struct
+import logging
+
+ARCHIVE_MAGIC = b'CMRA'
+ARCHIVE_HEADER = struct.Struct('>4sI')  # magic, CRC32 of compression dictionary
+MAX_DICTIONARY_SIZE = 32768  # zlib window size
+# min quantity of archives per worker process, fewer archives are reprocessed faster in process than by pool start
+MIN_ARCHIVES_PER_WORKER = 50
+# archives of every worker are split into chunks, so workers are balanced, but handlers are not pickled per archive
+CHUNKS_PER_WORKER = 4
+
+
+def _reprocess_archive(archive_handler, handler, config_helper, archive_path: str):
+    """
+    Re-running extraction handler over archived response
+
+    :param archive_handler: instance of RawArchiveHandler
+    :param handler: currency extraction handler
+    :param config_helper: instance of ConfigHandler
+    :param archive_path: path to archived response
+    :return: exchange rate of currencies of interest and unix timestamp of rates update
+    """
+    response_data = json.loads(archive_handler.load(archive_path))
+    return handler(config_helper, response_data=response_data, response_ts=archive_handler.get_archive_ts(archive_path))
+
+
+def _reprocess_archives(archive_handler, handler, config_helper, archive_paths: list) -> list:
+    """
+    Re-running extraction handler over chunk of archived responses. Executed in worker process or in process.
+    Archives are read by worker itself, so only their paths and small extracted rates are passed between processes
+
+    :param archive_handler: instance of RawArchiveHandler
+    :param handler: currency extraction handler
+    :param config_helper: instance of ConfigHandler
+    :param archive_paths: paths to archived responses
+    :return: list of (extracted currencies and unix timestamp of rates update, error) per archive
+    """
+    results = []
+    for archive_path in archive_paths:
+        try:
+            results.append((_reprocess_archive(archive_handler, handler, config_helper, archive_path), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+class RawArchiveHandler:
+    """
+    Keeps raw responses of resources in local files, so they could be reprocessed after resource format change.
+    Responses are compressed by zlib with preset dictionary per resource: the first archived response of resource
+    is used as dictionary, since responses of the same resource have mostly the same keys and currencies.
+    """
+    def __init__(self, path: str, ttl_sec: int = 2592000, level: int = 9):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.level = level
+        # resource name -> (CRC32 of dictionary, dictionary)
+        self._dictionaries = {}
+
+    def _get_resource_path(self, resource_name: str) -> str:
+        resource_path = os.path.join(self.path, resource_name)
+        os.makedirs(resource_path, exist_ok=True)
+        return resource_path
+
+    def _get_dictionary(self, resource_name: str, sample: bytes = None) -> tuple:
+        """
+        Getting compression dictionary of resource, it is created from sample if resource has no dictionary yet
+
+        :param resource_name: name of the resource
+        :param sample: response of resource
+        :return: CRC32 of dictionary and dictionary itself
+        """
+        if resource_name in self._dictionaries:
+            return self._dictionaries[resource_name]
+
+        dictionary_path = os.path.join(self._get_resource_path(resource_name), 'dictionary.bin')
+        if not os.path.exists(dictionary_path) and sample is not None:
+            logging.info(f'Creating compression dictionary for resource "{resource_name}"')
+            with open(dictionary_path, 'wb') as dictionary_file:
+                dictionary_file.write(sample[-MAX_DICTIONARY_SIZE:])
+        with open(dictionary_path, 'rb') as dictionary_file:
+            dictionary = dictionary_file.read()
+
+        self._dictionaries[resource_name] = (zlib.crc32(dictionary), dictionary)
+        return self._dictionaries[resource_name]
+
+    def save(self, resource_name: str, content: bytes) -> str:
+        """
+        Compressing and saving raw response of resource
+
+        :param resource_name: name of the resource
+        :param content: raw response body
+        :return: path to archived response
+        """
+        dictionary_crc, dictionary = self._get_dictionary(resource_name, content)
+        compressor = zlib.compressobj(self.level, zdict=dictionary)
+        archive_path = os.path.join(self._get_resource_path(resource_name), f'{time.time_ns()}.raw')
+        with open(archive_path, 'wb') as archive_file:
+            archive_file.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, dictionary_crc))
+            archive_file.write(compressor.compress(content) + compressor.flush())
+        logging.info(f'Response of "{resource_name}" was archived: {archive_path} ({len(content)} bytes)')
+        return archive_path
+
+    def load(self, archive_path: str) -> bytes:
+        """
+        Loading and decompressing archived raw response
+
+        :param archive_path: path to archived response
+        :return: raw response body
+        """
+        with open(archive_path, 'rb') as archive_file:
+            magic, dictionary_crc = ARCHIVE_HEADER.unpack(archive_file.read(ARCHIVE_HEADER.size))
+            compressed_content = archive_file.read()
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError(f'File "{archive_path}" is not archived response')
+
+        resource_name = os.path.basename(os.path.dirname(archive_path))
+        resource_dictionary_crc, dictionary = self._get_dictionary(resource_name)
+        if dictionary_crc != resource_dictionary_crc:
+            raise ValueError(f'Compression dictionary of "{resource_name}" does not match archive "{archive_path}"')
+        decompressor = zlib.decompressobj(zdict=dictionary)
+        return decompressor.decompress(compressed_content) + decompressor.flush()
+
+    @staticmethod
+    def get_archive_ts(archive_path: str) -> float:
+        """
+        Getting time of response receiving by name of archive
+
+        :param archive_path: path to archived response
+        :return: unix timestamp of response receiving
+        """
+        return int(os.path.splitext(os.path.basename(archive_path))[0]) / 1e9
+
+    def list_archives(self, resource_name: str) -> list:
+        resource_path = os.path.join(self.path, resource_name)
+        if not os.path.isdir(resource_path):
+            return []
+        return sorted(
+            os.path.join(resource_path, file_name) for file_name in os.listdir(resource_path)
+            if file_name.endswith('.raw')
+        )
+
+    def evict(self) -> int:
+        """
+        Removing archived responses, which are older than TTL
+
+        :return: quantity of removed archives
+        """
+        if not os.path.isdir(self.path):
+            return 0
+        expired_time = time.time() - self.ttl_sec
+        removed_quantity = 0
+        for resource_name in os.listdir(self.path):
+            for archive_path in self.list_archives(resource_name):
+                if os.path.getmtime(archive_path) < expired_time:
+                    os.remove(archive_path)
+                    removed_quantity += 1
+        logging.info(f'{removed_quantity} expired archived responses were removed')
+        return removed_quantity
+
+    def _reprocess_in_pool(self, handler, config_helper, archives: list, workers: int) -> list:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunk_size = math.ceil(len(archives) / (workers * CHUNKS_PER_WORKER))
+        chunks = [archives[start:start + chunk_size] for start in range(0, len(archives), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_reprocess_archives, self, handler, config_helper, chunk) for chunk in chunks]
+            return [result for future in futures for result in future.result()]
+
+    def reprocess(self, resource_name: str, handler, config_helper, workers: int = None) -> list:
+        """
+        Re-running extraction handler over all archived responses of resource: decompressing, parsing and rebasing
+        of large responses are CPU-bound, so they are run in worker processes, if there are enough archives for them.
+        Archives, which can not be reprocessed, are logged and skipped
+
+        :param resource_name: name of the resource
+        :param handler: currency extraction handler of resource
+        :param config_helper: instance of ConfigHandler
+        :param workers: max quantity of worker processes, quantity of CPUs by default
+        :return: list of extracted currencies and unix timestamps of rates update
+        """
+        archives = self.list_archives(resource_name)
+        logging.info(f'Reprocessing {len(archives)} archived responses of "{resource_name}"')
+        if not archives:
+            return []
+        workers = min(workers or os.cpu_count() or 1, len(archives) // MIN_ARCHIVES_PER_WORKER)
+        if workers > 1:
+            logging.info(f'Archived responses of "{resource_name}" are reprocessed in {workers} worker processes')
+            archive_results = self._reprocess_in_pool(handler, config_helper, archives, workers)
+        else:
+            archive_results = _reprocess_archives(self, handler, config_helper, archives)
+
+        results = []
+        failed_quantity = 0
+        for archive_path, (result, error) in zip(archives, archive_results):
+            if error is not None:
+                logging.error(f'Can not reprocess archived response "{archive_path}".\nError: {error}')
+                failed_quantity += 1
+            else:
+                results.append(result)
+        if failed_quantity:
+            logging.warning(f'{failed_quantity}/{len(archives)} archived responses of "{resource_name}" were skipped')
+        return results
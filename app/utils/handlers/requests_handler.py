@@ -1,30 +1,174 @@
+import os
+import json
+import time
+import logging
+import threading
 from http import HTTPStatus
+from typing import TYPE_CHECKING
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlencode
 
-import requests
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_result, RetryCallState
+from app.utils.handlers import tracing_handler
 
+if TYPE_CHECKING:
+    import requests
+    from tenacity import RetryCallState
 
-def _return_last_value(retry_state: RetryCallState):
+# directory to record responses into, recording is disabled if it is None
+RECORD_PATH = None
+# validators of the last responses for conditional requests: request key -> ETag, Last-Modified and body of response.
+# Only the last used VALIDATORS_MAX_SIZE requests are kept, so keys of past dates do not grow them and checkpoint
+VALIDATORS = OrderedDict()
+VALIDATORS_MAX_SIZE = 100
+# number of the current attempt of GET request in this thread, it is set by tenacity before every attempt
+_ATTEMPT = threading.local()
+# GET request with retries, it is built by the first request, so HTTP and retry libraries are not imported with app
+_RETRYING_GET = None
+
+
+def get_record_name(url: str) -> str:
+    """
+    Getting name of records directory by URL path, so responses of one endpoint are kept together
+
+    :param url: request URL
+    :return: name of records directory
+    """
+    return urlsplit(url).path.strip('/').replace('/', '__') or 'root'
+
+
+def record_response(response: 'requests.Response') -> str:
+    """
+    Saving response to records directory, so it could be replayed by stand-in server
+
+    :param response: HTTP response
+    :return: path to record
+    """
+    record_dir = os.path.join(RECORD_PATH, get_record_name(response.url))
+    os.makedirs(record_dir, exist_ok=True)
+    record_path = os.path.join(record_dir, f'{time.time_ns()}.json')
+    with open(record_path, 'w', encoding='utf-8') as record_file:
+        json.dump({
+            'url': response.url,
+            'status_code': response.status_code,
+            'content_type': response.headers.get('Content-Type', 'application/json'),
+            'body': response.text,
+        }, record_file)
+    logging.info(f'Response of {response.url} was recorded: {record_path}')
+    return record_path
+
+
+def get_request_key(url: str, params=None) -> str:
+    """
+    Getting key of request by URL and query params, so requests for different params do not share validators
+
+    :param url: request URL
+    :param params: query params of request
+    :return: key of request
+    """
+    if not params:
+        return url
+    return f'{url}?{urlencode(sorted(dict(params).items()))}'
+
+
+def set_validator(request_key: str, validator: dict) -> None:
+    """
+    Keeping validator of request, validators of the least recently used requests are evicted
+
+    :param request_key: key of request
+    :param validator: ETag, Last-Modified and body of response
+    :return: None
+    """
+    VALIDATORS[request_key] = validator
+    VALIDATORS.move_to_end(request_key)
+    while len(VALIDATORS) > VALIDATORS_MAX_SIZE:
+        VALIDATORS.popitem(last=False)
+
+
+def _return_last_value(retry_state: 'RetryCallState'):
     return retry_state.outcome.result()
 
 
-def _status_check(response_object: requests.Response) -> bool:
+def _remember_attempt(retry_state: 'RetryCallState'):
+    # statistics of retrying are not reachable from decorated function in the same way by all tenacity versions
+    _ATTEMPT.number = retry_state.attempt_number
+
+
+def _status_check(response_object: 'requests.Response') -> bool:
     return (
             response_object.status_code >= HTTPStatus.MULTIPLE_CHOICES
-            and response_object.status_code != HTTPStatus.NOT_FOUND
+            and response_object.status_code not in (HTTPStatus.NOT_MODIFIED, HTTPStatus.NOT_FOUND)
     )
 
 
-@retry(retry=(retry_if_result(_status_check)), stop=stop_after_attempt(3),
-       retry_error_callback=_return_last_value,
-       wait=wait_exponential(multiplier=1, min=4, max=10))
-def get_with_retry(*args, **kwargs) -> requests.Response:
+def _get(*args, **kwargs) -> 'requests.Response':
+    import requests
+
+    # span is opened per attempt, so retries and their waits are visible in trace
+    url = args[0] if args else kwargs.get('url')
+    resend_count = getattr(_ATTEMPT, 'number', 1) - 1
+    with tracing_handler.span(
+            'GET', tracing_handler.SPAN_KIND_CLIENT, **{'url.full': url, 'http.request.resend_count': resend_count}
+    ) as request_span:
+        response = requests.get(*args, **kwargs)
+        if request_span is not None:
+            request_span.set_attribute('http.response.status_code', response.status_code)
+            # time between request sending and response headers receiving
+            request_span.set_attribute('http.server_time_ms', response.elapsed.total_seconds() * 1000)
+        return response
+
+
+def _get_with_retry(*args, **kwargs) -> 'requests.Response':
+    global _RETRYING_GET
+
+    if _RETRYING_GET is None:
+        from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_result
+
+        _RETRYING_GET = retry(
+            retry=(retry_if_result(_status_check)), stop=stop_after_attempt(3),
+            retry_error_callback=_return_last_value, before=_remember_attempt,
+            wait=wait_exponential(multiplier=1, min=4, max=10)
+        )(_get)
+    return _RETRYING_GET(*args, **kwargs)
+
+
+def get_with_retry(*args, conditional: bool = True, **kwargs) -> 'requests.Response':
     """
     GET request.
     Trying to execute GET request. In case of any errors, re-trying 3 times, after it, returns result.
+    Request is conditional, if resource returned ETag or Last-Modified before, body of the last response
+    is reused, if resource answered "304 Not Modified".
+    Result is recorded in case of RECORD_PATH is set.
     :param args: any GET request's args
+    :param conditional: keep validators of response, it is disabled for one-off requests (e.g. rates of past dates)
     :param kwargs: any GET request's kwargs
 
     :return: HTTP response
     """
-    return requests.get(*args, **kwargs)
+    url = args[0] if args else kwargs.get('url')
+    request_key = get_request_key(url, args[1] if len(args) > 1 else kwargs.get('params'))
+    validator = VALIDATORS.get(request_key) if conditional else None
+    if validator is not None:
+        VALIDATORS.move_to_end(request_key)
+        headers = dict(kwargs.get('headers') or {})
+        if validator['etag']:
+            headers['If-None-Match'] = validator['etag']
+        if validator['last_modified']:
+            headers['If-Modified-Since'] = validator['last_modified']
+        kwargs['headers'] = headers
+
+    response = _get_with_retry(*args, **kwargs)
+    if response.status_code == HTTPStatus.NOT_MODIFIED and validator is not None:
+        logging.info(f'Response of {url} was not modified. The last response will be reused')
+        response.status_code = HTTPStatus.OK
+        # requests has no public setter of body
+        response._content = validator['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+    elif response.status_code == HTTPStatus.OK and conditional:
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if etag or last_modified:
+            set_validator(request_key, {'etag': etag, 'last_modified': last_modified, 'body': response.text})
+        else:
+            VALIDATORS.pop(request_key, None)
+    if RECORD_PATH is not None:
+        record_response(response)
+    return response
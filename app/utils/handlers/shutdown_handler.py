@@ -0,0 +1,40 @@
+import signal
+import logging
+import threading
+
+
+class ShutdownHandler:
+    """
+    Graceful shutdown of long-running process by signal (SIGTERM of "docker stop", SIGINT).
+    Signal only requests shutdown: in-flight request and DB insert of current resource are completed,
+    the rest resources are skipped and the run is finished as usual (spool is flushed, checkpoint is saved).
+    Sleep between runs is interrupted at once. The second signal interrupts the run right away.
+    """
+    def __init__(self):
+        self.is_requested = threading.Event()
+
+    def request(self, signal_number: int = None, *args) -> None:
+        """
+        Requesting shutdown, can be used as signal handler
+
+        :param signal_number: number of received signal
+        :return: None
+        """
+        if self.is_requested.is_set():
+            logging.warning('Shutdown was requested again. The run is interrupted')
+            raise KeyboardInterrupt
+        logging.warning(f'Shutdown was requested by signal {signal_number}. The current resource will be completed')
+        self.is_requested.set()
+
+    def install_signal_handlers(self, signal_numbers: tuple = (signal.SIGTERM, signal.SIGINT)) -> None:
+        for signal_number in signal_numbers:
+            signal.signal(signal_number, self.request)
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Sleeping until timeout or shutdown request
+
+        :param timeout: time to sleep in seconds
+        :return: True if shutdown was requested
+        """
+        return self.is_requested.wait(timeout)
@@ -0,0 +1,190 @@
+import os
+import logging
+import threading
+
+from app.utils.rate_records import to_document
+from app.utils.custom_exceptions import DataBaseIsNotReachable
+
+
+class SpoolHandler:
+    """
+    Append-only local file which keeps DB payloads while MongoDB is not reachable.
+    Every payload is stored as one JSON line, file is fsync-ed once per "fsync_batch_size" payloads.
+    Legacy payloads, which can not be upserted (without "provider_ts"), are moved into "<path>.legacy" on drain.
+    """
+    def __init__(self, path: str, fsync_batch_size: int = 10):
+        self.path = path
+        self.fsync_batch_size = fsync_batch_size
+        self._lock = threading.Lock()
+        self._file = None
+        self._not_synced_quantity = 0
+        self._drainer = None
+
+    @property
+    def _draining_path(self) -> str:
+        return f'{self.path}.draining'
+
+    @property
+    def _legacy_path(self) -> str:
+        return f'{self.path}.legacy'
+
+    def has_pending(self) -> bool:
+        return os.path.exists(self.path) or os.path.exists(self._draining_path)
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def _sync(self) -> None:
+        if self._file is not None and self._not_synced_quantity:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._not_synced_quantity = 0
+
+    def append(self, payload: dict) -> None:
+        """
+        Appending payload to the spool file
+
+        :param payload: DB payload, which can not be inserted right now
+        :return: None
+        """
+        from bson import json_util
+
+        payload = to_document(payload)
+        with self._lock:
+            spool_file = self._open()
+            spool_file.write(json_util.dumps(payload) + '\n')
+            self._not_synced_quantity += 1
+            if self._not_synced_quantity >= self.fsync_batch_size:
+                self._sync()
+        logging.warning(f'Payload of "{payload.get("resource_name")}" was spooled into "{self.path}"')
+
+    def flush(self) -> None:
+        """
+        Forcing fsync of all appended, but not synced yet payloads
+
+        :return: None
+        """
+        with self._lock:
+            self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            self._sync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _read_payloads(self, path: str) -> list:
+        from bson import json_util
+
+        payloads = []
+        with open(path, 'r', encoding='utf-8') as spool_file:
+            for line in spool_file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    payloads.append(json_util.loads(line))
+                except ValueError as e:
+                    # the last line can be cut, if process was killed during write
+                    logging.error(f'Can not parse spooled payload: {line}. It will be skipped!\nError: {e}')
+        return payloads
+
+    def drain(self, db_client, batch_size: int = 500, statistics_handler=None) -> int:
+        """
+        Replaying spooled payloads into MongoDB by bulk upserts.
+        Not replayed payloads are left in spool in case of DB is still not reachable.
+
+        :param db_client: instance of MongoDBHandler
+        :param batch_size: max quantity of payloads per one bulk write
+        :param statistics_handler: instance of StatisticsHandler to update statistics by replayed payloads (optional)
+        :return: quantity of replayed payloads
+        """
+        with self._lock:
+            # payloads of previous failed drain are replayed first
+            if not os.path.exists(self._draining_path):
+                if not os.path.exists(self.path):
+                    return 0
+                self._sync()
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                os.replace(self.path, self._draining_path)
+
+        payloads = self._read_payloads(self._draining_path)
+        # payloads spooled before records were keyed by (resource_name, provider_ts) can not be upserted
+        legacy_payloads = [
+            payload for payload in payloads if 'resource_name' not in payload or 'provider_ts' not in payload
+        ]
+        if legacy_payloads:
+            self._quarantine_legacy(legacy_payloads)
+            payloads = [
+                payload for payload in payloads if 'resource_name' in payload and 'provider_ts' in payload
+            ]
+        replayed_quantity = 0
+        try:
+            for start in range(0, len(payloads), batch_size):
+                batch = payloads[start:start + batch_size]
+                # payloads of profiles views are spooled together with records, but saved into own collection
+                records = [payload for payload in batch if 'profile' not in payload]
+                profile_records = [payload for payload in batch if 'profile' in payload]
+                # the same record could be spooled several times, statistics are updated by inserted ones only
+                inserted_records = db_client.replay_records(records) if records else []
+                if profile_records:
+                    db_client.upsert_profile_records(profile_records)
+                replayed_quantity = min(start + batch_size, len(payloads))
+                if statistics_handler is not None and inserted_records:
+                    statistics_handler.update_replayed(db_client, inserted_records)
+        except DataBaseIsNotReachable:
+            from bson import json_util
+
+            logging.warning(
+                f'DB is still not reachable. {len(payloads) - replayed_quantity} payloads are left in spool'
+            )
+            with self._lock:
+                with open(self._draining_path, 'w', encoding='utf-8') as draining_file:
+                    for payload in payloads[replayed_quantity:]:
+                        draining_file.write(json_util.dumps(payload) + '\n')
+                    draining_file.flush()
+                    os.fsync(draining_file.fileno())
+            return replayed_quantity
+
+        os.remove(self._draining_path)
+        logging.info(f'{replayed_quantity} spooled payloads were replayed into DB')
+        return replayed_quantity
+
+    def _quarantine_legacy(self, payloads: list) -> None:
+        from bson import json_util
+
+        with self._lock:
+            with open(self._legacy_path, 'a', encoding='utf-8') as legacy_file:
+                for payload in payloads:
+                    legacy_file.write(json_util.dumps(payload) + '\n')
+                legacy_file.flush()
+                os.fsync(legacy_file.fileno())
+        logging.warning(
+            f'{len(payloads)} spooled payloads without "provider_ts" can not be replayed. '
+            f'They were moved into "{self._legacy_path}"'
+        )
+
+    def start_drainer(self, db_client, statistics_handler=None) -> None:
+        """
+        Starting replay of spooled payloads in background thread, so resources processing is not blocked by it
+
+        :param db_client: instance of MongoDBHandler
+        :param statistics_handler: instance of StatisticsHandler to update statistics by replayed payloads (optional)
+        :return: None
+        """
+        if self._drainer is not None and self._drainer.is_alive():
+            return
+        self._drainer = threading.Thread(
+            target=self.drain, args=(db_client,), kwargs={'statistics_handler': statistics_handler},
+            name='SpoolDrainer', daemon=True,
+        )
+        self._drainer.start()
+
+    def wait_drainer(self, timeout: float = None) -> None:
+        if self._drainer is not None:
+            self._drainer.join(timeout)
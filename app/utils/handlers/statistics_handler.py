@@ -0,0 +1,228 @@
+import math
+import logging
+import threading
+from collections import deque
+
+from app.utils.handlers.mongo_db_handler import MongoDBHandler
+from app.utils.custom_exceptions import DataBaseIsNotReachable
+
+
+class RollingWindow:
+    """
+    The last "size" values with their mean, sum of squared deviations (sliding Welford's algorithm) and extremes.
+    All of them are updated in O(1), extremes are kept in monotonic deques of (index, value), so it is amortized O(1)
+    """
+    __slots__ = ('size', 'values', 'mean', 'm2', '_index', '_minimums', '_maximums')
+
+    def __init__(self, size: int, values: list = ()):
+        self.size = size
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._index = 0
+        self._minimums = deque()
+        self._maximums = deque()
+        for value in list(values)[-size:]:
+            self.append(value)
+
+    def append(self, value: float) -> None:
+        if len(self.values) == self.size:
+            # the oldest value is replaced by the new one, so quantity of values is not changed
+            removed_value = self.values.popleft()
+            previous_mean = self.mean
+            self.mean += (value - removed_value) / self.size
+            self.m2 += (value - removed_value) * (value - self.mean + removed_value - previous_mean)
+        else:
+            delta = value - self.mean
+            self.mean += delta / (len(self.values) + 1)
+            self.m2 += delta * (value - self.mean)
+        self.values.append(value)
+
+        while self._minimums and self._minimums[-1][1] >= value:
+            self._minimums.pop()
+        self._minimums.append((self._index, value))
+        while self._maximums and self._maximums[-1][1] <= value:
+            self._maximums.pop()
+        self._maximums.append((self._index, value))
+        self._index += 1
+        # only one value leaves window per append
+        oldest_index = self._index - len(self.values)
+        if self._minimums[0][0] < oldest_index:
+            self._minimums.popleft()
+        if self._maximums[0][0] < oldest_index:
+            self._maximums.popleft()
+
+    @property
+    def volatility(self) -> float:
+        if len(self.values) < 2:
+            return 0.0
+        # rounding errors of sliding updates can make it slightly negative for constant values
+        return math.sqrt(max(self.m2, 0.0) / (len(self.values) - 1))
+
+    @property
+    def minimum(self) -> float:
+        return self._minimums[0][1]
+
+    @property
+    def maximum(self) -> float:
+        return self._maximums[0][1]
+
+
+class StatisticsHandler:
+    """
+    Maintains rolling statistics of mid rate per resource and currency, updated incrementally on every new record:
+    SMA, volatility, min and max over the last "window" rates, EMA and count of all rates.
+    Statistics are persisted into small rollup document, so reading of them does not require scan of records.
+    """
+    def __init__(self, window: int = 20, ema_alpha: float = 0.1):
+        self.window = window
+        self.ema_alpha = ema_alpha
+        # (resource name, currency) -> statistics rollup
+        self._rollups = {}
+        # ID of statistics rollup -> rolling window of its rates
+        self._windows = {}
+        # statistics are updated by main thread and by replay of spooled records
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _create_rollup(resource_name: str, currency: str) -> dict:
+        return {
+            '_id': f'{resource_name}:{currency}',
+            'resource_name': resource_name,
+            'currency': currency,
+            'last_ts': None,
+            'count': 0,
+            'volatility': 0.0,
+            'min': None,
+            'max': None,
+            'ema': None,
+            'sma': None,
+            'window_values': [],
+            # provider timestamps of window values, replayed rates are deduplicated and ordered by them
+            'window_ts': [],
+        }
+
+    def _get_window(self, rollup: dict) -> RollingWindow:
+        window = self._windows.get(rollup['_id'])
+        if window is None:
+            # rollups saved before windowed statistics keep the last rates in "sma_values"
+            values = rollup.get('window_values', rollup.get('sma_values', []))
+            window = self._windows[rollup['_id']] = RollingWindow(self.window, values)
+        return window
+
+    @staticmethod
+    def _get_window_ts(rollup: dict) -> list:
+        # rollups saved before replay ordering do not keep timestamps of window values
+        values_quantity = len(rollup.get('window_values', []))
+        window_ts = rollup.get('window_ts', [])[-values_quantity:] if values_quantity else []
+        return [None] * (values_quantity - len(window_ts)) + window_ts
+
+    @staticmethod
+    def _set_window_statistics(rollup: dict, window: RollingWindow, window_ts: list) -> None:
+        rollup['count'] += 1
+        rollup['sma'] = window.mean
+        rollup['volatility'] = window.volatility
+        rollup['min'] = window.minimum
+        rollup['max'] = window.maximum
+        rollup['window_values'] = list(window.values)
+        rollup['window_ts'] = window_ts
+
+    def update_rollup(self, rollup: dict, value: float, ts: float) -> dict:
+        """
+        Updating statistics rollup by new value in O(1)
+
+        :param rollup: statistics rollup
+        :param value: new mid rate
+        :param ts: unix timestamp of new mid rate
+        :return: updated statistics rollup
+        """
+        window = self._get_window(rollup)
+        window_ts = self._get_window_ts(rollup)
+        window.append(value)
+        self._set_window_statistics(rollup, window, (window_ts + [ts])[-self.window:])
+        if rollup['ema'] is None:
+            rollup['ema'] = value
+        else:
+            rollup['ema'] = self.ema_alpha * value + (1 - self.ema_alpha) * rollup['ema']
+
+        rollup['last_ts'] = ts if rollup['last_ts'] is None else max(rollup['last_ts'], ts)
+        return rollup
+
+    def insert_rollup(self, rollup: dict, value: float, ts: float) -> dict:
+        """
+        Updating statistics rollup by replayed value, which is older than the last counted one.
+        Value is inserted into window by its timestamp, so window is rebuilt in O(window)
+
+        :param rollup: statistics rollup
+        :param value: replayed mid rate
+        :param ts: unix timestamp of replayed mid rate
+        :return: updated statistics rollup
+        """
+        values = list(self._get_window(rollup).values)
+        window_ts = self._get_window_ts(rollup)
+        position = len(values)
+        while position and window_ts[position - 1] is not None and window_ts[position - 1] > ts:
+            position -= 1
+        values.insert(position, value)
+        window_ts.insert(position, ts)
+        # value older than all values of full window does not get into it
+        window = self._windows[rollup['_id']] = RollingWindow(self.window, values)
+        self._set_window_statistics(rollup, window, window_ts[-self.window:])
+        # EMA weights rates in order of their time, so it is not changed by rate, which was superseded by newer ones
+        return rollup
+
+    def update(
+            self, db_client: MongoDBHandler, resource_name: str, currencies: dict, ts: float, is_replayed: bool = False
+    ) -> list:
+        """
+        Updating statistics rollups of extracted currencies and saving them into DB
+
+        :param db_client: instance of MongoDBHandler
+        :param resource_name: name of the resource
+        :param currencies: extracted currencies of interest
+        :param ts: unix timestamp of rates update reported by resource
+        :param is_replayed: rates were spooled and replayed, they can be older than already counted ones,
+            such rates are inserted into window by their time
+        :return: list of updated statistics rollups
+        """
+        updated_rollups = []
+        with self._lock:
+            for currency, (sale, purchase) in currencies.items():
+                if sale is None or purchase is None:
+                    continue
+
+                key = (resource_name, currency)
+                rollup = self._rollups.get(key)
+                if rollup is None:
+                    # statistics of previous runs are read only once per process
+                    rollup = db_client.get_currency_statistics(resource_name, currency)
+                    rollup = self._rollups[key] = rollup or self._create_rollup(resource_name, currency)
+
+                # the same rates could be polled (and spooled) several times, they are counted only once
+                if rollup['last_ts'] is not None and ts <= rollup['last_ts']:
+                    if not is_replayed or ts == rollup['last_ts'] or ts in self._get_window_ts(rollup):
+                        continue
+                    updated_rollups.append(self.insert_rollup(rollup, (sale + purchase) / 2, ts))
+                else:
+                    updated_rollups.append(self.update_rollup(rollup, (sale + purchase) / 2, ts))
+
+            if updated_rollups:
+                db_client.upsert_currency_statistics(updated_rollups)
+        logging.info(f'Statistics of "{resource_name}" were updated for {len(updated_rollups)} currencies')
+        return updated_rollups
+
+    def update_replayed(self, db_client: MongoDBHandler, payloads: list) -> None:
+        """
+        Updating statistics by spooled records, which were replayed into DB
+
+        :param db_client: instance of MongoDBHandler
+        :param payloads: replayed DB payloads
+        :return: None
+        """
+        try:
+            for payload in payloads:
+                self.update(
+                    db_client, payload['resource_name'], payload['currencies'], payload['provider_ts'], is_replayed=True
+                )
+        except DataBaseIsNotReachable:
+            logging.warning('Statistics of replayed records were not updated, since DB is not reachable')
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import logging
+import threading
+import contextlib
+import contextvars
+
+# instance of TracingHandler, spans are not recorded if it is None
+TRACER = None
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+# attributes, which are copied from parent span into child spans
+INHERITED_ATTRIBUTES = ('resource_name',)
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+    """
+    Opening span by TRACER, does nothing if tracing is disabled
+
+    :param name: name of the span
+    :param kind: OpenTelemetry span kind
+    :param attributes: span attributes
+    :return: context manager, which yields span or None
+    """
+    if TRACER is None:
+        return contextlib.nullcontext()
+    return TRACER.span(name, kind, **attributes)
+
+
+def _to_attribute_value(value) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class Span:
+    __slots__ = (
+        'name', 'kind', 'trace_id', 'span_id', 'parent_span_id', 'attributes', 'start_ns', 'end_ns', 'status'
+    )
+
+    def __init__(self, name: str, kind: int, trace_id: str, parent_span_id: str, attributes: dict):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = {'code': STATUS_CODE_OK}
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [
+                {'key': key, 'value': _to_attribute_value(value)}
+                for key, value in self.attributes.items() if value is not None
+            ],
+            'status': self.status,
+        }
+
+
+class TracingHandler:
+    """
+    Records spans of the script stages and exports them in OpenTelemetry (OTLP/JSON) format:
+    into local file (one export request per line, readable by "otlpjsonfile" receiver of OpenTelemetry Collector)
+    and/or to collector by OTLP/HTTP. Spans are exported by batches of "batch_size" and on "flush".
+    """
+    def __init__(
+            self, path: str = None, collector_url: str = None, service_name: str = 'currency-monitor',
+            batch_size: int = 512
+    ):
+        self.path = path
+        self.collector_url = collector_url
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._finished_spans = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+        """
+        Opening child span of the current span, or root span of new trace if there is no current span
+
+        :param name: name of the span
+        :param kind: OpenTelemetry span kind
+        :param attributes: span attributes
+        :return: context manager, which yields span
+        """
+        parent = _current_span.get()
+        if parent is None:
+            trace_id, parent_span_id = os.urandom(16).hex(), ''
+        else:
+            trace_id, parent_span_id = parent.trace_id, parent.span_id
+            for key in INHERITED_ATTRIBUTES:
+                if key in parent.attributes:
+                    attributes.setdefault(key, parent.attributes[key])
+
+        current_span = Span(name, kind, trace_id, parent_span_id, attributes)
+        token = _current_span.set(current_span)
+        try:
+            yield current_span
+        except BaseException as e:
+            current_span.status = {'code': STATUS_CODE_ERROR, 'message': f'{type(e).__name__}: {e}'}
+            raise
+        finally:
+            _current_span.reset(token)
+            current_span.end_ns = time.time_ns()
+            self._finish(current_span)
+
+    def _finish(self, finished_span: Span) -> None:
+        with self._lock:
+            self._finished_spans.append(finished_span)
+            if len(self._finished_spans) < self.batch_size:
+                return
+            spans, self._finished_spans = self._finished_spans, []
+        self._export(spans)
+
+    def _make_export_request(self, spans: list) -> dict:
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    {'key': 'service.name', 'value': {'stringValue': self.service_name}},
+                    {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}},
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': 'CurrencyMonitor'},
+                    'spans': [finished_span.to_otlp() for finished_span in spans],
+                }],
+            }]
+        }
+
+    def _export(self, spans: list) -> None:
+        export_request = json.dumps(self._make_export_request(spans))
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as traces_file:
+                traces_file.write(export_request + '\n')
+        if self.collector_url:
+            import requests
+
+            try:
+                requests.post(
+                    f'{self.collector_url.rstrip("/")}/v1/traces', data=export_request,
+                    headers={'Content-Type': 'application/json'}, timeout=5,
+                )
+            except requests.RequestException as e:
+                logging.warning(f'Can not export spans to collector {self.collector_url}.\nError: {e}')
+        logging.info(f'{len(spans)} spans were exported')
+
+    def flush(self) -> None:
+        """
+        Exporting all finished, but not exported yet spans
+
+        :return: None
+        """
+        with self._lock:
+            spans, self._finished_spans = self._finished_spans, []
+        if spans:
+            self._export(spans)
@@ -0,0 +1,111 @@
+import time
+import logging
+
+from app.utils.rate_records import RateTable
+
+REASON_MISSING = 'missing'
+REASON_OUT_OF_RANGE = 'out_of_range'
+REASON_SALE_BELOW_PURCHASE = 'sale_below_purchase'
+REASON_JUMP = 'jump'
+
+
+class ValidationHandler:
+    """
+    Sanity checks of extracted rates before they are stored:
+        - rate was not reported (None or NaN)
+        - rate is out of range ("min_rate".."max_rate" or range of currency from "ranges")
+        - sale rate is lower than purchase one
+        - mid rate jumped more than "max_jump" (0.2 = 20%) from the last accepted one. Jump is accepted,
+          if the next rate confirms it (it is within "max_jump" from rejected one), e.g. after devaluation
+    All checks are done in one pass over rates array of extracted currencies. Currencies, which did not pass them,
+    are returned as quarantine record, other currencies are stored as usual.
+    """
+    def __init__(self, min_rate: float = 0.0001, max_rate: float = 1000000, max_jump: float = 0.2, ranges: dict = None):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_jump = max_jump
+        # currency -> (min rate, max rate)
+        self.ranges = {currency: tuple(currency_range) for currency, currency_range in (ranges or {}).items()}
+        # resource name -> {currency: the last accepted mid rate}
+        self._last_rates = {}
+        # resource name -> {currency: mid rate, which was rejected as jump}
+        self._jump_rates = {}
+
+    def _is_jump(self, resource_name: str, currency: str, last_rate: float, mid_rate: float) -> bool:
+        jump_rates = self._jump_rates.setdefault(resource_name, {})
+        jump_rate = jump_rates.get(currency)
+        if jump_rate is not None and abs(mid_rate - jump_rate) <= jump_rate * self.max_jump:
+            logging.warning(f'Jump of "{currency}" of "{resource_name}" from {last_rate} to {mid_rate} was confirmed')
+            return False
+        jump_rates[currency] = mid_rate
+        return True
+
+    def restore_last_rates(self, resource_name: str, currencies) -> None:
+        """
+        Restoring the last accepted rates of resource, e.g. from checkpoint after restart
+
+        :param resource_name: name of the resource
+        :param currencies: the last accepted currencies
+        :return: None
+        """
+        last_rates = self._last_rates.setdefault(resource_name, {})
+        for currency, (sale, purchase) in currencies.items():
+            if sale is not None and purchase is not None:
+                last_rates[currency] = (sale + purchase) / 2
+
+    def validate(self, resource_name: str, currencies, provider_ts: int, check_jumps: bool = True) -> tuple:
+        """
+        Validating extracted currencies of resource
+
+        :param resource_name: name of the resource
+        :param currencies: extracted currencies
+        :param provider_ts: unix timestamp of rates update reported by resource
+        :param check_jumps: check jumps from the last accepted rates, it is disabled for past rates
+            (e.g. reprocessed or re-fetched ones), which are not the latest ones, so the last rates are not changed
+        :return: valid currencies and quarantine payload (None if all currencies are valid)
+        """
+        rate_table = currencies if isinstance(currencies, RateTable) else RateTable(currencies)
+        last_rates = self._last_rates.setdefault(resource_name, {}) if check_jumps else None
+        jump_rates = self._jump_rates.get(resource_name)
+        default_range = (self.min_rate, self.max_rate)
+        # currency -> {'rates': (sale, purchase), 'reasons': [...]}
+        invalid_currencies = {}
+        for currency, sale, purchase in rate_table.iter_rates():
+            reasons = None
+            # NaN is the only value, which is not equal to itself
+            if sale != sale or purchase != purchase:
+                reasons = [REASON_MISSING]
+            else:
+                min_rate, max_rate = self.ranges.get(currency, default_range) if self.ranges else default_range
+                if not (min_rate <= sale <= max_rate and min_rate <= purchase <= max_rate):
+                    reasons = [REASON_OUT_OF_RANGE]
+                if sale < purchase:
+                    reasons = (reasons or []) + [REASON_SALE_BELOW_PURCHASE]
+
+            if reasons is None and check_jumps:
+                mid_rate = (sale + purchase) / 2
+                last_rate = last_rates.get(currency)
+                if (
+                        last_rate is not None and abs(mid_rate - last_rate) > last_rate * self.max_jump
+                        and self._is_jump(resource_name, currency, last_rate, mid_rate)
+                ):
+                    reasons = [REASON_JUMP]
+                else:
+                    last_rates[currency] = mid_rate
+                    if jump_rates:
+                        jump_rates.pop(currency, None)
+            if reasons is not None:
+                invalid_currencies[currency] = {'rates': rate_table[currency], 'reasons': reasons}
+
+        if not invalid_currencies:
+            return rate_table, None
+        logging.warning(f'Rates of "{resource_name}" did not pass validation: {invalid_currencies}')
+        valid_currencies = {
+            currency: rates for currency, rates in rate_table.items() if currency not in invalid_currencies
+        }
+        return RateTable(valid_currencies), {
+            'utc_time': time.time(),
+            'resource_name': resource_name,
+            'provider_ts': provider_ts,
+            'currencies': invalid_currencies,
+        }
@@ -0,0 +1,130 @@
+import math
+import socket
+import hashlib
+import logging
+import threading
+
+from app.utils.handlers.mongo_db_handler import MongoDBHandler
+from app.utils.custom_exceptions import ConfigFieldHasIncorrectValue, DataBaseIsNotReachable
+
+
+class WorkDistributionHandler:
+    """
+    Splits resources between several workers (processes or containers), so every resource is processed
+    by only one of them. Supported modes:
+        - "none" - worker processes all resources
+        - "lease" - worker processes resources leased by it in shared MongoDB collection. Worker leases at most
+          ceil(resources / live workers) of them, in its rendezvous hashing order, so workers do not compete
+          for the same ones. Leases are renewed in background while resources are processed and released after it
+        - "hash" - worker processes resources assigned to its index by rendezvous hashing
+    Worker ID has to be stable between runs (e.g. hostname of container), so leases are renewed by the same worker.
+    """
+    MODES = ('none', 'lease', 'hash')
+
+    def __init__(
+            self, mode: str = 'none', db_client: MongoDBHandler = None, lease_ttl_sec: int = 60,
+            worker_index: int = 0, workers_count: int = 1, worker_id: str = None
+    ):
+        if mode not in self.MODES:
+            logging.error(f'Unknown work distribution mode "{mode}". Supported modes: {self.MODES}')
+            raise ConfigFieldHasIncorrectValue
+        self.mode = mode
+        self.db_client = db_client
+        self.lease_ttl_sec = lease_ttl_sec
+        self.worker_index = worker_index
+        self.workers_count = workers_count
+        self.worker_id = worker_id or socket.gethostname()
+        self.leased_resources = ()
+        self._renewal = None
+        self._renewal_stop = threading.Event()
+
+    @staticmethod
+    def _get_weight(worker_key, resource_name: str) -> int:
+        digest = hashlib.md5(f'{worker_key}:{resource_name}'.encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big')
+
+    def is_assigned_by_hash(self, resource_name: str) -> bool:
+        """
+        Checking is resource assigned to current worker by rendezvous hashing.
+        Adding or removing worker re-assigns only resources of this worker
+
+        :param resource_name: name of the resource
+        :return: boolean status of assignment
+        """
+        assigned_worker_index = max(
+            range(self.workers_count), key=lambda worker_index: self._get_weight(worker_index, resource_name)
+        )
+        return assigned_worker_index == self.worker_index
+
+    def get_resources_to_process(self, resources: tuple) -> tuple:
+        """
+        Filtering resources, which should be processed by current worker
+
+        :param resources: all resources names
+        :return: resources names of current worker
+        """
+        if self.mode == 'lease':
+            resources_to_process = self._lease_resources(resources)
+        elif self.mode == 'hash':
+            resources_to_process = tuple(
+                resource_name for resource_name in resources if self.is_assigned_by_hash(resource_name)
+            )
+        else:
+            resources_to_process = resources
+
+        logging.info(
+            f'Worker "{self.worker_id}" ({self.mode} mode) got {len(resources_to_process)}/{len(resources)} resources'
+        )
+        return resources_to_process
+
+    def _lease_resources(self, resources: tuple) -> tuple:
+        live_workers_count = max(self.db_client.register_worker(self.worker_id, self.lease_ttl_sec), 1)
+        max_leases = math.ceil(len(resources) / live_workers_count)
+        leased_resources = set()
+        for resource_name in sorted(
+                resources, key=lambda name: self._get_weight(self.worker_id, name), reverse=True
+        ):
+            if len(leased_resources) >= max_leases:
+                break
+            if self.db_client.acquire_lease(resource_name, self.worker_id, self.lease_ttl_sec):
+                leased_resources.add(resource_name)
+
+        self.leased_resources = tuple(resource_name for resource_name in resources if resource_name in leased_resources)
+        if self.leased_resources:
+            self._renewal_stop.clear()
+            self._renewal = threading.Thread(target=self._renew_leases, name='LeaseRenewal', daemon=True)
+            self._renewal.start()
+        return self.leased_resources
+
+    def _renew_leases(self) -> None:
+        while not self._renewal_stop.wait(self.lease_ttl_sec / 3):
+            try:
+                self.db_client.register_worker(self.worker_id, self.lease_ttl_sec)
+                renewed_quantity = self.db_client.renew_leases(
+                    self.leased_resources, self.worker_id, self.lease_ttl_sec
+                )
+            except DataBaseIsNotReachable:
+                logging.warning('Leases were not renewed, since DB is not reachable')
+                continue
+            if renewed_quantity < len(self.leased_resources):
+                logging.warning(
+                    f'Worker "{self.worker_id}" lost {len(self.leased_resources) - renewed_quantity} leases. '
+                    f'Their resources could be processed by another worker'
+                )
+
+    def release(self) -> None:
+        """
+        Stopping renewal of leases and releasing them, so other workers can lease resources right away
+
+        :return: None
+        """
+        if self._renewal is not None:
+            self._renewal_stop.set()
+            self._renewal.join()
+            self._renewal = None
+        if self.leased_resources:
+            try:
+                self.db_client.release_leases(self.leased_resources, self.worker_id)
+            except DataBaseIsNotReachable:
+                logging.warning('Leases were not released, since DB is not reachable. They will expire')
+            self.leased_resources = ()
@@ -0,0 +1,87 @@
+import decimal
+from collections.abc import Mapping
+
+DEFAULT_PRECISION = 2
+
+
+def rebase_rates(current_base: str, new_base_value: float, exchange_rates: Mapping) -> dict:
+    """
+    Changing currency base of rates with full float precision, rates are rounded only at presentation
+
+    :param current_base: current currency base
+    :param new_base_value: rate of new base currency in current base
+    :param exchange_rates: rates in current base
+    :return: rates in new base
+    """
+    new_base_rates = {currency: new_base_value / rate for currency, rate in exchange_rates.items()}
+    if current_base in new_base_rates:
+        new_base_rates[current_base] = new_base_value
+    return new_base_rates
+
+
+def _divide(dividend, divisor):
+    return None if dividend is None or not divisor else dividend / divisor
+
+
+def cross_rates(currencies: Mapping, new_base: str) -> dict:
+    """
+    Getting rates of currencies in new base by their rates in common base (e.g. prices of currencies in UAH).
+    Currency is sold for new base, which is bought by common base, so sale rate is divided by purchase rate of new base
+    and vice versa
+
+    :param currencies: currency -> (sale, purchase) in common base, it has to contain new base
+    :param new_base: new currency base
+    :return: currency -> (sale, purchase) in new base
+    """
+    base_sale, base_purchase = currencies[new_base]
+    return {
+        currency: (_divide(sale, base_purchase), _divide(purchase, base_sale))
+        for currency, (sale, purchase) in currencies.items() if currency != new_base
+    }
+
+
+class RatePrecision:
+    """
+    Presentation precision of rates per currency, e.g. prices of small-unit currencies need more decimal places.
+    Rates are rounded half up by their shortest decimal representation (2.675 -> 2.68, not 2.67 as float rounding does)
+    through one decimal context, quantums are prepared once per currency.
+    """
+    def __init__(self, default: int = DEFAULT_PRECISION, currencies: Mapping = None):
+        self.default = default
+        self.currencies = dict(currencies or {})
+        self._context = decimal.Context(rounding=decimal.ROUND_HALF_UP)
+        # precision -> quantum, e.g. 2 -> Decimal('0.01')
+        self._quantums = {}
+
+    def get(self, currency: str) -> int:
+        return self.currencies.get(currency, self.default)
+
+    def _get_quantum(self, precision: int) -> decimal.Decimal:
+        quantum = self._quantums.get(precision)
+        if quantum is None:
+            quantum = self._quantums[precision] = decimal.Decimal(1).scaleb(-precision)
+        return quantum
+
+    def quantize(self, currency: str, value):
+        """
+        Rounding rate of currency to its precision
+
+        :param currency: currency name
+        :param value: rate
+        :return: rounded rate as Decimal, None if rate was not reported
+        """
+        if value is None:
+            return None
+        return decimal.Decimal(repr(value)).quantize(self._get_quantum(self.get(currency)), context=self._context)
+
+    def format(self, currency: str, value) -> str:
+        """
+        Formatting rate of currency for notifications
+
+        :param currency: currency name
+        :param value: rate
+        :return: rounded rate or "n/a" if rate was not reported
+        """
+        rounded_value = self.quantize(currency, value)
+        return 'n/a' if rounded_value is None else str(rounded_value)
+
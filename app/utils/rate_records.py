@@ -0,0 +1,175 @@
+import sys
+import math
+from array import array
+from collections.abc import Mapping
+
+NO_RATE = math.nan  # rate, which was not reported by resource
+# currencies codes -> position of currency, it is shared by all tables with the same currencies
+_CURRENCIES_INDEXES = {}
+
+
+def _to_rate(value) -> float:
+    return NO_RATE if value is None else float(value)
+
+
+def _from_rate(value: float):
+    return None if value != value else value  # NaN is the only value, which is not equal to itself
+
+
+class RateTable(Mapping):
+    """
+    Immutable mapping of currency -> (sale, purchase), which is stored compactly: rates are kept in one float array,
+    currencies codes are interned and their index is shared by all tables with the same currencies.
+    It is read as regular dict of tuples, so consumers of extracted currencies do not depend on representation.
+    """
+    __slots__ = ('_index', '_rates')
+
+    def __init__(self, currencies: Mapping = None):
+        currencies = currencies or {}
+        codes = tuple(sys.intern(currency) for currency in currencies)
+        self._index = _CURRENCIES_INDEXES.get(codes)
+        if self._index is None:
+            self._index = _CURRENCIES_INDEXES[codes] = {
+                currency: position for position, currency in enumerate(codes)
+            }
+        self._rates = array('d')
+        for sale, purchase in currencies.values():
+            self._rates.append(_to_rate(sale))
+            self._rates.append(_to_rate(purchase))
+
+    def __getitem__(self, currency: str) -> tuple:
+        position = self._index[currency] * 2
+        return _from_rate(self._rates[position]), _from_rate(self._rates[position + 1])
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.to_dict()})'
+
+    def __reduce__(self):
+        # unpickled table (e.g. result of worker process) reuses currencies index of this process
+        return type(self), (self.to_dict(),)
+
+    def iter_rates(self):
+        """
+        Iterating rates straight from rates array, without creating tuple per currency
+
+        :return: iterator of (currency, sale, purchase), rate, which was not reported, is NaN
+        """
+        rates = iter(self._rates)
+        return zip(self._index, rates, rates)
+
+    def to_dict(self) -> dict:
+        rates = iter(self._rates)
+        return {
+            currency: (_from_rate(sale), _from_rate(purchase))
+            for currency, sale, purchase in zip(self._index, rates, rates)
+        }
+
+    def memory_size(self) -> int:
+        """
+        Size of the table in bytes, shared currencies index is not counted
+
+        :return: size in bytes
+        """
+        return sys.getsizeof(self) + sys.getsizeof(self._rates)
+
+
+class RateRecord:
+    """
+    Extracted currencies of resource with metadata, it is converted into DB document only at storage edge
+    """
+    __slots__ = ('utc_time', 'utc_offset', 'provider_ts', 'resource_name', 'currencies')
+
+    def __init__(self, utc_time: float, utc_offset: int, provider_ts: int, resource_name: str, currencies: Mapping):
+        self.utc_time = utc_time
+        self.utc_offset = utc_offset
+        self.provider_ts = provider_ts
+        self.resource_name = sys.intern(resource_name)
+        self.currencies = currencies if isinstance(currencies, RateTable) else RateTable(currencies)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.to_document()})'
+
+    def to_document(self) -> dict:
+        return {
+            'utc_time': self.utc_time,
+            'utc_offset': self.utc_offset,
+            'provider_ts': self.provider_ts,
+            'resource_name': self.resource_name,
+            'currencies': self.currencies.to_dict(),
+        }
+
+
+def select_currencies(currencies: Mapping, selected_currencies) -> RateTable:
+    """
+    Getting rates of selected currencies only, e.g. main currencies from extracted currencies of all profiles
+
+    :param currencies: currency -> (sale, purchase)
+    :param selected_currencies: codes of currencies to select
+    :return: rates of selected currencies
+    """
+    selected_currencies = set(selected_currencies)
+    return RateTable({
+        currency: rates for currency, rates in currencies.items() if currency in selected_currencies
+    })
+
+
+def to_document(payload) -> dict:
+    """
+    Converting payload into DB document, already prepared documents (e.g. spooled ones) are returned as is
+
+    :param payload: instance of RateRecord or DB document
+    :return: DB document
+    """
+    return payload.to_document() if isinstance(payload, RateRecord) else payload
+
+
+class RateHistory:
+    """
+    Ring buffer of (timestamp, rate) with "maxlen" capacity, which is kept in two float arrays
+    (16 bytes per item instead of ~100 bytes of tuple in deque). Interface is the same as deque of tuples has.
+    """
+    __slots__ = ('maxlen', '_timestamps', '_rates', '_start')
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self._timestamps = array('d')
+        self._rates = array('d')
+        self._start = 0
+
+    def __len__(self) -> int:
+        return len(self._timestamps) - self._start
+
+    def __getitem__(self, index: int) -> tuple:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('history index out of range')
+        return self._timestamps[self._start + index], self._rates[self._start + index]
+
+    def __iter__(self):
+        timestamps, rates = self._timestamps, self._rates
+        for index in range(self._start, len(timestamps)):
+            yield timestamps[index], rates[index]
+
+    def append(self, item: tuple) -> None:
+        if len(self) >= self.maxlen:
+            self.popleft()
+        timestamp, rate = item
+        self._timestamps.append(timestamp)
+        self._rates.append(rate)
+
+    def popleft(self) -> tuple:
+        item = self[0]
+        self._start += 1
+        # removed items are dropped from arrays by chunks, so "popleft" is O(1) amortized
+        if self._start >= max(len(self), 64):
+            del self._timestamps[:self._start]
+            del self._rates[:self._start]
+            self._start = 0
+        return item
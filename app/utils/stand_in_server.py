@@ -0,0 +1,136 @@
+import os
+import json
+import random
+import asyncio
+import logging
+import itertools
+from http import HTTPStatus
+
+from app.utils.handlers.requests_handler import get_record_name
+
+
+class StandInServer:
+    """
+    Local HTTP server, which replays recorded responses of resources instead of real resources.
+    Request is answered by records of the same URL path (round-robin), so "config.yml" URLs could be pointed to it.
+    Latency, error rate and payload size (quantity of synthetic currencies added to response) are configurable.
+    """
+    def __init__(self, records_path: str, latency_sec: float = 0.0, error_rate: float = 0.0, extra_rates: int = 0):
+        self.records_path = records_path
+        self.latency_sec = latency_sec
+        self.error_rate = error_rate
+        self.extra_rates = extra_rates
+        # records directory name -> cycle of (status code, content type, body)
+        self.records = self._load_records()
+        self._server = None
+        self._connections = set()
+
+    def _inflate_body(self, body: str) -> str:
+        """
+        Adding synthetic currencies to response to simulate large payloads
+
+        :param body: recorded response body
+        :return: response body with synthetic currencies
+        """
+        if not self.extra_rates:
+            return body
+        try:
+            response_data = json.loads(body)
+        except ValueError:
+            return body
+
+        synthetic_currencies = [f'X{index:05d}' for index in range(self.extra_rates)]
+        if isinstance(response_data.get('rates'), dict):
+            for currency in synthetic_currencies:
+                response_data['rates'][currency] = round(random.uniform(0.01, 1000), 4)
+        elif isinstance(response_data.get('exchangeRate'), list):
+            for currency in synthetic_currencies:
+                rate = round(random.uniform(0.01, 1000), 4)
+                response_data['exchangeRate'].append(
+                    {'currency': currency, 'saleRateNB': rate, 'purchaseRateNB': rate}
+                )
+        return json.dumps(response_data)
+
+    def _load_records(self) -> dict:
+        records = {}
+        for record_name in sorted(os.listdir(self.records_path)):
+            record_dir = os.path.join(self.records_path, record_name)
+            if not os.path.isdir(record_dir):
+                continue
+            responses = []
+            for file_name in sorted(os.listdir(record_dir)):
+                with open(os.path.join(record_dir, file_name), encoding='utf-8') as record_file:
+                    record = json.load(record_file)
+                body = self._inflate_body(record['body']).encode('utf-8')
+                responses.append((record['status_code'], record['content_type'], body))
+            if responses:
+                records[record_name] = itertools.cycle(responses)
+        logging.info(f'Stand-in server loaded records of: {list(records)}')
+        return records
+
+    def _get_response(self, path: str) -> tuple:
+        record_name = get_record_name(path)
+        # the longest recorded path suffix is used, so "/<any prefix>/<recorded path>" is replayed as well
+        while record_name not in self.records and '__' in record_name:
+            record_name = record_name.split('__', 1)[1]
+        if record_name not in self.records:
+            return HTTPStatus.NOT_FOUND, 'text/plain', b'Not Found'
+        if random.random() < self.error_rate:
+            return HTTPStatus.SERVICE_UNAVAILABLE, 'text/plain', b'Service Unavailable'
+        return next(self.records[record_name])
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                # headers are not used, only skipped
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+
+                path = request_line.decode('latin-1').split(' ')[1].split('?', 1)[0]
+                if self.latency_sec:
+                    await asyncio.sleep(self.latency_sec)
+                status_code, content_type, body = self._get_response(path)
+                writer.write(
+                    f'HTTP/1.1 {int(status_code)} {HTTPStatus(status_code).phrase}\r\n'
+                    f'Content-Type: {content_type}\r\n'
+                    f'Content-Length: {len(body)}\r\n'
+                    f'Connection: keep-alive\r\n\r\n'.encode('latin-1') + body
+                )
+                await writer.drain()
+        except (ConnectionError, IndexError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            self._connections.discard(connection)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080) -> int:
+        """
+        Starting server
+
+        :param host: host to listen
+        :param port: port to listen, 0 means any free port
+        :return: port which server listens
+        """
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        port = self._server.sockets[0].getsockname()[1]
+        logging.info(f'Stand-in server is listening on http://{host}:{port}')
+        return port
+
+    async def serve_forever(self, host: str = '127.0.0.1', port: int = 8080) -> None:
+        await self.start(host, port)
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # keep-alive connections are closed as well
+            for connection in list(self._connections):
+                connection.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
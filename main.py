@@ -3,51 +3,103 @@ import time
 import logging
 import datetime
 from pathlib import Path
+from typing import Optional, TYPE_CHECKING
 
 from app.utils.custom_exceptions import *
+from app.utils.rate_records import RateRecord, select_currencies
+from app.utils.rate_math import RatePrecision
+from app.utils.handlers import requests_handler, tracing_handler
 from app.utils.handlers.config_handler import ConfigHandler
 from app.utils.handlers.mongo_db_handler import MongoDBHandler
-from app.utils.handlers.arguments_handler import ArgumentsParser
+from app.utils.handlers.spool_handler import SpoolHandler
+from app.utils.handlers.shutdown_handler import ShutdownHandler
 from app.utils.handlers.notification_handler import NotificationHandler
 from app.utils.handlers.currency_extraction_handlers import CurrencyExtractionHandler
 
+# handlers of optional features are imported where they are used, so they are not paid by start of every run
+if TYPE_CHECKING:
+    from app.utils.handlers.alert_handler import AlertHandler
+    from app.utils.handlers.broadcast_handler import BroadcastHandler
+    from app.utils.handlers.checkpoint_handler import CheckpointHandler
+    from app.utils.handlers.consensus_handler import ConsensusHandler
+    from app.utils.handlers.statistics_handler import StatisticsHandler
+    from app.utils.handlers.validation_handler import ValidationHandler
+    from app.utils.handlers.profile_handler import ProfileHandler
+    from app.utils.handlers.gap_repair_handler import GapRepairHandler
+    from app.utils.handlers.latest_rates_cache_handler import LatestRatesCacheHandler
+    from app.utils.handlers.arguments_handler import ArgumentsParser
+    from app.utils.handlers.raw_archive_handler import RawArchiveHandler
+    from app.utils.handlers.polling_schedule_handler import PollingScheduleHandler
+
 logger = logging.getLogger('CurrencyMonitor')
 # logger consts
 LOGGER_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 # notification consts
 SUCCESSFULLY_PARSED_RESOURCES_QUANTITY = 0
 NOTIFICATION_LIMIT = 3
+# alert notifications are grouped apart from notifications of resources, so they do not replace each other
+ALERT_GROUP_ID_OFFSET = 1000
 APP_TITLE = 'CurrencyMonitorApp'
+# rates are kept with full precision and rounded only in notifications
+RATE_PRECISION = RatePrecision()
+# alerts and statistics handlers keep rates history between runs in container
+ALERT_HANDLER = None
+STATISTICS_HANDLER = None
+# validation handler keeps the last accepted rates between runs in container
+VALIDATION_HANDLER = None
+# broadcast handler keeps subscribers connected between runs in container
+BROADCAST_HANDLER = None
+# latest rates cache keeps its file mapped between runs in container
+LATEST_RATES_CACHE_HANDLER = None
+# polling schedule handler decides which resources are polled in the next run
+POLLING_SCHEDULE_HANDLER = None
+# checkpoint handler keeps warm state of container run between its restarts
+CHECKPOINT_HANDLER = None
+# shutdown is requested by signal in container run, see "run_in_container.py"
+SHUTDOWN_HANDLER = ShutdownHandler()
 # mapping handlers rules
 RESOURCE_HANDLERS_MAPPING = {
     'PrivatBank': CurrencyExtractionHandler.handle_privat_bank,
     'CurrencyAPI': CurrencyExtractionHandler.handle_currency_api,
     'OpenExchangeRateAPI': CurrencyExtractionHandler.handle_open_exchange_api
 }
+# handlers of resources, which can be requested for past dates to repair gaps in history
+REPAIR_HANDLERS_MAPPING = {
+    'PrivatBank': CurrencyExtractionHandler.handle_privat_bank,
+}
 
 
-def prepare_db_payload(resource_name: str, data: dict) -> dict:
+def prepare_db_payload(resource_name: str, data: dict, provider_ts: int) -> RateRecord:
     """
     Compiling full DB payload by attaching additional metadata about particular currency record
 
     :param resource_name: name of the resource for currency extraction
     :param data: extracted currencies of interest
+    :param provider_ts: unix timestamp of rates update reported by resource
 
-    :return: dict with completed DB payload
+    :return: record with completed DB payload, it is converted into DB document on insertion
     """
-    payload = {
-        'utc_time': time.time(),
-        'utc_offset': time.timezone,
-        'resource_name': resource_name,
-        'currencies': data
-    }
+    with tracing_handler.span('prepare_db_payload', resource_name=resource_name):
+        payload = RateRecord(
+            utc_time=time.time(),
+            utc_offset=time.timezone,
+            provider_ts=provider_ts,
+            resource_name=resource_name,
+            currencies=data,
+        )
 
     logger.info(f'Completed payload: {payload}')
     return payload
 
 
 def process_services(
-        resources: tuple, db_client: MongoDBHandler, config_helper: ConfigHandler, notify_manager: NotificationHandler
+        resources: tuple, db_client: MongoDBHandler, config_helper: ConfigHandler, notify_manager: NotificationHandler,
+        spool_handler: SpoolHandler = None, consensus_handler: 'ConsensusHandler' = None,
+        alert_handler: 'AlertHandler' = None, statistics_handler: 'StatisticsHandler' = None,
+        broadcast_handler: 'BroadcastHandler' = None, polling_schedule_handler: 'PollingScheduleHandler' = None,
+        latest_rates_cache_handler: 'LatestRatesCacheHandler' = None, validation_handler: 'ValidationHandler' = None,
+        profile_handler: 'ProfileHandler' = None, checkpoint_handler: 'CheckpointHandler' = None,
+        shutdown_handler: ShutdownHandler = None
 ) -> int:
     """
     Process resources services: extract currency from resource -> dump data into DB -> du push notifications
@@ -56,6 +108,17 @@ def process_services(
     :param db_client: instance MongoDB client
     :param config_helper: instance of ConfigHandler
     :param notify_manager: instance of NotifyHandler
+    :param spool_handler: instance of SpoolHandler to keep payloads while DB is not reachable (optional)
+    :param consensus_handler: instance of ConsensusHandler to collect extracted currencies (optional)
+    :param alert_handler: instance of AlertHandler to evaluate alert rules on extracted currencies (optional)
+    :param statistics_handler: instance of StatisticsHandler to update rolling statistics (optional)
+    :param broadcast_handler: instance of BroadcastHandler to push changed rates to subscribers (optional)
+    :param polling_schedule_handler: instance of PollingScheduleHandler to schedule the next polls (optional)
+    :param latest_rates_cache_handler: instance of LatestRatesCacheHandler to share the latest rates (optional)
+    :param validation_handler: instance of ValidationHandler to quarantine invalid rates (optional)
+    :param profile_handler: instance of ProfileHandler to save rates views of profiles (optional)
+    :param checkpoint_handler: instance of CheckpointHandler to keep the latest rates for restart (optional)
+    :param shutdown_handler: instance of ShutdownHandler, the rest resources are skipped after its request (optional)
 
     :return: index of last resource
     """
@@ -64,50 +127,249 @@ def process_services(
     last_index = 0
 
     for index, resource_name in enumerate(resources):
-        logger.info(f'Updating currency data fromF resource: {resource_name}')
+        # shutdown is checked between resources only, so request and insertion of resource are never cut off
+        if shutdown_handler is not None and shutdown_handler.is_requested.is_set():
+            logger.warning(f'Shutdown was requested. {len(resources) - index} resources will be skipped')
+            # skipped resources start from last index, they are kept as pending ones till restart
+            last_index = index
+            break
+        with tracing_handler.span('process_resource', resource_name=resource_name):
+            logger.info(f'Updating currency data fromF resource: {resource_name}')
+
+            do_push_notifications = config_helper.get_notifications_config_by_resource(resource_name)
+            # get currencies from resource handler
+            try:
+                handler = RESOURCE_HANDLERS_MAPPING.get(resource_name)
+                with tracing_handler.span(getattr(handler, '__name__', 'handle_resource')):
+                    extracted_currencies, provider_ts = handler(config_helper)
+            except TypeError:
+                logger.error(f'Can not find handler for "{resource_name}". This resource will be skipped')
+                continue
+
+            if polling_schedule_handler is not None:
+                polling_schedule_handler.observe(resource_name, extracted_currencies, provider_ts)
+            if not extracted_currencies:
+                logger.error(f'Resource: "{resource_name}" will be skipped!')
+                continue
+
+            # quarantine rates, which did not pass validation
+            if validation_handler is not None:
+                extracted_currencies, quarantine_payload = validation_handler.validate(
+                    resource_name, extracted_currencies, provider_ts
+                )
+                if quarantine_payload is not None:
+                    try:
+                        db_client.insert_quarantine(quarantine_payload)
+                    except DataBaseIsNotReachable:
+                        logger.warning('Quarantine record was not saved, since DB is not reachable')
+                if not extracted_currencies:
+                    logger.error(f'All rates of resource "{resource_name}" are invalid. It will be skipped!')
+                    continue
+
+            # views of profiles are derived from the same extracted currencies, resource is not requested again
+            if profile_handler is not None:
+                profile_payloads = profile_handler.derive(resource_name, extracted_currencies, provider_ts)
+                try:
+                    db_client.upsert_profile_records(profile_payloads)
+                except DataBaseIsNotReachable:
+                    if spool_handler is None:
+                        logger.warning('Profiles records were not saved, since DB is not reachable')
+                    else:
+                        for profile_payload in profile_payloads:
+                            spool_handler.append(profile_payload)
+                # currencies of profiles are extracted for their views only
+                extracted_currencies = select_currencies(extracted_currencies, config_helper.get_main_currencies())
+                if not extracted_currencies:
+                    logger.error(f'Resource: "{resource_name}" does not have main currencies. It will be skipped!')
+                    continue
+
+            # save data into MongoDB
+            logger.info('Preparing DB payload')
+            payload = prepare_db_payload(resource_name, extracted_currencies, provider_ts)
+            logger.info(f'Inserting data into MongoDB. Payload: {payload}')
+            is_spooled = False
+            try:
+                success_status = db_client.insert_record(payload)
+                # DB is reachable again, payloads spooled during its outage are replayed right away
+                if spool_handler is not None and spool_handler.has_pending():
+                    spool_handler.start_drainer(db_client, statistics_handler)
+            except DataBaseIsNotReachable:
+                if spool_handler is None:
+                    raise
+                spool_handler.append(payload)
+                success_status = is_spooled = True
+            # statistics of spooled record are updated on its replay, record is not spooled on statistics failure
+            if statistics_handler is not None and not is_spooled:
+                try:
+                    statistics_handler.update(db_client, resource_name, extracted_currencies, provider_ts)
+                except DataBaseIsNotReachable:
+                    logger.warning('Statistics were not updated, since DB is not reachable')
+            if success_status is True:
+                SUCCESSFULLY_PARSED_RESOURCES_QUANTITY += 1
+            if consensus_handler is not None:
+                consensus_handler.add_source(resource_name, extracted_currencies, provider_ts)
+            if broadcast_handler is not None:
+                broadcast_handler.publish(resource_name, extracted_currencies, provider_ts)
+            if latest_rates_cache_handler is not None:
+                latest_rates_cache_handler.publish(resource_name, extracted_currencies, provider_ts)
+            if checkpoint_handler is not None:
+                checkpoint_handler.observe(resource_name, extracted_currencies, provider_ts)
+
+            # do push notification for triggered alerts
+            alerts = alert_handler.evaluate(resource_name, extracted_currencies, provider_ts) if alert_handler else []
+            if alerts:
+                logger.info(f'Creating alert push-notification for resource: "{resource_name}"')
+                notify_manager.title = APP_TITLE
+                notify_manager.subtitle = f'Alert! Source: {resource_name}'
+                notify_manager.description = '\n'.join(alerts)
+                try:
+                    notify_manager.send_push_notification(group_id=ALERT_GROUP_ID_OFFSET + index + 1)
+                except NotImplementedError:
+                    logger.warning('Notification for thi system is not supported!')
+
+            # do push notification for resource
+            if index + 1 <= NOTIFICATION_LIMIT and do_push_notifications:
+                logger.info(f'Creating push-notification for resource: "{resource_name}"')
+                description = ''
+                for currency_name, (sale, purchase) in extracted_currencies.items():
+                    description += f'{currency_name}: [Sale: {RATE_PRECISION.format(currency_name, sale)},' \
+                                   f' Purchase: {RATE_PRECISION.format(currency_name, purchase)}]\n'
+                notify_manager.title = APP_TITLE
+                notify_manager.subtitle = f'Source: {resource_name}'
+                notify_manager.description = description
+                try:
+                    notify_manager.send_push_notification(group_id=index + 1)
+                except NotImplementedError:
+                    logger.warning('Notification for thi system is not supported!')
+
+            # update last index
+            last_index = index + 1
 
-        do_push_notifications = config_helper.get_notifications_config_by_resource(resource_name)
-        # get currencies from resource handler
-        try:
-            extracted_currencies = RESOURCE_HANDLERS_MAPPING.get(resource_name)(config_helper)
-        except TypeError:
+    return last_index
+
+
+def reprocess_archives(
+        resources: tuple, db_client: MongoDBHandler, config_helper: ConfigHandler,
+        raw_archive_handler: 'RawArchiveHandler', workers: int = None, validation_handler: 'ValidationHandler' = None,
+        main_currencies: tuple = None
+) -> int:
+    """
+    Re-extracting currencies from archived raw responses of resources and overwriting stored records by them
+
+    :param resources: list if resources name
+    :param db_client: instance MongoDB client
+    :param config_helper: instance of ConfigHandler
+    :param raw_archive_handler: instance of RawArchiveHandler
+    :param workers: quantity of worker processes
+    :param validation_handler: instance of ValidationHandler to quarantine invalid rates (optional)
+    :param main_currencies: currencies of records, other extracted currencies are skipped (optional)
+
+    :return: quantity of reprocessed records
+    """
+    reprocessed_quantity = 0
+    for resource_name in resources:
+        handler = RESOURCE_HANDLERS_MAPPING.get(resource_name)
+        if handler is None:
             logger.error(f'Can not find handler for "{resource_name}". This resource will be skipped')
             continue
 
-        if not extracted_currencies:
-            logger.error(f'Resource: "{resource_name}" will be skipped!')
-            continue
+        payloads = []
+        for extracted_currencies, provider_ts in raw_archive_handler.reprocess(
+                resource_name, handler, config_helper, workers
+        ):
+            # archived rates are not the latest ones, so they are not checked for jumps
+            if extracted_currencies and validation_handler is not None:
+                extracted_currencies, quarantine_payload = validation_handler.validate(
+                    resource_name, extracted_currencies, provider_ts, check_jumps=False
+                )
+                if quarantine_payload is not None:
+                    db_client.insert_quarantine(quarantine_payload)
+            if extracted_currencies and main_currencies is not None:
+                extracted_currencies = select_currencies(extracted_currencies, main_currencies)
+            if extracted_currencies:
+                payloads.append(prepare_db_payload(resource_name, extracted_currencies, provider_ts))
+        db_client.upsert_records(payloads, overwrite=True)
+        reprocessed_quantity += len(payloads)
+
+    logger.info(f'{reprocessed_quantity} records were reprocessed')
+    return reprocessed_quantity
+
+
+def get_validation_handler(config_handler: ConfigHandler) -> Optional['ValidationHandler']:
+    """
+    Setting up validation handler by config
 
-        # save data into MongoDB
-        logger.info('Preparing DB payload')
-        payload = prepare_db_payload(resource_name, extracted_currencies)
-        logger.info(f'Inserting data into MongoDB. Payload: {payload}')
-        success_status = db_client.insert_record(payload)
-        if success_status is True:
-            SUCCESSFULLY_PARSED_RESOURCES_QUANTITY += 1
-
-        # do push notification for resource
-        if index + 1 <= NOTIFICATION_LIMIT and do_push_notifications:
-            logger.info(f'Creating push-notification for resource: "{resource_name}"')
-            description = ''
-            for currency_name in extracted_currencies:
-                description += f'{currency_name}: [Sale: {extracted_currencies[currency_name][0]:.2f},' \
-                               f' Purchase: {extracted_currencies[currency_name][1]:.2f}]\n'
-            notify_manager.title = APP_TITLE
-            notify_manager.subtitle = f'Source: {resource_name}'
-            notify_manager.description = description
-            try:
-                notify_manager.send_push_notification(group_id=index + 1)
-            except NotImplementedError:
-                logger.warning('Notification for thi system is not supported!')
+    :param config_handler: instance of ConfigHandler
+    :return: instance of ValidationHandler or None if validation is disabled
+    """
+    from app.utils.handlers.validation_handler import ValidationHandler
+
+    validation_config = config_handler.get_validation_config()
+    if not validation_config.get('enabled'):
+        return None
+    return ValidationHandler(
+        min_rate=validation_config.get('min_rate', 0.0001),
+        max_rate=validation_config.get('max_rate', 1000000),
+        max_jump=validation_config.get('max_jump', 0.2),
+        ranges=validation_config.get('ranges'),
+    )
 
-        # update last index
-        last_index = index + 1
 
-    return last_index
+def get_gap_repair_handler(
+        config_handler: ConfigHandler, db_client: MongoDBHandler, validation_handler: 'ValidationHandler' = None
+) -> 'GapRepairHandler':
+    """
+    Setting up gap repair handler by config
+
+    :param config_handler: instance of ConfigHandler
+    :param db_client: instance MongoDB client
+    :param validation_handler: instance of ValidationHandler to quarantine invalid re-fetched rates (optional)
+    :return: instance of GapRepairHandler
+    """
+    from app.utils.handlers.gap_repair_handler import GapRepairHandler
+
+    gap_repair_config = config_handler.get_gap_repair_config()
+    return GapRepairHandler(
+        db_client=db_client,
+        config_helper=config_handler,
+        repair_handlers=REPAIR_HANDLERS_MAPPING,
+        expected_intervals_sec=gap_repair_config.get('expected_intervals_sec'),
+        tolerance=gap_repair_config.get('tolerance', 1.5),
+        lookback_sec=gap_repair_config.get('lookback_sec', 2592000),
+        workers=gap_repair_config.get('workers', 2),
+        max_repairs=gap_repair_config.get('max_repairs', 30),
+        state_path=gap_repair_config.get('state_path', 'gap_repair_attempts.json'),
+        retry_backoff_sec=gap_repair_config.get('retry_backoff_sec', 3600),
+        max_attempts=gap_repair_config.get('max_attempts', 5),
+        validation_handler=validation_handler,
+        main_currencies=config_handler.get_main_currencies(),
+    )
+
 
+def restore_checkpoint(checkpoint_handler: 'CheckpointHandler') -> None:
+    """
+    Warming up handlers by checkpoint of the run before container restart
 
-def get_config_path(argument_parser: ArgumentsParser) -> str:
+    :param checkpoint_handler: instance of CheckpointHandler
+    :return: None
+    """
+    for request_key, validator in checkpoint_handler.state.get('validators', {}).items():
+        requests_handler.set_validator(request_key, validator)
+    if POLLING_SCHEDULE_HANDLER is not None and not POLLING_SCHEDULE_HANDLER.schedule:
+        POLLING_SCHEDULE_HANDLER.schedule = checkpoint_handler.state.get('polling_schedule', {})
+    latest_rates = checkpoint_handler.get_latest_rates()
+    for resource_name, (currencies, provider_ts) in latest_rates.items():
+        if VALIDATION_HANDLER is not None:
+            VALIDATION_HANDLER.restore_last_rates(resource_name, currencies)
+        if BROADCAST_HANDLER is not None:
+            BROADCAST_HANDLER.restore_last_rates(resource_name, currencies)
+        # cache file could be lost with container, while checkpoint is kept in volume
+        if LATEST_RATES_CACHE_HANDLER is not None and LATEST_RATES_CACHE_HANDLER.get_resource(resource_name) is None:
+            LATEST_RATES_CACHE_HANDLER.publish(resource_name, currencies, provider_ts)
+    logger.info(f'Warm state of {len(latest_rates)} resources was restored from checkpoint')
+
+
+def get_config_path(argument_parser: 'ArgumentsParser') -> str:
     """
     Trying to get config file path from program args, otherwise, searching for default path.
 
@@ -141,7 +403,19 @@ def process() -> None:
     :return: None
     """
     logging.info('Currency Monitor has started.')
-    global NOTIFICATION_LIMIT
+    global NOTIFICATION_LIMIT, ALERT_HANDLER, STATISTICS_HANDLER, BROADCAST_HANDLER, POLLING_SCHEDULE_HANDLER, \
+        LATEST_RATES_CACHE_HANDLER, RATE_PRECISION, VALIDATION_HANDLER, CHECKPOINT_HANDLER
+    from app.utils.handlers.alert_handler import AlertHandler
+    from app.utils.handlers.broadcast_handler import BroadcastHandler
+    from app.utils.handlers.checkpoint_handler import CheckpointHandler
+    from app.utils.handlers.consensus_handler import ConsensusHandler
+    from app.utils.handlers.statistics_handler import StatisticsHandler
+    from app.utils.handlers.profile_handler import ProfileHandler
+    from app.utils.handlers.latest_rates_cache_handler import LatestRatesCacheHandler
+    from app.utils.handlers.arguments_handler import ArgumentsParser
+    from app.utils.handlers.raw_archive_handler import RawArchiveHandler
+    from app.utils.handlers.polling_schedule_handler import PollingScheduleHandler
+    from app.utils.handlers.work_distribution_handler import WorkDistributionHandler
 
     argument_parser = ArgumentsParser()
 
@@ -150,22 +424,209 @@ def process() -> None:
 
     # set up handlers
     config_handler = ConfigHandler(str(config_path))
+    mongodb_config = config_handler.get_mongodb_config()
     db_client = MongoDBHandler(
-        db_name=config_handler.get_mongodb_config().get('db_name', 'CurrencyMonitorDB'),
-        db_path=config_handler.get_mongodb_config().get('db_path'),
+        db_name=mongodb_config.get('db_name', 'CurrencyMonitorDB'),
+        db_path=mongodb_config.get('db_path'),
+        server_selection_timeout_ms=mongodb_config.get('server_selection_timeout_ms', 2000),
     )
-    notify_handler = NotificationHandler()
+    if argument_parser.get_args().rebuild_rollups:
+        logger.info('Rebuilding hourly and daily rollups')
+        db_client.rebuild_rollups()
+        return
+    tracing_config = config_handler.get_tracing_config()
+    if tracing_config.get('path') or tracing_config.get('collector_url'):
+        tracing_handler.TRACER = tracing_handler.TracingHandler(
+            path=tracing_config.get('path'),
+            collector_url=tracing_config.get('collector_url'),
+            service_name=tracing_config.get('service_name', 'currency-monitor'),
+            batch_size=tracing_config.get('batch_size', 512),
+        )
+
+    requests_handler.RECORD_PATH = config_handler.get_recording_config().get('path')
+    if requests_handler.RECORD_PATH:
+        logger.info(f'Responses of resources will be recorded into "{requests_handler.RECORD_PATH}"')
+
+    raw_archive_config = config_handler.get_raw_archive_config()
+    raw_archive_handler = RawArchiveHandler(
+        path=raw_archive_config.get('path', 'raw_archive'),
+        ttl_sec=raw_archive_config.get('ttl_sec', 2592000),
+    )
+    if argument_parser.get_args().reprocess:
+        logger.info('Reprocessing archived raw responses')
+        reprocess_archives(
+            config_handler.get_all_resources_names(), db_client, config_handler, raw_archive_handler,
+            raw_archive_config.get('workers'), get_validation_handler(config_handler),
+            config_handler.get_main_currencies()
+        )
+        return
+    CurrencyExtractionHandler.raw_archive = raw_archive_handler if raw_archive_config.get('enabled') else None
+    if argument_parser.get_args().repair_gaps:
+        logger.info('Repairing gaps in history of resources')
+        get_gap_repair_handler(config_handler, db_client, get_validation_handler(config_handler)).repair()
+        return
+
+    notifications_config = config_handler.get_notifications_config()
+    notify_handler = NotificationHandler(
+        webhook_url=notifications_config.get('webhook_url'),
+        coalesce_sec=notifications_config.get('coalesce_sec', 1.0),
+    )
+    if STATISTICS_HANDLER is None:
+        statistics_config = config_handler.get_statistics_config()
+        STATISTICS_HANDLER = StatisticsHandler(
+            window=statistics_config.get('window', statistics_config.get('sma_window', 20)),
+            ema_alpha=statistics_config.get('ema_alpha', 0.1),
+        )
+
+    spool_config = config_handler.get_spool_config()
+    spool_handler = SpoolHandler(
+        path=spool_config.get('path', 'currency_monitor_spool.jsonl'),
+        fsync_batch_size=spool_config.get('fsync_batch_size', 10),
+    )
+    # replaying payloads spooled during previous runs in parallel with resources processing
+    spool_handler.start_drainer(db_client, STATISTICS_HANDLER)
 
     # set up notification limit
-    new_notification_limit = config_handler.get_notifications_config().get('resource_limit')
+    new_notification_limit = notifications_config.get('resource_limit')
     if new_notification_limit is not None:
         NOTIFICATION_LIMIT = new_notification_limit
     logger.info(f'Notification limit set to: {NOTIFICATION_LIMIT}')
+    precision_config = config_handler.get_rates_precision_config()
+    RATE_PRECISION = RatePrecision(
+        default=precision_config.get('default', 2),
+        currencies=precision_config.get('currencies'),
+    )
+
+    # set up adaptive polling, only due resources are processed
+    if POLLING_SCHEDULE_HANDLER is None:
+        polling_config = config_handler.get_adaptive_polling_config()
+        if polling_config.get('enabled'):
+            POLLING_SCHEDULE_HANDLER = PollingScheduleHandler(
+                state_path=polling_config.get('state_path', 'polling_schedule.json'),
+                min_interval_sec=polling_config.get('min_interval_sec', 300),
+                max_interval_sec=polling_config.get('max_interval_sec', 86400),
+                backoff_factor=polling_config.get('backoff_factor', 2.0),
+                publish_grace_sec=polling_config.get('publish_grace_sec', 60),
+            )
+
+    # getting resources of this worker
+    distribution_config = config_handler.get_work_distribution_config()
+    work_distribution_handler = WorkDistributionHandler(
+        mode=distribution_config.get('mode', 'none'),
+        db_client=db_client,
+        lease_ttl_sec=distribution_config.get('lease_ttl_sec', 60),
+        worker_index=int(os.environ.get('WORKER_INDEX', distribution_config.get('worker_index', 0))),
+        workers_count=int(os.environ.get('WORKERS_COUNT', distribution_config.get('workers_count', 1))),
+        worker_id=os.environ.get('WORKER_ID', distribution_config.get('worker_id')),
+    )
+
+    if ALERT_HANDLER is None:
+        alerts_config = config_handler.get_alerts_config()
+        ALERT_HANDLER = AlertHandler(
+            rules=alerts_config.get('rules'),
+            window_size=alerts_config.get('window_size', 1000),
+            max_rate_age_sec=alerts_config.get('max_rate_age_sec', 86400),
+        )
+
+    if VALIDATION_HANDLER is None:
+        VALIDATION_HANDLER = get_validation_handler(config_handler)
+
+    if BROADCAST_HANDLER is None:
+        broadcast_config = config_handler.get_broadcast_config()
+        if broadcast_config.get('enabled'):
+            BROADCAST_HANDLER = BroadcastHandler(
+                max_queue_size=broadcast_config.get('max_queue_size', 1000),
+                keepalive_sec=broadcast_config.get('keepalive_sec', 15.0),
+            )
+            BROADCAST_HANDLER.start_server(
+                host=broadcast_config.get('host', '127.0.0.1'),
+                port=broadcast_config.get('port', 8090),
+            )
+
+    if LATEST_RATES_CACHE_HANDLER is None:
+        latest_rates_cache_config = config_handler.get_latest_rates_cache_config()
+        if latest_rates_cache_config.get('enabled'):
+            LATEST_RATES_CACHE_HANDLER = LatestRatesCacheHandler(
+                path=latest_rates_cache_config.get('path', 'latest_rates.cache'),
+                max_entries=latest_rates_cache_config.get('max_entries', 4096),
+                writable=True,
+            )
+
+    # restoring warm state of the run before container restart
+    if CHECKPOINT_HANDLER is None:
+        checkpoint_config = config_handler.get_checkpoint_config()
+        if checkpoint_config.get('enabled'):
+            CHECKPOINT_HANDLER = CheckpointHandler(path=checkpoint_config.get('path', 'checkpoint.json'))
+            restore_checkpoint(CHECKPOINT_HANDLER)
+    pending_resources = CHECKPOINT_HANDLER.get_pending_resources() if CHECKPOINT_HANDLER is not None else ()
+    if CHECKPOINT_HANDLER is not None and CHECKPOINT_HANDLER.get_resume_delay() > 0 and not pending_resources:
+        logger.info('The next run was planned before restart. Resources will be processed at planned time')
+        spool_handler.wait_drainer()
+        spool_handler.close()
+        notify_handler.close()
+        return
 
     # processing resources
     resources = config_handler.get_all_resources_names()
+    if POLLING_SCHEDULE_HANDLER is not None:
+        resources = POLLING_SCHEDULE_HANDLER.get_due_resources(resources)
+    # resources skipped by shutdown before restart are processed first, even if they are not due yet
+    if pending_resources:
+        logger.info(f'{len(pending_resources)} resources were skipped by shutdown before restart')
+        all_resources = config_handler.get_all_resources_names()
+        resources = tuple(dict.fromkeys(
+            tuple(resource_name for resource_name in pending_resources if resource_name in all_resources)
+            + tuple(resources)
+        ))
+    resources = work_distribution_handler.get_resources_to_process(resources)
     logger.info(f'Got {len(resources)} resources to process')
-    last_index = process_services(resources, db_client, config_handler, notify_handler)
+    profiles_config = config_handler.get_profiles_config()
+    profile_handler = ProfileHandler(profiles_config) if profiles_config else None
+
+    consensus_config = config_handler.get_consensus_config()
+    consensus_handler = ConsensusHandler(
+        max_deviation=consensus_config.get('max_deviation', 0.02),
+        max_age_sec=consensus_config.get('max_age_sec', 172800),
+        weights=consensus_config.get('weights'),
+    )
+    try:
+        with tracing_handler.span('process_cycle', resources_count=len(resources)):
+            last_index = process_services(
+                resources, db_client, config_handler, notify_handler, spool_handler, consensus_handler,
+                ALERT_HANDLER, STATISTICS_HANDLER, BROADCAST_HANDLER, POLLING_SCHEDULE_HANDLER,
+                LATEST_RATES_CACHE_HANDLER, VALIDATION_HANDLER, profile_handler, CHECKPOINT_HANDLER,
+                SHUTDOWN_HANDLER
+            )
+    finally:
+        work_distribution_handler.release()
+    if POLLING_SCHEDULE_HANDLER is not None:
+        POLLING_SCHEDULE_HANDLER.save()
+    spool_handler.wait_drainer()
+    spool_handler.close()
+    db_client.flush_rollups()
+    if CHECKPOINT_HANDLER is not None:
+        CHECKPOINT_HANDLER.update(
+            validators=requests_handler.VALIDATORS,
+            polling_schedule=POLLING_SCHEDULE_HANDLER.schedule if POLLING_SCHEDULE_HANDLER is not None else {},
+            pending_resources=list(resources[last_index:]) if SHUTDOWN_HANDLER.is_requested.is_set() else [],
+        )
+    if CurrencyExtractionHandler.raw_archive is not None:
+        CurrencyExtractionHandler.raw_archive.evict()
+
+    # repairing gaps in history after live polling, so it is not delayed by re-fetches
+    if config_handler.get_gap_repair_config().get('enabled') and not SHUTDOWN_HANDLER.is_requested.is_set():
+        try:
+            get_gap_repair_handler(config_handler, db_client, VALIDATION_HANDLER).repair()
+        except DataBaseIsNotReachable:
+            logger.warning('Gaps in history were not repaired, since DB is not reachable')
+
+    # reconciling the latest rates of all resources into one consensus record, if any of them were updated
+    if consensus_handler.sources:
+        try:
+            consensus_handler.add_latest_sources(config_handler.get_all_resources_names(), db_client)
+            db_client.insert_consensus(consensus_handler.get_consensus())
+        except DataBaseIsNotReachable:
+            logger.warning('Consensus record was not saved, since DB is not reachable')
 
     # do notification report
     notify_handler.subtitle = 'Service Report'
@@ -177,6 +638,24 @@ def process() -> None:
         notify_handler.send_push_notification(group_id=last_index + 1)
     except NotImplementedError:
         logger.warning('Notification for thi system is not supported!')
+    notify_handler.close()
+
+
+def get_next_run_delay(run_rate_sec: float) -> float:
+    """
+    Getting time to sleep until the next run in container. If adaptive polling is enabled,
+    the next run starts when the first resource is due, but not later than in "run_rate_sec".
+    Time of the next run is saved into checkpoint, so it is kept after container restart
+
+    :param run_rate_sec: max time between runs in seconds
+    :return: time to sleep in seconds
+    """
+    next_run_delay = run_rate_sec
+    if POLLING_SCHEDULE_HANDLER is not None:
+        next_run_delay = min(run_rate_sec, POLLING_SCHEDULE_HANDLER.get_sleep_time())
+    if CHECKPOINT_HANDLER is not None:
+        next_run_delay = CHECKPOINT_HANDLER.plan_next_run(next_run_delay)
+    return next_run_delay
 
 
 def main() -> None:
@@ -188,11 +667,16 @@ def main() -> None:
     )
     try:
         process()
-    except (ConfigFileDoesNotFound, CanNotGetCurrenciesFromService, CanNotFindNewBaseCurrency) as e:
+    except (
+            ConfigFileDoesNotFound, CanNotGetCurrenciesFromService, CanNotFindNewBaseCurrency, DataBaseIsNotReachable
+    ) as e:
         logger.error(f'Can not continue processing...\nError: {e}')
         raise e
     except KeyboardInterrupt:
         pass
+    finally:
+        if tracing_handler.TRACER is not None:
+            tracing_handler.TRACER.flush()
 
 
 if __name__ == '__main__':
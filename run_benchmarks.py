@@ -0,0 +1,74 @@
+import random
+import timeit
+import argparse
+
+from app.utils.rate_math import RatePrecision, rebase_rates
+from app.utils.rate_records import RateTable
+from app.utils.handlers.validation_handler import ValidationHandler
+
+
+def rebase_rates_rounded(current_base: str, new_base: str, exchange_rates: dict) -> dict:
+    # previous implementation of CurrencyExtractionHandler.change_currency_base, kept as baseline
+    new_base_currencies = {}
+    for currency in exchange_rates:
+        if currency == current_base:
+            new_base_currencies[currency] = exchange_rates[new_base]
+        else:
+            new_base_currencies[currency] = round(exchange_rates[new_base] / exchange_rates[currency], 4)
+    return new_base_currencies
+
+
+def format_rates_float(currencies: dict) -> str:
+    # previous formatting of notifications, kept as baseline
+    description = ''
+    for currency_name in currencies:
+        description += f'{currency_name}: [Sale: {currencies[currency_name][0]:.2f},' \
+                       f' Purchase: {currencies[currency_name][1]:.2f}]\n'
+    return description
+
+
+def format_rates_decimal(rate_precision: RatePrecision, currencies: dict) -> str:
+    description = ''
+    for currency_name, (sale, purchase) in currencies.items():
+        description += f'{currency_name}: [Sale: {rate_precision.format(currency_name, sale)},' \
+                       f' Purchase: {rate_precision.format(currency_name, purchase)}]\n'
+    return description
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Measures hot paths of rates processing on large payloads')
+    parser.add_argument('--rates_count', type=int, help='Quantity of rates in payload', default=100000)
+    parser.add_argument('--repeat', type=int, help='Quantity of runs, the best one is reported', default=5)
+    return parser.parse_args()
+
+
+def report(name: str, baseline_sec: float, current_sec: float) -> None:
+    print(f'{name}: baseline {baseline_sec * 1000:.1f} ms, current {current_sec * 1000:.1f} ms, '
+          f'speedup x{baseline_sec / current_sec:.2f}')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    exchange_rates = {f'X{index:06d}': random.uniform(0.01, 1000) for index in range(args.rates_count)}
+    exchange_rates.update(USD=1.0, UAH=41.5)
+    currencies = {currency: (rate, rate) for currency, rate in list(exchange_rates.items())[:1000]}
+    rate_precision = RatePrecision()
+
+    report(
+        f'change base of {len(exchange_rates)} rates',
+        min(timeit.repeat(lambda: rebase_rates_rounded('USD', 'UAH', exchange_rates), number=1, repeat=args.repeat)),
+        min(timeit.repeat(lambda: rebase_rates('USD', 41.5, exchange_rates), number=1, repeat=args.repeat)),
+    )
+    report(
+        f'format {len(currencies)} rates',
+        min(timeit.repeat(lambda: format_rates_float(currencies), number=1, repeat=args.repeat)),
+        min(timeit.repeat(lambda: format_rates_decimal(rate_precision, currencies), number=1, repeat=args.repeat)),
+    )
+
+    rate_table = RateTable({currency: (rate, rate) for currency, rate in exchange_rates.items()})
+    validation_handler = ValidationHandler()
+    validation_handler.validate('resource1', rate_table, 1)
+    validation_sec = min(timeit.repeat(
+        lambda: validation_handler.validate('resource1', rate_table, 1), number=1, repeat=args.repeat
+    ))
+    print(f'validate {len(rate_table)} rates: {validation_sec * 1000:.1f} ms')
@@ -0,0 +1,46 @@
+import logging
+import argparse
+import threading
+
+from app.utils.handlers.config_handler import ConfigHandler
+from app.utils.handlers.mongo_db_handler import MongoDBHandler
+from app.utils.handlers.conversion_handler import ConversionHandler
+from app.utils.handlers.latest_rates_cache_handler import LatestRatesCacheHandler
+from app.utils.custom_exceptions import LatestRatesCacheIsNotAvailable
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Serves batch conversion of amounts by stored rates')
+    parser.add_argument('--config_path', type=str, help='Path to config file', default='config.yml')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    config_handler = ConfigHandler(args.config_path)
+    conversion_config = config_handler.get_conversion_config()
+    mongodb_config = config_handler.get_mongodb_config()
+    latest_rates_cache = None
+    latest_rates_cache_config = config_handler.get_latest_rates_cache_config()
+    if latest_rates_cache_config.get('enabled'):
+        try:
+            latest_rates_cache = LatestRatesCacheHandler(latest_rates_cache_config.get('path', 'latest_rates.cache'))
+        except LatestRatesCacheIsNotAvailable:
+            logging.warning('The latest rates will be read from DB')
+    conversion_handler = ConversionHandler(
+        db_client=MongoDBHandler(
+            db_name=mongodb_config.get('db_name', 'CurrencyMonitorDB'),
+            db_path=mongodb_config.get('db_path'),
+            server_selection_timeout_ms=mongodb_config.get('server_selection_timeout_ms', 2000),
+        ),
+        resource_name=conversion_config.get('resource', 'PrivatBank'),
+        cache_size=conversion_config.get('cache_size', 256),
+        rate_field=conversion_config.get('rate_field', 'mid'),
+        latest_rates_cache=latest_rates_cache,
+    )
+    conversion_handler.start_server(conversion_config.get('host', '127.0.0.1'), conversion_config.get('port', 8091))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        conversion_handler.stop_server()
@@ -1,8 +1,8 @@
 import os
-import time
 import datetime
 
-from main import main
+from main import main, get_next_run_delay, SHUTDOWN_HANDLER
+from app.utils.handlers.profiling_handler import ProfilingHandler
 
 
 if __name__ == '__main__':
@@ -11,7 +11,19 @@ if __name__ == '__main__':
     if is_container_run:
         run_rate_sec = int(os.environ.get('RUN_RATE'))
         print('run_rate_sec', run_rate_sec)
-        while True:
+        # profiling is toggled by SIGUSR1, e.g. "docker kill --signal=SIGUSR1 <container>"
+        profiling_handler = ProfilingHandler(
+            path=os.environ.get('PROFILING_PATH', 'profiles'),
+            interval_sec=int(os.environ.get('PROFILING_INTERVAL_MS', 10)) / 1000,
+            enabled=bool(int(os.environ.get('PROFILING', 0))),
+        )
+        profiling_handler.install_signal_handler()
+        # "docker stop" sends SIGTERM, the current run is finished and container exits
+        SHUTDOWN_HANDLER.install_signal_handlers()
+        while not SHUTDOWN_HANDLER.is_requested.is_set():
             print(f'Running script...\nTime: {datetime.datetime.utcnow()}')
-            main()
-            time.sleep(run_rate_sec)
+            with profiling_handler.profile_cycle():
+                main()
+            if SHUTDOWN_HANDLER.wait(get_next_run_delay(run_rate_sec)):
+                break
+        print(f'Script was stopped\nTime: {datetime.datetime.utcnow()}')
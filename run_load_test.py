@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import math
+import time
+import yaml
+import asyncio
+import logging
+import argparse
+import itertools
+import resource
+import tempfile
+import threading
+import functools
+
+import main
+from app.utils.rate_records import to_document
+from app.utils.stand_in_server import StandInServer
+from app.utils.handlers.config_handler import ConfigHandler
+from app.utils.handlers.mongo_db_handler import MongoDBHandler
+from app.utils.handlers.currency_extraction_handlers import CurrencyExtractionHandler
+
+# responses of synthetic providers are replayed from this records directory of stand-in server
+RECORD_NAME = 'v6__latest'
+SYNTHETIC_CURRENCIES = ('USD', 'EUR', 'GBP', 'PLN', 'CHF')
+# provider time of every synthetic response, records are upserted by it, so the same time would be a no-op match
+SYNTHETIC_UPDATE_TIMES = itertools.count(int(time.time()))
+
+
+class MemoryDBClient:
+    """
+    Embedded DB backend for runs without MongoDB. Records are converted into DB documents as for insertion,
+    but only their quantity is kept, so memory of the run is not grown by them.
+    """
+    def __init__(self):
+        self.records_quantity = 0
+
+    def insert_record(self, payload) -> bool:
+        to_document(payload)
+        self.records_quantity += 1
+        return True
+
+
+class MeteredDBClient:
+    """
+    Counts writes of DB client and time spent in them
+    """
+    def __init__(self, db_client):
+        self.db_client = db_client
+        self.writes = 0
+        self.write_sec = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.db_client, name)
+
+    def insert_record(self, payload) -> bool:
+        started_at = time.perf_counter()
+        try:
+            return self.db_client.insert_record(payload)
+        finally:
+            self.write_sec += time.perf_counter() - started_at
+            self.writes += 1
+
+
+def handle_synthetic_provider(resource_url: str, resource_name: str, config_helper: ConfigHandler) -> tuple:
+    # synthetic provider answers in OpenExchangeRateAPI format, so the same extraction path is measured
+    response_data = CurrencyExtractionHandler.get_currency_from_resource(resource_url, resource_name=resource_name)
+    # every response reports new rates, so every cycle writes new record as real providers do
+    response_data['time_last_update_unix'] = next(SYNTHETIC_UPDATE_TIMES)
+    return CurrencyExtractionHandler.handle_open_exchange_api(config_helper, response_data)
+
+
+def write_records(records_path: str) -> None:
+    record_dir = os.path.join(records_path, RECORD_NAME)
+    os.makedirs(record_dir, exist_ok=True)
+    rates = {currency: 1 / (index + 1) for index, currency in enumerate(SYNTHETIC_CURRENCIES)}
+    rates['UAH'] = 41.5
+    # provider time is set per response by "handle_synthetic_provider"
+    body = {'result': 'success', 'base_code': 'USD', 'rates': rates}
+    with open(os.path.join(record_dir, '1.json'), 'w', encoding='utf-8') as record_file:
+        json.dump({'url': f'/{RECORD_NAME}', 'status_code': 200, 'content_type': 'application/json',
+                   'body': json.dumps(body)}, record_file)
+
+
+def get_rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        # peak RSS, it is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def get_percentile(values: list, percentile: float) -> float:
+    """
+    Getting percentile of values by nearest rank
+
+    :param values: measured values
+    :param percentile: percentile from 0 to 100
+    :return: value of percentile
+    """
+    sorted_values = sorted(values)
+    rank = max(math.ceil(percentile / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def run_stage(
+        providers: int, port: int, config_dir: str, db_client, cycles: int = 5, duration_sec: float = 0,
+        interval_sec: float = 0
+) -> dict:
+    """
+    Running resources processing of synthetic providers in cycles, as container run does
+
+    :param providers: quantity of synthetic providers
+    :param port: port of stand-in server
+    :param config_dir: directory for config file of the stage
+    :param db_client: DB client
+    :param cycles: min quantity of cycles
+    :param duration_sec: min duration of the stage
+    :param interval_sec: sleep between cycles
+    :return: measurements of the stage
+    """
+    resources = tuple(f'Synthetic{index:05d}' for index in range(providers))
+    resource_urls = {
+        resource_name: f'http://127.0.0.1:{port}/{resource_name}/{RECORD_NAME.replace("__", "/")}'
+        for resource_name in resources
+    }
+    config_path = os.path.join(config_dir, f'config_{providers}.yml')
+    with open(config_path, 'w') as config_file:
+        yaml.safe_dump({
+            'base_currency': 'UAH',
+            'main_currencies': ' '.join(SYNTHETIC_CURRENCIES),
+            'resources': {
+                resource_name: {'url': resource_url, 'do_notifications': False}
+                for resource_name, resource_url in resource_urls.items()
+            },
+        }, config_file)
+    config_handler = ConfigHandler(config_path)
+    main.RESOURCE_HANDLERS_MAPPING.update({
+        resource_name: functools.partial(handle_synthetic_provider, resource_url, resource_name)
+        for resource_name, resource_url in resource_urls.items()
+    })
+
+    try:
+        # warm-up cycle is not measured, so imports and DB connection are not counted as latency and RSS growth
+        main.process_services(resources, db_client, config_handler, None)
+        metered_db_client = MeteredDBClient(db_client)
+        cycle_latencies = []
+        processed_quantity = main.SUCCESSFULLY_PARSED_RESOURCES_QUANTITY
+        start_rss_mb = get_rss_mb()
+        started_at = time.perf_counter()
+        while len(cycle_latencies) < cycles or time.perf_counter() - started_at < duration_sec:
+            cycle_started_at = time.perf_counter()
+            main.process_services(resources, metered_db_client, config_handler, None)
+            cycle_latencies.append(time.perf_counter() - cycle_started_at)
+            if interval_sec:
+                time.sleep(interval_sec)
+    finally:
+        for resource_name in resources:
+            main.RESOURCE_HANDLERS_MAPPING.pop(resource_name, None)
+    elapsed_sec = time.perf_counter() - started_at
+    processed_quantity = main.SUCCESSFULLY_PARSED_RESOURCES_QUANTITY - processed_quantity
+
+    return {
+        'providers': providers,
+        'cycles': len(cycle_latencies),
+        'elapsed_sec': round(elapsed_sec, 3),
+        'throughput': round(processed_quantity / sum(cycle_latencies), 2),
+        'p50_cycle_ms': round(get_percentile(cycle_latencies, 50) * 1000, 2),
+        'p99_cycle_ms': round(get_percentile(cycle_latencies, 99) * 1000, 2),
+        'rss_mb': round(get_rss_mb(), 2),
+        'rss_growth_mb': round(get_rss_mb() - start_rss_mb, 2),
+        'db_writes_per_sec': round(metered_db_client.writes / elapsed_sec, 2),
+        'db_write_ms': round(metered_db_client.write_sec / max(metered_db_client.writes, 1) * 1000, 3),
+    }
+
+
+def run_load_test(
+        providers: list, cycles: int = 5, duration_sec: float = 0, interval_sec: float = 0, latency_ms: float = 0,
+        error_rate: float = 0, extra_rates: int = 0, db_path: str = None, db_name: str = 'LoadTestDB'
+) -> dict:
+    """
+    Running stages of growing quantity of synthetic providers against local stand-in server
+
+    :return: report with measurements of every stage and scaling efficiency
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_records(temp_dir)
+        server = StandInServer(
+            records_path=temp_dir, latency_sec=latency_ms / 1000, error_rate=error_rate, extra_rates=extra_rates
+        )
+        loop = asyncio.new_event_loop()
+        port = loop.run_until_complete(server.start(port=0))
+        threading.Thread(target=loop.run_forever, name='StandInServer', daemon=True).start()
+        db_client = MongoDBHandler(db_path=db_path, db_name=db_name) if db_path else MemoryDBClient()
+        stages = {}
+        try:
+            for providers_quantity in providers:
+                stages[str(providers_quantity)] = run_stage(
+                    providers_quantity, port, temp_dir, db_client, cycles, duration_sec, interval_sec
+                )
+        finally:
+            asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+    # throughput relative to the smallest stage, it drops below 1 where processing saturates
+    base_throughput = stages[str(min(providers))]['throughput']
+    for stage in stages.values():
+        stage['efficiency'] = round(stage['throughput'] / base_throughput, 3) if base_throughput else 0
+    return {'utc_time': time.time(), 'backend': 'mongodb' if db_path else 'memory', 'stages': stages}
+
+
+def find_regressions(
+        report: dict, baseline: dict = None, max_regression: float = 0.2, max_rss_growth_mb: float = 50,
+        min_efficiency: float = 0
+) -> list:
+    """
+    Comparing scaling curve of report with the target one
+
+    :param report: report of load test
+    :param baseline: report of previous load test, which is the target scaling curve
+    :param max_regression: allowed drop of throughput and growth of p99 cycle latency, 0.2 = 20%
+    :param max_rss_growth_mb: allowed RSS growth of stage
+    :param min_efficiency: min throughput relative to the smallest stage
+    :return: descriptions of regressions
+    """
+    regressions = []
+    baseline_stages = (baseline or {}).get('stages', {})
+    for providers, stage in report['stages'].items():
+        if stage['rss_growth_mb'] > max_rss_growth_mb:
+            regressions.append(f'{providers} providers: RSS grew by {stage["rss_growth_mb"]} MB')
+        if stage['efficiency'] < min_efficiency:
+            regressions.append(f'{providers} providers: scaling efficiency is {stage["efficiency"]}')
+        baseline_stage = baseline_stages.get(providers)
+        if baseline_stage is None:
+            continue
+        if stage['throughput'] < baseline_stage['throughput'] * (1 - max_regression):
+            regressions.append(
+                f'{providers} providers: throughput {stage["throughput"]}/sec, baseline {baseline_stage["throughput"]}'
+            )
+        if stage['p99_cycle_ms'] > baseline_stage['p99_cycle_ms'] * (1 + max_regression):
+            regressions.append(
+                f'{providers} providers: p99 cycle {stage["p99_cycle_ms"]} ms, '
+                f'baseline {baseline_stage["p99_cycle_ms"]} ms'
+            )
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Load and soak test of resources processing with synthetic providers served by stand-in server'
+    )
+    parser.add_argument('--providers', type=int, nargs='+', help='Quantities of providers of stages',
+                        default=[10, 50, 100])
+    parser.add_argument('--cycles', type=int, help='Min quantity of cycles of stage', default=5)
+    parser.add_argument('--duration_sec', type=float, help='Min duration of stage, e.g. hours of soak test', default=0)
+    parser.add_argument('--interval_sec', type=float, help='Sleep between cycles', default=0)
+    parser.add_argument('--latency_ms', type=float, help='Latency of every response', default=0)
+    parser.add_argument('--error_rate', type=float, help='Share of "503" responses, from 0 to 1', default=0)
+    parser.add_argument('--extra_rates', type=int, help='Quantity of synthetic currencies in response', default=0)
+    parser.add_argument('--db_path', type=str, help='MongoDB URL, embedded backend is used if it is empty')
+    parser.add_argument('--db_name', type=str, help='MongoDB database name', default='LoadTestDB')
+    parser.add_argument('--report', type=str, help='Path to save report to, it could be the next baseline')
+    parser.add_argument('--baseline', type=str, help='Path to report, which is the target scaling curve')
+    parser.add_argument('--max_regression', type=float, help='Allowed regression against baseline', default=0.2)
+    parser.add_argument('--max_rss_growth_mb', type=float, help='Allowed RSS growth of stage', default=50)
+    parser.add_argument('--min_efficiency', type=float, help='Min throughput relative to the smallest stage',
+                        default=0)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # logs of every resource would dominate the measurements
+    logging.basicConfig(level=logging.ERROR)
+    args = parse_args()
+    load_test_report = run_load_test(
+        args.providers, args.cycles, args.duration_sec, args.interval_sec, args.latency_ms, args.error_rate,
+        args.extra_rates, args.db_path, args.db_name,
+    )
+    for stage_report in load_test_report['stages'].values():
+        print(
+            f'{stage_report["providers"]} providers, {stage_report["cycles"]} cycles: '
+            f'{stage_report["throughput"]} resources/sec (efficiency {stage_report["efficiency"]}), '
+            f'cycle p50 {stage_report["p50_cycle_ms"]} ms, p99 {stage_report["p99_cycle_ms"]} ms, '
+            f'RSS {stage_report["rss_mb"]} MB (+{stage_report["rss_growth_mb"]} MB), '
+            f'DB {stage_report["db_writes_per_sec"]} writes/sec ({stage_report["db_write_ms"]} ms per write)'
+        )
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump(load_test_report, report_file, indent=2)
+
+    baseline_report = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline_report = json.load(baseline_file)
+    found_regressions = find_regressions(
+        load_test_report, baseline_report, args.max_regression, args.max_rss_growth_mb, args.min_efficiency
+    )
+    for regression in found_regressions:
+        print(f'REGRESSION: {regression}')
+    sys.exit(1 if found_regressions else 0)
@@ -0,0 +1,31 @@
+import asyncio
+import logging
+import argparse
+
+from app.utils.stand_in_server import StandInServer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Replays recorded responses of resources with simulated conditions')
+    parser.add_argument('--records_path', type=str, help='Path to recorded responses', default='records')
+    parser.add_argument('--host', type=str, help='Host to listen', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help='Port to listen', default=8080)
+    parser.add_argument('--latency_ms', type=float, help='Latency of every response', default=0)
+    parser.add_argument('--error_rate', type=float, help='Share of "503" responses, from 0 to 1', default=0)
+    parser.add_argument('--extra_rates', type=int, help='Quantity of synthetic currencies in response', default=0)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    server = StandInServer(
+        records_path=args.records_path,
+        latency_sec=args.latency_ms / 1000,
+        error_rate=args.error_rate,
+        extra_rates=args.extra_rates,
+    )
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -1,10 +1,16 @@
+import sys
 import unittest
+import subprocess
+from pathlib import Path
 from unittest.mock import Mock, MagicMock, patch, call
 
 from main import (
-    prepare_db_payload, process_services, process, get_config_path, ConfigFileDoesNotFound,
-    CanNotFindNewBaseCurrency, CanNotGetCurrenciesFromService, main
+    prepare_db_payload, process_services, process, reprocess_archives, get_config_path, restore_checkpoint,
+    ConfigFileDoesNotFound, CanNotFindNewBaseCurrency, CanNotGetCurrenciesFromService, DataBaseIsNotReachable, main
 )
+from app.utils.handlers.shutdown_handler import ShutdownHandler
+from app.utils.handlers.validation_handler import ValidationHandler
+from app.utils.rate_math import RatePrecision
 
 
 class TestMain(unittest.TestCase):
@@ -22,21 +28,22 @@ class TestMain(unittest.TestCase):
         patched_time.time.return_value = 123456.7
         patched_time.timezone = 1234
 
-        result = prepare_db_payload('fake_resource_name', {'k': 'v'})
+        result = prepare_db_payload('fake_resource_name', {'k': (1.5, None)}, 123000)
         expected = {
             'utc_time': 123456.7,
             'utc_offset': 1234,
+            'provider_ts': 123000,
             'resource_name': 'fake_resource_name',
-            'currencies': {'k': 'v'}
+            'currencies': {'k': (1.5, None)}
         }
-        self.assertEqual(result, expected)
+        self.assertEqual(result.to_document(), expected)
 
     @patch('main.NOTIFICATION_LIMIT', 3)
     @patch('main.prepare_db_payload')
     @patch('main.RESOURCE_HANDLERS_MAPPING')
     def test_process_services(self, patched_resource_handler_mapping, patched_prepare_db_payload):
         fake_handler = Mock()
-        fake_handler.side_effect = [{'k': (1, 2)}, {}, TypeError, {'k': (1, 2)}]
+        fake_handler.side_effect = [({'k': (1, 2)}, 1), ({}, None), TypeError, ({'k': (1, 2)}, 1)]
         patched_resource_handler_mapping.get.return_value = fake_handler
 
         patched_prepare_db_payload.return_value = {'k': 'v'}
@@ -59,6 +66,218 @@ class TestMain(unittest.TestCase):
 
         self.assertEqual(result, expected)
 
+    @patch('main.NOTIFICATION_LIMIT', 0)
+    @patch('main.prepare_db_payload')
+    @patch('main.RESOURCE_HANDLERS_MAPPING')
+    def test_process_services_db_is_not_reachable(self, patched_resource_handler_mapping, patched_prepare_db_payload):
+        patched_resource_handler_mapping.get.return_value = Mock(return_value=({'k': (1, 2)}, 1))
+        patched_prepare_db_payload.return_value = {'k': 'v'}
+
+        fake_db_client = Mock()
+        fake_db_client.insert_record.side_effect = DataBaseIsNotReachable
+        fake_spool_handler = Mock()
+        fake_consensus_handler = Mock()
+        fake_statistics_handler = Mock()
+
+        result = process_services(
+            ('resource1',), fake_db_client, Mock(), Mock(), fake_spool_handler, fake_consensus_handler,
+            statistics_handler=fake_statistics_handler
+        )
+
+        self.assertEqual(result, 1)
+        fake_spool_handler.append.assert_called_once_with({'k': 'v'})
+        fake_consensus_handler.add_source.assert_called_once_with('resource1', {'k': (1, 2)}, 1)
+        fake_statistics_handler.update.assert_not_called()
+        fake_spool_handler.start_drainer.assert_not_called()
+
+        with self.assertRaises(DataBaseIsNotReachable):
+            process_services(('resource1',), fake_db_client, Mock(), Mock())
+
+        # spooled payloads are replayed as soon as DB is reachable again
+        fake_db_client.insert_record.side_effect = None
+        fake_spool_handler.has_pending.return_value = True
+        process_services(('resource1',), fake_db_client, Mock(), Mock(), fake_spool_handler)
+        fake_spool_handler.start_drainer.assert_called_once_with(fake_db_client, None)
+
+        # record is not spooled, if only statistics can not be updated
+        fake_spool_handler.reset_mock()
+        fake_spool_handler.has_pending.return_value = False
+        fake_statistics_handler.update.side_effect = DataBaseIsNotReachable
+        process_services(
+            ('resource1',), fake_db_client, Mock(), Mock(), fake_spool_handler,
+            statistics_handler=fake_statistics_handler
+        )
+        fake_spool_handler.append.assert_not_called()
+        fake_statistics_handler.update.assert_called_once_with(fake_db_client, 'resource1', {'k': (1, 2)}, 1)
+
+    @patch('main.NOTIFICATION_LIMIT', 0)
+    @patch('main.prepare_db_payload')
+    @patch('main.RESOURCE_HANDLERS_MAPPING')
+    def test_process_services_alerts(self, patched_resource_handler_mapping, patched_prepare_db_payload):
+        patched_resource_handler_mapping.get.return_value = Mock(return_value=({'k': (1, 2)}, 1))
+        fake_alert_handler = Mock()
+        fake_alert_handler.evaluate.return_value = ['alert1', 'alert2']
+        fake_notify_manager = Mock()
+
+        process_services(('resource1',), Mock(), Mock(), fake_notify_manager, alert_handler=fake_alert_handler)
+
+        fake_alert_handler.evaluate.assert_called_once_with('resource1', {'k': (1, 2)}, 1)
+        self.assertEqual(fake_notify_manager.description, 'alert1\nalert2')
+        fake_notify_manager.send_push_notification.assert_called_once_with(group_id=1001)
+
+    @patch('main.NOTIFICATION_LIMIT', 0)
+    @patch('main.prepare_db_payload')
+    @patch('main.RESOURCE_HANDLERS_MAPPING')
+    def test_process_services_validation(self, patched_resource_handler_mapping, patched_prepare_db_payload):
+        patched_resource_handler_mapping.get.return_value = Mock(return_value=({'k': (1, 2)}, 1))
+        fake_db_client = Mock()
+        fake_validation_handler = Mock()
+        fake_validation_handler.validate.side_effect = [({'k': (1, 2)}, None), ({}, {'currencies': {'x': {}}})]
+
+        process_services(
+            ('resource1', 'resource2'), fake_db_client, Mock(), Mock(), validation_handler=fake_validation_handler
+        )
+
+        fake_db_client.insert_quarantine.assert_called_once_with({'currencies': {'x': {}}})
+        patched_prepare_db_payload.assert_called_once_with('resource1', {'k': (1, 2)}, 1)
+
+    @patch('main.NOTIFICATION_LIMIT', 0)
+    @patch('main.prepare_db_payload')
+    @patch('main.RESOURCE_HANDLERS_MAPPING')
+    def test_process_services_profiles(self, patched_resource_handler_mapping, patched_prepare_db_payload):
+        fake_handler = Mock(return_value=({'k': (1, 2), 'p': (3, 4)}, 1))
+        patched_resource_handler_mapping.get.return_value = fake_handler
+        fake_db_client = Mock()
+        fake_config_helper = Mock()
+        fake_config_helper.get_main_currencies.return_value = ('k',)
+        fake_profile_handler = Mock()
+        fake_profile_handler.derive.return_value = [{'profile': 'profile1'}]
+
+        process_services(
+            ('resource1',), fake_db_client, fake_config_helper, Mock(), profile_handler=fake_profile_handler
+        )
+
+        fake_handler.assert_called_once()
+        fake_profile_handler.derive.assert_called_once_with('resource1', {'k': (1, 2), 'p': (3, 4)}, 1)
+        fake_db_client.upsert_profile_records.assert_called_once_with([{'profile': 'profile1'}])
+        # currencies of profiles are not saved into main record
+        patched_prepare_db_payload.assert_called_once_with('resource1', {'k': (1, 2)}, 1)
+
+    @patch('main.NOTIFICATION_LIMIT', 0)
+    @patch('main.prepare_db_payload')
+    @patch('main.RESOURCE_HANDLERS_MAPPING')
+    def test_process_services_profiles_db_is_not_reachable(
+            self, patched_resource_handler_mapping, patched_prepare_db_payload
+    ):
+        patched_resource_handler_mapping.get.return_value = Mock(return_value=({'k': (1, 2)}, 1))
+        patched_prepare_db_payload.return_value = {'resource_name': 'resource1'}
+        fake_db_client = Mock()
+        fake_db_client.insert_record.side_effect = DataBaseIsNotReachable
+        fake_db_client.upsert_profile_records.side_effect = DataBaseIsNotReachable
+        fake_config_helper = Mock()
+        fake_config_helper.get_main_currencies.return_value = ('k',)
+        fake_profile_handler = Mock()
+        fake_profile_handler.derive.return_value = [{'profile': 'profile1'}]
+        fake_spool_handler = Mock()
+
+        process_services(
+            ('resource1',), fake_db_client, fake_config_helper, Mock(), spool_handler=fake_spool_handler,
+            profile_handler=fake_profile_handler
+        )
+
+        self.assertEqual(
+            [call[0][0] for call in fake_spool_handler.append.call_args_list],
+            [{'profile': 'profile1'}, {'resource_name': 'resource1'}]
+        )
+
+    @patch('main.NOTIFICATION_LIMIT', 3)
+    @patch('main.RATE_PRECISION', RatePrecision(default=2, currencies={'JPY': 4}))
+    @patch('main.prepare_db_payload')
+    @patch('main.RESOURCE_HANDLERS_MAPPING')
+    def test_process_services_notification_precision(
+            self, patched_resource_handler_mapping, patched_prepare_db_payload
+    ):
+        patched_resource_handler_mapping.get.return_value = Mock(
+            return_value=({'USD': (41.5, None), 'JPY': (0.276666, 0.27)}, 1)
+        )
+        fake_notify_manager = Mock()
+
+        process_services(('resource1',), Mock(), Mock(), fake_notify_manager)
+
+        self.assertEqual(
+            fake_notify_manager.description,
+            'USD: [Sale: 41.50, Purchase: n/a]\nJPY: [Sale: 0.2767, Purchase: 0.2700]\n'
+        )
+
+    @patch('main.NOTIFICATION_LIMIT', 0)
+    @patch('main.prepare_db_payload')
+    @patch('main.RESOURCE_HANDLERS_MAPPING')
+    def test_process_services_broadcast(self, patched_resource_handler_mapping, patched_prepare_db_payload):
+        patched_resource_handler_mapping.get.return_value = Mock(return_value=({'k': (1, 2)}, 1))
+        fake_broadcast_handler = Mock()
+
+        process_services(('resource1',), Mock(), Mock(), Mock(), broadcast_handler=fake_broadcast_handler)
+
+        fake_broadcast_handler.publish.assert_called_once_with('resource1', {'k': (1, 2)}, 1)
+
+    @patch('main.NOTIFICATION_LIMIT', 0)
+    @patch('main.prepare_db_payload')
+    @patch('main.RESOURCE_HANDLERS_MAPPING')
+    def test_process_services_latest_rates_cache(self, patched_resource_handler_mapping, patched_prepare_db_payload):
+        patched_resource_handler_mapping.get.return_value = Mock(return_value=({'k': (1, 2)}, 1))
+        fake_latest_rates_cache_handler = Mock()
+
+        process_services(
+            ('resource1',), Mock(), Mock(), Mock(), latest_rates_cache_handler=fake_latest_rates_cache_handler
+        )
+
+        fake_latest_rates_cache_handler.publish.assert_called_once_with('resource1', {'k': (1, 2)}, 1)
+
+    @patch('main.NOTIFICATION_LIMIT', 0)
+    @patch('main.prepare_db_payload')
+    @patch('main.RESOURCE_HANDLERS_MAPPING')
+    def test_process_services_shutdown(self, patched_resource_handler_mapping, patched_prepare_db_payload):
+        shutdown_handler = ShutdownHandler()
+        # shutdown is requested while the first resource is requested
+        patched_resource_handler_mapping.get.return_value = Mock(
+            side_effect=lambda config_helper: shutdown_handler.is_requested.set() or ({'k': (1, 2)}, 1)
+        )
+        fake_db_client = Mock()
+        fake_checkpoint_handler = Mock()
+
+        result = process_services(
+            ('resource1', 'resource2'), fake_db_client, Mock(), Mock(), checkpoint_handler=fake_checkpoint_handler,
+            shutdown_handler=shutdown_handler
+        )
+
+        self.assertEqual(result, 1)
+        fake_db_client.insert_record.assert_called_once()
+        fake_checkpoint_handler.observe.assert_called_once_with('resource1', {'k': (1, 2)}, 1)
+
+    @patch('main.requests_handler')
+    @patch('main.POLLING_SCHEDULE_HANDLER')
+    @patch('main.VALIDATION_HANDLER')
+    @patch('main.BROADCAST_HANDLER', None)
+    @patch('main.LATEST_RATES_CACHE_HANDLER')
+    def test_restore_checkpoint(
+            self, patched_latest_rates_cache_handler, patched_validation_handler, patched_polling_schedule_handler,
+            patched_requests_handler
+    ):
+        patched_polling_schedule_handler.schedule = {}
+        patched_latest_rates_cache_handler.get_resource.side_effect = [None, {'currencies': {}}]
+        fake_checkpoint_handler = Mock()
+        fake_checkpoint_handler.state = {'validators': {'url': {}}, 'polling_schedule': {'resource1': {}}}
+        fake_checkpoint_handler.get_latest_rates.return_value = {
+            'resource1': ({'USD': (41.5, 41.0)}, 1), 'resource2': ({'USD': (41.6, 41.0)}, 2),
+        }
+
+        restore_checkpoint(fake_checkpoint_handler)
+
+        patched_requests_handler.set_validator.assert_called_once_with('url', {})
+        self.assertEqual(patched_polling_schedule_handler.schedule, {'resource1': {}})
+        self.assertEqual(patched_validation_handler.restore_last_rates.call_count, 2)
+        patched_latest_rates_cache_handler.publish.assert_called_once_with('resource1', {'USD': (41.5, 41.0)}, 1)
+
     @patch('main.os')
     @patch('main.Path')
     def test_get_config_path_no_path_no_config_file(self, patched_path, patched_os):
@@ -94,19 +313,54 @@ class TestMain(unittest.TestCase):
 
         self.assertEqual(result, 'fake_conf_path')
 
+    @patch('main.ALERT_HANDLER', None)
+    @patch('main.STATISTICS_HANDLER', None)
+    @patch('main.BROADCAST_HANDLER', None)
+    @patch('main.POLLING_SCHEDULE_HANDLER', None)
+    @patch('main.LATEST_RATES_CACHE_HANDLER', None)
+    @patch('main.RATE_PRECISION', None)
+    @patch('main.VALIDATION_HANDLER', None)
+    @patch('main.CHECKPOINT_HANDLER', None)
+    @patch('app.utils.handlers.checkpoint_handler.CheckpointHandler')
+    @patch('main.restore_checkpoint')
+    @patch('app.utils.handlers.validation_handler.ValidationHandler')
+    @patch('app.utils.handlers.profile_handler.ProfileHandler')
+    @patch('app.utils.handlers.latest_rates_cache_handler.LatestRatesCacheHandler')
+    @patch('app.utils.handlers.gap_repair_handler.GapRepairHandler')
+    @patch('app.utils.handlers.polling_schedule_handler.PollingScheduleHandler')
+    @patch('app.utils.handlers.broadcast_handler.BroadcastHandler')
     @patch('main.process_services')
+    @patch('main.tracing_handler')
+    @patch('main.requests_handler')
+    @patch('app.utils.handlers.raw_archive_handler.RawArchiveHandler')
+    @patch('app.utils.handlers.work_distribution_handler.WorkDistributionHandler')
+    @patch('main.SpoolHandler')
     @patch('main.NotificationHandler')
     @patch('main.MongoDBHandler')
     @patch('main.ConfigHandler')
     @patch('main.get_config_path')
-    @patch('main.ArgumentsParser')
+    @patch('app.utils.handlers.arguments_handler.ArgumentsParser')
     def test_process(
             self, patched_argument_parser, patched_get_config_path, patched_config_handler, patched_mongo_db_handler,
-            patched_notification_handler, patched_process_services
+            patched_notification_handler, patched_spool_handler, patched_work_distribution_handler,
+            patched_raw_archive_handler, patched_requests_handler,
+            patched_tracing_handler, patched_process_services, patched_broadcast_handler,
+            patched_polling_schedule_handler, patched_gap_repair_handler, patched_latest_rates_cache_handler,
+            patched_validation_handler, patched_profile_handler, patched_restore_checkpoint,
+            patched_checkpoint_handler
     ):
+        patched_argument_parser.return_value.get_args.return_value.rebuild_rollups = False
+        patched_argument_parser.return_value.get_args.return_value.reprocess = False
+        patched_argument_parser.return_value.get_args.return_value.repair_gaps = False
         patched_config_handler.get_notifications_config.return_value = {'resource_limit': None}
         patched_process_services.return_value = 3
         patched_notification_handler.send_push_notification.return_value = None
+        # the run before restart was cut by shutdown, so planned time of the next run is not waited for
+        patched_checkpoint_handler.return_value.get_resume_delay.return_value = 3600
+        patched_checkpoint_handler.return_value.get_pending_resources.return_value = ('resource2', 'removed')
+        patched_config_handler.return_value.get_all_resources_names.return_value = ('resource1', 'resource2')
+        patched_polling_schedule_handler.return_value.get_due_resources.return_value = ('resource1',)
+        patched_work_distribution_handler.return_value.get_resources_to_process.side_effect = lambda names: names
 
         process()
 
@@ -115,6 +369,71 @@ class TestMain(unittest.TestCase):
         ]
 
         patched_notification_handler.assert_has_calls(calls)
+        patched_spool_handler.return_value.start_drainer.assert_called_once()
+        patched_spool_handler.return_value.wait_drainer.assert_called_once()
+        patched_work_distribution_handler.return_value.release.assert_called_once()
+        patched_raw_archive_handler.return_value.evict.assert_called_once()
+        patched_broadcast_handler.return_value.start_server.assert_called_once()
+        patched_polling_schedule_handler.return_value.get_due_resources.assert_called_once()
+        patched_polling_schedule_handler.return_value.save.assert_called_once()
+        patched_gap_repair_handler.return_value.repair.assert_called_once()
+        patched_latest_rates_cache_handler.assert_called_once()
+        patched_validation_handler.assert_called_once()
+        patched_profile_handler.assert_called_once()
+        patched_restore_checkpoint.assert_called_once_with(patched_checkpoint_handler.return_value)
+        patched_checkpoint_handler.return_value.update.assert_called_once()
+        self.assertEqual(patched_process_services.call_args[0][0], ('resource2', 'resource1'))
+        self.assertEqual(patched_checkpoint_handler.return_value.update.call_args[1]['pending_resources'], [])
+
+    @patch('main.process_services')
+    @patch('main.MongoDBHandler')
+    @patch('main.ConfigHandler')
+    @patch('main.get_config_path')
+    @patch('app.utils.handlers.arguments_handler.ArgumentsParser')
+    def test_process_rebuild_rollups(
+            self, patched_argument_parser, patched_get_config_path, patched_config_handler, patched_mongo_db_handler,
+            patched_process_services
+    ):
+        patched_argument_parser.return_value.get_args.return_value.rebuild_rollups = True
+
+        process()
+
+        patched_mongo_db_handler.return_value.rebuild_rollups.assert_called_once()
+        patched_process_services.assert_not_called()
+
+    @patch('main.RESOURCE_HANDLERS_MAPPING', {'resource1': 'handler1'})
+    @patch('main.prepare_db_payload')
+    def test_reprocess_archives(self, patched_prepare_db_payload):
+        patched_prepare_db_payload.return_value = {'k': 'v'}
+        fake_db_client = Mock()
+        fake_raw_archive_handler = Mock()
+        fake_raw_archive_handler.reprocess.return_value = [({'k': (1, 2)}, 1), ({}, None), ({'k': (1, 3)}, 2)]
+
+        result = reprocess_archives(('resource1', 'resource2'), fake_db_client, 'config', fake_raw_archive_handler, 2)
+
+        self.assertEqual(result, 2)
+        fake_raw_archive_handler.reprocess.assert_called_once_with('resource1', 'handler1', 'config', 2)
+        fake_db_client.upsert_records.assert_called_once_with([{'k': 'v'}, {'k': 'v'}], overwrite=True)
+
+    @patch('main.RESOURCE_HANDLERS_MAPPING', {'resource1': 'handler1'})
+    def test_reprocess_archives_validated(self):
+        fake_db_client = Mock()
+        fake_raw_archive_handler = Mock()
+        fake_raw_archive_handler.reprocess.return_value = [({'USD': (38.0, 37.0), 'EUR': (1.0, 2.0)}, 1)]
+        validation_handler = ValidationHandler(max_jump=0.01)
+        validation_handler.restore_last_rates('resource1', {'USD': (10.0, 10.0)})
+
+        result = reprocess_archives(
+            ('resource1',), fake_db_client, 'config', fake_raw_archive_handler, 2, validation_handler
+        )
+
+        self.assertEqual(result, 1)
+        payload = fake_db_client.upsert_records.call_args[0][0][0]
+        # archived rates are not checked for jumps
+        self.assertEqual(dict(payload.currencies), {'USD': (38.0, 37.0)})
+        quarantine_payload = fake_db_client.insert_quarantine.call_args[0][0]
+        self.assertEqual(list(quarantine_payload['currencies']), ['EUR'])
+        self.assertEqual(validation_handler._last_rates['resource1'], {'USD': 10.0})
 
     @patch('main.process')
     def test_main_errors(self, patched_process):
@@ -129,5 +448,38 @@ class TestMain(unittest.TestCase):
             main()
 
 
+class TestStartup(unittest.TestCase):
+    # heavy modules and handlers of optional features, which have to be imported on demand only
+    LAZY_MODULES = (
+        'pymongo', 'bson', 'requests', 'tenacity', 'yaml', 'argparse', 'http.server',
+        'concurrent.futures.process',
+        'app.utils.handlers.alert_handler', 'app.utils.handlers.broadcast_handler',
+        'app.utils.handlers.checkpoint_handler', 'app.utils.handlers.consensus_handler',
+        'app.utils.handlers.statistics_handler', 'app.utils.handlers.validation_handler',
+        'app.utils.handlers.profile_handler', 'app.utils.handlers.gap_repair_handler',
+        'app.utils.handlers.latest_rates_cache_handler', 'app.utils.handlers.arguments_handler',
+        'app.utils.handlers.raw_archive_handler', 'app.utils.handlers.polling_schedule_handler',
+        'app.utils.handlers.work_distribution_handler',
+    )
+    # import of "main" takes about 36 ms, budget is kept close to it to catch regressions
+    IMPORT_TIME_BUDGET_US = 60000
+
+    def test_import_time(self):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import main'],
+            cwd=Path(__file__).parent.parent, capture_output=True, text=True, check=True,
+        )
+        # line format: "import time: <self us> | <cumulative us> | <module name>"
+        cumulative_time_by_module = {}
+        for line in result.stderr.splitlines():
+            _, cumulative_time, module_name = line.split('|')
+            if cumulative_time.strip().isdigit():
+                cumulative_time_by_module[module_name.strip()] = int(cumulative_time)
+
+        for module_name in self.LAZY_MODULES:
+            self.assertNotIn(module_name, cumulative_time_by_module)
+        self.assertLess(cumulative_time_by_module['main'], self.IMPORT_TIME_BUDGET_US)
+
+
 if __name__ == '__main__':
     unittest.main()
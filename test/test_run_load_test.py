@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import patch, Mock
+
+from run_load_test import get_percentile, find_regressions, run_load_test, handle_synthetic_provider
+
+
+class TestRunLoadTest(unittest.TestCase):
+    def test_get_percentile(self):
+        values = [5, 1, 4, 2, 3]
+
+        self.assertEqual(get_percentile(values, 50), 3)
+        self.assertEqual(get_percentile(values, 99), 5)
+        self.assertEqual(get_percentile(values, 0), 1)
+
+    def test_find_regressions(self):
+        baseline = {'stages': {'10': {'throughput': 100, 'p99_cycle_ms': 100}}}
+        report = {'stages': {
+            '10': {'throughput': 70, 'p99_cycle_ms': 110, 'rss_growth_mb': 1, 'efficiency': 1.0},
+            '50': {'throughput': 35, 'p99_cycle_ms': 1000, 'rss_growth_mb': 100, 'efficiency': 0.5},
+        }}
+
+        regressions = find_regressions(report, baseline, max_regression=0.2, max_rss_growth_mb=50, min_efficiency=0.8)
+
+        self.assertEqual(len(regressions), 3)
+        self.assertIn('10 providers: throughput', regressions[0])
+        self.assertEqual(find_regressions(report, baseline, max_regression=0.5, max_rss_growth_mb=200), [])
+
+    @patch('run_load_test.CurrencyExtractionHandler.get_currency_from_resource')
+    def test_handle_synthetic_provider_time_is_increased(self, patched_get_currency_from_resource):
+        patched_get_currency_from_resource.side_effect = lambda *args, **kwargs: {
+            'result': 'success', 'base_code': 'USD', 'rates': {'USD': 1, 'EUR': 0.5, 'UAH': 41.5},
+        }
+        config_helper = Mock()
+        config_helper.get_currencies_of_interest.return_value = ('USD', 'EUR')
+        config_helper.get_base_currency.return_value = 'UAH'
+
+        provider_times = [handle_synthetic_provider('url', 'Synthetic', config_helper)[1] for _ in range(3)]
+
+        self.assertEqual(provider_times, sorted(set(provider_times)))
+
+    @patch('main.NOTIFICATION_LIMIT', 0)
+    def test_run_load_test(self):
+        report = run_load_test([1, 3], cycles=2)
+
+        self.assertEqual(report['backend'], 'memory')
+        self.assertEqual(list(report['stages']), ['1', '3'])
+        stage = report['stages']['3']
+        self.assertEqual(stage['cycles'], 2)
+        self.assertGreater(stage['throughput'], 0)
+        self.assertLessEqual(stage['p50_cycle_ms'], stage['p99_cycle_ms'])
+        self.assertGreater(stage['db_writes_per_sec'], 0)
+        self.assertEqual(report['stages']['1']['efficiency'], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
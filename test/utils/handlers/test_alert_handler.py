@@ -0,0 +1,70 @@
+import unittest
+
+from app.utils.handlers.alert_handler import AlertHandler
+from app.utils.custom_exceptions import ConfigFieldHasIncorrectValue
+
+
+class TestAlertHandler(unittest.TestCase):
+    def test_init_incorrect_rule(self):
+        with self.assertRaises(ConfigFieldHasIncorrectValue):
+            AlertHandler(rules=[{'type': 'threshold', 'currency': 'USD', 'field': 'sale', 'op': '!', 'value': 1}])
+        with self.assertRaises(ConfigFieldHasIncorrectValue):
+            AlertHandler(rules=[{'type': 'fake', 'currency': 'USD'}])
+        with self.assertRaises(ConfigFieldHasIncorrectValue):
+            AlertHandler(rules=[{'type': 'change', 'currency': 'USD', 'percent': 1}])
+
+    def test_evaluate_threshold(self):
+        alert_handler = AlertHandler(
+            rules=[{'type': 'threshold', 'currency': 'USD', 'field': 'sale', 'op': '>', 'value': 30}]
+        )
+
+        self.assertEqual(alert_handler.evaluate('A', {'USD': (29, 28), 'EUR': (40, 40)}, 1), [])
+        self.assertEqual(alert_handler.evaluate('A', {'USD': (31, 28)}, 2), ['USD sale 31 > 30 (A)'])
+        # alert is not repeated while rule is triggered
+        self.assertEqual(alert_handler.evaluate('A', {'USD': (32, 28)}, 3), [])
+        self.assertEqual(alert_handler.evaluate('A', {'USD': (29, 28)}, 4), [])
+        self.assertEqual(len(alert_handler.evaluate('A', {'USD': (31, 28)}, 5)), 1)
+
+    def test_evaluate_change(self):
+        alert_handler = AlertHandler(rules=[{'type': 'change', 'currency': 'EUR', 'percent': 1, 'window_sec': 3600}])
+
+        self.assertEqual(alert_handler.evaluate('A', {'EUR': (30, 30)}, 0), [])
+        self.assertEqual(alert_handler.evaluate('A', {'EUR': (30.2, 30.2)}, 1800), [])
+        self.assertEqual(len(alert_handler.evaluate('A', {'EUR': (30.4, 30.4)}, 3600)), 1)
+        # rate of 0 sec is out of window, so change is compared with rate of 1800 sec
+        self.assertEqual(alert_handler.evaluate('A', {'EUR': (30.4, 30.4)}, 3601), [])
+        self.assertEqual(len(alert_handler.history[('A', 'EUR')]), 3)
+
+    def test_evaluate_divergence(self):
+        alert_handler = AlertHandler(rules=[{'type': 'divergence', 'currency': 'USD', 'percent': 0.5}])
+
+        self.assertEqual(alert_handler.evaluate('A', {'USD': (27, 27)}, 1), [])
+        self.assertEqual(alert_handler.evaluate('B', {'USD': (27.1, 27.1)}, 1), [])
+        alerts = alert_handler.evaluate('C', {'USD': (28, 28)}, 1)
+        self.assertEqual(len(alerts), 1)
+        self.assertIn('diverge', alerts[0])
+
+    def test_evaluate_divergence_stale_rates(self):
+        alert_handler = AlertHandler(
+            rules=[{'type': 'divergence', 'currency': 'USD', 'percent': 0.5}], max_rate_age_sec=3600
+        )
+
+        self.assertEqual(alert_handler.evaluate('A', {'USD': (27, 27)}, 1), [])
+        # rate of "A" is too old to be compared
+        self.assertEqual(alert_handler.evaluate('B', {'USD': (28, 28)}, 3602), [])
+        self.assertEqual(alert_handler.latest_rates['USD'], {'B': (3602, 28)})
+        self.assertEqual(len(alert_handler.evaluate('A', {'USD': (27, 27)}, 3603)), 1)
+
+    def test_evaluate_window_size(self):
+        alert_handler = AlertHandler(
+            rules=[{'type': 'change', 'currency': 'USD', 'percent': 1, 'window_sec': 10 ** 6}], window_size=3
+        )
+        for ts in range(10):
+            alert_handler.evaluate('A', {'USD': (27, 27), 'EUR': (None, None)}, ts)
+
+        self.assertEqual(len(alert_handler.history[('A', 'USD')]), 3)
+        self.assertNotIn(('A', 'EUR'), alert_handler.history)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import json
+import unittest
+import http.client
+
+from app.utils.handlers.broadcast_handler import BroadcastHandler, Subscription
+
+
+class TestBroadcastHandler(unittest.TestCase):
+    def test_only_changed_rates_are_published(self):
+        broadcast_handler = BroadcastHandler()
+        subscription = broadcast_handler.subscribe()
+
+        broadcast_handler.publish('resource1', {'USD': (27.5, 27.1), 'EUR': (30.2, 30.0)}, 1)
+        broadcast_handler.publish('resource1', {'USD': (27.6, 27.1), 'EUR': (30.2, 30.0)}, 2)
+        self.assertEqual(broadcast_handler.publish('resource1', {'USD': (27.6, 27.1)}, 3), 0)
+
+        self.assertEqual(subscription.get(timeout=0), {
+            'resource_name': 'resource1', 'provider_ts': 1, 'currencies': {'USD': (27.5, 27.1), 'EUR': (30.2, 30.0)}
+        })
+        self.assertEqual(subscription.get(timeout=0), {
+            'resource_name': 'resource1', 'provider_ts': 2, 'currencies': {'USD': (27.6, 27.1)}
+        })
+        self.assertIsNone(subscription.get(timeout=0))
+
+    def test_restored_rates_are_not_published(self):
+        broadcast_handler = BroadcastHandler()
+        broadcast_handler.restore_last_rates('resource1', {'USD': [27.5, 27.1]})
+        subscription = broadcast_handler.subscribe()
+
+        self.assertEqual(broadcast_handler.publish('resource1', {'USD': (27.5, 27.1)}, 1), 0)
+        self.assertEqual(broadcast_handler.publish('resource1', {'USD': (27.6, 27.1)}, 2), 1)
+        self.assertEqual(subscription.get(timeout=0)['currencies'], {'USD': (27.6, 27.1)})
+
+    def test_subscriptions_are_filtered(self):
+        broadcast_handler = BroadcastHandler()
+        eur_subscription = broadcast_handler.subscribe(currencies=['EUR'])
+        resource2_subscription = broadcast_handler.subscribe(resources=['resource2'])
+
+        delivered_quantity = broadcast_handler.publish('resource1', {'USD': (27.5, 27.1), 'EUR': (30.2, 30.0)}, 1)
+
+        self.assertEqual(delivered_quantity, 1)
+        self.assertEqual(eur_subscription.get(timeout=0)['currencies'], {'EUR': (30.2, 30.0)})
+        self.assertIsNone(resource2_subscription.get(timeout=0))
+
+        broadcast_handler.unsubscribe(eur_subscription)
+        self.assertEqual(broadcast_handler.publish('resource1', {'EUR': (30.3, 30.0)}, 2), 0)
+
+    def test_the_oldest_updates_are_dropped(self):
+        subscription = Subscription(max_queue_size=2)
+        for provider_ts in range(3):
+            subscription.put({'provider_ts': provider_ts})
+
+        self.assertEqual(subscription.get(timeout=0), {'provider_ts': 1})
+        self.assertEqual(subscription.get(timeout=0), {'provider_ts': 2})
+
+    def test_server_sent_events(self):
+        broadcast_handler = BroadcastHandler(keepalive_sec=0.1)
+        port = broadcast_handler.start_server(port=0)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        try:
+            connection.request('GET', '/events?currency=USD&resource=resource1')
+            response = connection.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.getheader('Content-Type'), 'text/event-stream')
+            self.assertEqual(response.readline(), b': subscribed\n')
+            response.readline()
+
+            broadcast_handler.publish('resource2', {'USD': (27.5, 27.1)}, 1)
+            broadcast_handler.publish('resource1', {'USD': (27.5, 27.1), 'EUR': (30.2, 30.0)}, 1)
+            lines = []
+            while not lines or not lines[-1].startswith(b'data: '):
+                lines.append(response.readline())
+
+            self.assertEqual(lines[-2], b'event: rates\n')
+            self.assertEqual(json.loads(lines[-1][len(b'data: '):]), {
+                'resource_name': 'resource1', 'provider_ts': 1, 'currencies': {'USD': [27.5, 27.1]}
+            })
+        finally:
+            connection.close()
+            broadcast_handler.stop_server()
+
+    def test_server_unknown_path(self):
+        broadcast_handler = BroadcastHandler()
+        port = broadcast_handler.start_server(port=0)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        try:
+            connection.request('GET', '/unknown')
+            self.assertEqual(connection.getresponse().status, 404)
+        finally:
+            connection.close()
+            broadcast_handler.stop_server()
+
+
+if __name__ == '__main__':
+    unittest.main()
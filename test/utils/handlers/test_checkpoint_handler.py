@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from app.utils.rate_records import RateTable
+from app.utils.handlers.checkpoint_handler import CheckpointHandler
+
+
+class TestCheckpointHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'checkpoint.json')
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_state_is_kept_after_restart(self):
+        checkpoint_handler = CheckpointHandler(self.path)
+        checkpoint_handler.observe('resource1', RateTable({'USD': (41.5, 41.0), 'EUR': (None, 44.0)}), 100)
+        checkpoint_handler.update(validators={'url': {'etag': '"1"', 'last_modified': None, 'body': '{}'}})
+
+        restarted_checkpoint_handler = CheckpointHandler(self.path)
+
+        self.assertEqual(
+            restarted_checkpoint_handler.get_latest_rates(),
+            {'resource1': ({'USD': (41.5, 41.0), 'EUR': (None, 44.0)}, 100)},
+        )
+        self.assertEqual(restarted_checkpoint_handler.state['validators']['url']['etag'], '"1"')
+        self.assertFalse(os.path.exists(f'{self.path}.tmp'))
+
+    def test_broken_checkpoint(self):
+        with open(self.path, 'w') as checkpoint_file:
+            checkpoint_file.write('{"latest_rates": {')
+
+        checkpoint_handler = CheckpointHandler(self.path)
+
+        self.assertEqual(checkpoint_handler.state, {})
+        self.assertEqual(checkpoint_handler.get_resume_delay(), 0)
+
+    def test_run_is_resumed_at_planned_time(self):
+        CheckpointHandler(self.path).plan_next_run(600, now=1000)
+
+        checkpoint_handler = CheckpointHandler(self.path)
+
+        self.assertEqual(checkpoint_handler.get_resume_delay(now=1200), 400)
+        # the run after restart was skipped, so the next run is the planned one
+        self.assertEqual(checkpoint_handler.plan_next_run(600, now=1200), 400)
+        self.assertEqual(checkpoint_handler.get_resume_delay(now=1200), 0)
+        self.assertEqual(checkpoint_handler.plan_next_run(600, now=1600), 600)
+        self.assertEqual(CheckpointHandler(self.path).resume_ts, 2200)
+
+    def test_interrupted_run_is_resumed_after_restart(self):
+        checkpoint_handler = CheckpointHandler(self.path)
+        checkpoint_handler.update(pending_resources=['resource2'])
+
+        # the next run is not planned after the default interval, resources were skipped by shutdown
+        self.assertEqual(checkpoint_handler.plan_next_run(86400, now=1000), 0)
+
+        restarted_checkpoint_handler = CheckpointHandler(self.path)
+        self.assertEqual(restarted_checkpoint_handler.get_resume_delay(now=1000), 0)
+        self.assertEqual(restarted_checkpoint_handler.get_pending_resources(), ('resource2',))
+
+        restarted_checkpoint_handler.update(pending_resources=[])
+        self.assertEqual(restarted_checkpoint_handler.plan_next_run(86400, now=1000), 86400)
+
+
+if __name__ == '__main__':
+    unittest.main()
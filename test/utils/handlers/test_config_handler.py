@@ -41,17 +41,17 @@ class TestConfigHandler(unittest.TestCase):
         self.assertEqual(config_handler.service_configs, {'k': 'v'})
 
     @patch('builtins.open', new_callable=mock_open)
-    @patch('app.utils.handlers.config_handler.yaml')
-    def test_read_config_file_yaml_file_exists(self, patched_yaml_lib, patched_open):
-        patched_yaml_lib.load.return_value = {}
+    @patch('yaml.load')
+    def test_read_config_file_yaml_file_exists(self, patched_yaml_load, patched_open):
+        patched_yaml_load.return_value = {}
         result = ConfigHandler._read_config_file_yaml('path/to/file')
         self.assertEqual(result, {})
 
     @patch('app.utils.handlers.config_handler.logging')
-    @patch('app.utils.handlers.config_handler.yaml')
-    def test_read_config_file_yaml_file_not_found_error(self, patched_yaml_lib, patched_logging_lib):
+    @patch('yaml.load')
+    def test_read_config_file_yaml_file_not_found_error(self, patched_yaml_load, patched_logging_lib):
         patched_logging_lib.error.return_value = None  # omit error logs, since we do not need it in tests
-        patched_yaml_lib.load.return_value = {}
+        patched_yaml_load.return_value = {}
         with self.assertRaises(ConfigFileDoesNotFound):
             ConfigHandler._read_config_file_yaml('')
 
@@ -79,6 +79,24 @@ class TestConfigHandler(unittest.TestCase):
         result = self.config_handler_with_configs.get_currencies_of_interest()
         self.assertTupleEqual(tuple(sorted(result)), ('A', 'B', 'C'))
 
+    def test_get_main_currencies(self):
+        self.config_handler_with_configs.service_configs['profiles'] = {'profile1': {'main_currencies': 'E'}}
+        result = self.config_handler_with_configs.get_main_currencies()
+        self.assertTupleEqual(tuple(sorted(result)), ('A', 'B', 'C'))
+
+    @patch('app.utils.handlers.config_handler.logging')
+    def test_get_main_currencies_do_not_exist(self, patched_logging_lib):
+        with self.assertRaises(ConfigMandatoryFieldDoesNotFound):
+            self.config_handler_empty_configs.get_main_currencies()
+
+    def test_get_currencies_of_interest_with_profiles(self):
+        self.config_handler_with_configs.service_configs['profiles'] = {
+            'profile1': {'main_currencies': 'A E UAH'},
+            'profile2': {'main_currencies': 'B', 'base_currency': 'F'},
+        }
+        result = self.config_handler_with_configs.get_currencies_of_interest()
+        self.assertTupleEqual(tuple(sorted(result)), ('A', 'B', 'C', 'E', 'F'))
+
     @patch('app.utils.handlers.config_handler.logging')
     def test_get_currencies_of_interest_currencies_do_not_exist(self, patched_logging_lib):
         patched_logging_lib.error.return_value = None  # omit error logs, since we do not need it in tests
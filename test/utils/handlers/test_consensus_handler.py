@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from app.utils.handlers.consensus_handler import ConsensusHandler
+
+
+HANDLER_PATH = 'app.utils.handlers.consensus_handler'
+
+
+class TestConsensusHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.consensus_handler = ConsensusHandler(max_deviation=0.02, max_age_sec=100)
+
+    @patch(f'{HANDLER_PATH}.time')
+    def test_get_consensus(self, patched_time):
+        patched_time.time.return_value = 1000
+        patched_time.timezone = 0
+        self.consensus_handler.add_source('A', {'USD': (27.0, 27.0), 'EUR': (32.0, 30.0)}, 950)
+        self.consensus_handler.add_source('B', {'USD': (27.2, 27.2), 'EUR': (None, None)}, 950)
+        self.consensus_handler.add_source('C', {'USD': (30.0, 30.0)}, 950)
+
+        result = self.consensus_handler.get_consensus()
+
+        self.assertEqual(result['utc_time'], 1000)
+        self.assertEqual(result['stale_sources'], [])
+        self.assertAlmostEqual(result['currencies']['USD']['rate'], 27.1)
+        self.assertEqual(result['currencies']['USD']['sources'], ['A', 'B'])
+        self.assertEqual(result['currencies']['USD']['outliers'], ['C'])
+        self.assertEqual(result['currencies']['EUR'], {
+            'rate': 31.0, 'sale': 32.0, 'purchase': 30.0, 'sources': ['A'], 'outliers': []
+        })
+
+    @patch(f'{HANDLER_PATH}.time')
+    def test_get_consensus_stale_source(self, patched_time):
+        patched_time.time.return_value = 1000
+        self.consensus_handler.add_source('A', {'USD': (27.0, 27.0)}, 950)
+        self.consensus_handler.add_source('B', {'USD': (20.0, 20.0)}, 500)
+
+        result = self.consensus_handler.get_consensus()
+
+        self.assertEqual(result['stale_sources'], ['B'])
+        self.assertEqual(result['currencies']['USD']['rate'], 27.0)
+
+    @patch(f'{HANDLER_PATH}.time')
+    def test_get_consensus_weights(self, patched_time):
+        patched_time.time.return_value = 1000
+        consensus_handler = ConsensusHandler(max_deviation=0.1, max_age_sec=100, weights={'A': 3})
+        consensus_handler.add_source('A', {'USD': (28.0, 28.0)}, 950)
+        consensus_handler.add_source('B', {'USD': (27.0, 27.0)}, 950)
+
+        result = consensus_handler.get_consensus()
+
+        self.assertAlmostEqual(result['currencies']['USD']['rate'], 27.75)
+
+
+    @patch(f'{HANDLER_PATH}.time')
+    def test_get_consensus_all_outliers(self, patched_time):
+        patched_time.time.return_value = 1000
+        self.consensus_handler.add_source('A', {'USD': (27.0, 27.0)}, 950)
+        self.consensus_handler.add_source('B', {'USD': (30.0, 30.0)}, 950)
+
+        with self.assertLogs(level='WARNING') as logs:
+            result = self.consensus_handler.get_consensus()
+
+        self.assertEqual(result['currencies'], {})
+        self.assertIn("Rates of ['A', 'B'] for \"USD\" deviate from median", logs.output[0])
+        self.assertIn('All sources of "USD" were rejected as outliers', logs.output[1])
+
+    @patch(f'{HANDLER_PATH}.time')
+    def test_add_latest_sources(self, patched_time):
+        patched_time.time.return_value = 1000
+        db_client = Mock()
+        db_client.get_rates_snapshot.side_effect = lambda resource_name: {
+            'B': {'currencies': {'USD': [27.2, 27.2]}, 'provider_ts': 900},
+            'C': {'currencies': {'USD': [20.0, 20.0]}, 'provider_ts': 500},
+        }.get(resource_name)
+        self.consensus_handler.add_source('A', {'USD': (27.0, 27.0)}, 950)
+
+        self.consensus_handler.add_latest_sources(['A', 'B', 'C', 'D'], db_client)
+        result = self.consensus_handler.get_consensus()
+
+        # rates of processed resource are not read from DB
+        self.assertEqual(db_client.get_rates_snapshot.call_count, 3)
+        self.assertEqual(result['stale_sources'], ['C'])
+        self.assertEqual(result['currencies']['USD']['sources'], ['A', 'B'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import json
+import datetime
+import unittest
+import http.client
+from unittest.mock import Mock, call
+
+from app.utils.custom_exceptions import (
+    ConfigFieldHasIncorrectValue, DataBaseIsNotReachable, LatestRatesCacheIsNotAvailable
+)
+from app.utils.handlers.conversion_handler import ConversionHandler
+
+DAY_END_TS = int(datetime.datetime(2024, 1, 2, 23, 59, 59, tzinfo=datetime.timezone.utc).timestamp())
+
+
+def get_fake_db_client():
+    db_client = Mock()
+    db_client.get_rates_snapshot.side_effect = lambda resource_name, ts: {
+        'resource_name': resource_name,
+        'currencies': {'USD': (38.0, 37.0), 'EUR': (41.0, 40.0), 'PLN': (None, 9.0)},
+    }
+    return db_client
+
+
+class TestConversionHandler(unittest.TestCase):
+    def test_init_incorrect_rate_field(self):
+        with self.assertRaises(ConfigFieldHasIncorrectValue):
+            ConversionHandler(Mock(), rate_field='average')
+
+    def test_get_snapshot_ts(self):
+        self.assertIsNone(ConversionHandler.get_snapshot_ts(None))
+        self.assertEqual(ConversionHandler.get_snapshot_ts(100), 100)
+        self.assertEqual(ConversionHandler.get_snapshot_ts('2024-01-02'), DAY_END_TS)
+        self.assertEqual(ConversionHandler.get_snapshot_ts(datetime.date(2024, 1, 2)), DAY_END_TS)
+        self.assertEqual(
+            ConversionHandler.get_snapshot_ts(datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc)),
+            DAY_END_TS - 86399,
+        )
+        with self.assertRaises(ValueError):
+            ConversionHandler.get_snapshot_ts('02.01.2024')
+
+    def test_convert_batch(self):
+        db_client = get_fake_db_client()
+        conversion_handler = ConversionHandler(db_client)
+
+        results = conversion_handler.convert_batch([
+            [100, 'USD', 'UAH', '2024-01-02'],
+            [10, 'USD', 'EUR', '2024-01-02'],
+            [75, 'UAH', 'USD', '2024-01-02'],
+            [1, 'USD', 'GBP', '2024-01-02'],
+            [1, 'PLN', 'UAH', '2024-01-02'],
+            [1, 'EUR', 'UAH', '2024-01-02', 'Monobank'],
+            [1, 'EUR', 'UAH', None],
+        ])
+
+        self.assertEqual(results, [3750.0, 10 * 37.5 / 40.5, 2.0, None, None, 40.5, 40.5])
+        self.assertEqual(db_client.get_rates_snapshot.call_args_list, [
+            call('PrivatBank', DAY_END_TS), call('Monobank', DAY_END_TS), call('PrivatBank', None),
+        ])
+
+    def test_convert_batch_by_rate_field(self):
+        conversion_handler = ConversionHandler(get_fake_db_client(), rate_field='purchase')
+
+        self.assertEqual(conversion_handler.convert_batch([[2, 'PLN', 'UAH', None]]), [18.0])
+
+    def test_snapshots_cache(self):
+        db_client = get_fake_db_client()
+        conversion_handler = ConversionHandler(db_client, cache_size=2)
+
+        conversion_handler.convert_batch([[1, 'USD', 'UAH', 1], [1, 'USD', 'UAH', 2], [1, 'USD', 'UAH', None]])
+        conversion_handler.convert_batch([[1, 'USD', 'UAH', 1], [1, 'USD', 'UAH', None]])
+        self.assertEqual(db_client.get_rates_snapshot.call_count, 4)
+
+        # snapshot "2" is the least recently used one, so it is evicted
+        conversion_handler.convert_batch([[1, 'USD', 'UAH', 3]])
+        conversion_handler.convert_batch([[1, 'USD', 'UAH', 1], [1, 'USD', 'UAH', 2]])
+        self.assertEqual(db_client.get_rates_snapshot.call_args_list[-2:], [
+            call('PrivatBank', 3), call('PrivatBank', 2),
+        ])
+
+    def test_snapshots_cache_skips_current_and_missing(self):
+        db_client = get_fake_db_client()
+        conversion_handler = ConversionHandler(db_client)
+        today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+        # snapshot of the current day is not final yet
+        conversion_handler.convert_batch([[1, 'USD', 'UAH', today]])
+        conversion_handler.convert_batch([[1, 'USD', 'UAH', today]])
+        self.assertEqual(db_client.get_rates_snapshot.call_count, 2)
+
+        # missing rates could be repaired later
+        db_client.get_rates_snapshot.side_effect = None
+        db_client.get_rates_snapshot.return_value = None
+        self.assertEqual(conversion_handler.convert_batch([[1, 'USD', 'UAH', 1]]), [None])
+        conversion_handler.convert_batch([[1, 'USD', 'UAH', 1]])
+        self.assertEqual(db_client.get_rates_snapshot.call_count, 4)
+
+    def test_latest_rates_from_cache(self):
+        db_client = get_fake_db_client()
+        latest_rates_cache = Mock()
+        latest_rates_cache.get_resource.side_effect = lambda resource_name: {
+            'PrivatBank': {'resource_name': 'PrivatBank', 'provider_ts': 1, 'currencies': {'USD': (39.0, 38.0)}},
+        }.get(resource_name)
+        conversion_handler = ConversionHandler(db_client, latest_rates_cache=latest_rates_cache)
+
+        results = conversion_handler.convert_batch([[1, 'USD', 'UAH', None], [1, 'USD', 'UAH', None, 'Monobank']])
+
+        self.assertEqual(results, [38.5, 37.5])
+        db_client.get_rates_snapshot.assert_called_once_with('Monobank', None)
+
+    def test_latest_rates_cache_is_not_available(self):
+        db_client = get_fake_db_client()
+        latest_rates_cache = Mock()
+        latest_rates_cache.get_resource.side_effect = LatestRatesCacheIsNotAvailable
+        conversion_handler = ConversionHandler(db_client, latest_rates_cache=latest_rates_cache)
+
+        self.assertEqual(conversion_handler.convert_batch([[1, 'USD', 'UAH', None]]), [37.5])
+        db_client.get_rates_snapshot.assert_called_once_with('PrivatBank', None)
+
+    def test_server_convert(self):
+        conversion_handler = ConversionHandler(get_fake_db_client())
+        port = conversion_handler.start_server(port=0)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        try:
+            connection.request('POST', '/convert', json.dumps({'conversions': [[100, 'USD', 'UAH', '2024-01-02']]}))
+            response = connection.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(json.loads(response.read()), {'results': [3750.0]})
+
+            connection.request('POST', '/convert', json.dumps({'conversions': [[100, 'USD', 'UAH', 'yesterday']]}))
+            response = connection.getresponse()
+            self.assertEqual(response.status, 400)
+            response.read()
+
+            connection.request('POST', '/unknown', '{}')
+            response = connection.getresponse()
+            self.assertEqual(response.status, 404)
+            response.read()
+        finally:
+            connection.close()
+            conversion_handler.stop_server()
+
+    def test_server_db_is_not_reachable(self):
+        db_client = Mock()
+        db_client.get_rates_snapshot.side_effect = DataBaseIsNotReachable
+        conversion_handler = ConversionHandler(db_client)
+        port = conversion_handler.start_server(port=0)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        try:
+            connection.request('POST', '/convert', json.dumps({'conversions': [[100, 'USD', 'UAH', None]]}))
+            self.assertEqual(connection.getresponse().status, 503)
+        finally:
+            connection.close()
+            conversion_handler.stop_server()
+
+
+if __name__ == '__main__':
+    unittest.main()
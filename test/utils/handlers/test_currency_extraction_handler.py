@@ -1,4 +1,5 @@
 import json
+import datetime
 import unittest
 from unittest.mock import Mock, patch
 
@@ -10,6 +11,7 @@ from app.utils.handlers.currency_extraction_handlers import (
 class TestCurrencyExtractionHandler(unittest.TestCase):
     def setUp(self) -> None:
         self.privat_bank_api_response = {
+            'date': '02.01.1970',
             'exchangeRate': [
                 {'currency': 'Stub', 'saleRateNB': 1, 'purchaseRateNB': 1},
                 {'currency': 'A', 'saleRateNB': 1, 'purchaseRateNB': 11},
@@ -19,6 +21,7 @@ class TestCurrencyExtractionHandler(unittest.TestCase):
         }
         self.open_exchange_api_response_success = {
             'result': 'success',
+            'time_last_update_unix': 1600000000,
             'base_code': 'A',
             'rates': {
                 'A': 1,
@@ -30,6 +33,7 @@ class TestCurrencyExtractionHandler(unittest.TestCase):
         self.currency_api_response_invalid = {'valid': False}
         self.currency_api_response_valid = {
             'valid': True,
+            'updated': 1600000001,
             'base': 'A',
             'rates': {
                 'A': 1,
@@ -55,6 +59,23 @@ class TestCurrencyExtractionHandler(unittest.TestCase):
         expected = {}
         self.assertEqual(result, expected)
 
+    @patch('app.utils.handlers.currency_extraction_handlers.get_with_retry')
+    def test_get_currency_from_resource_raw_response_is_archived(self, patched_get_with_retry):
+        fake_response = Mock()
+        fake_response.json.return_value = {}
+        fake_response.content = b'{}'
+        patched_get_with_retry.return_value = fake_response
+        fake_raw_archive = Mock()
+
+        CurrencyExtractionHandler.raw_archive = fake_raw_archive
+        try:
+            CurrencyExtractionHandler.get_currency_from_resource('fake_url', resource_name='fake_resource')
+        finally:
+            CurrencyExtractionHandler.raw_archive = None
+
+        fake_raw_archive.save.assert_called_once_with('fake_resource', b'{}')
+        patched_get_with_retry.assert_called_once_with('fake_url')
+
     @patch('app.utils.handlers.currency_extraction_handlers.get_with_retry')
     def test_get_currency_from_resource_can_not_parse_response(self, patched_get_with_retry):
         fake_response = Mock()
@@ -82,6 +103,15 @@ class TestCurrencyExtractionHandler(unittest.TestCase):
         }
         self.assertEqual(expected, rates_with_new_base)
 
+    def test_get_provider_timestamp(self):
+        self.assertEqual(CurrencyExtractionHandler.get_provider_timestamp('fake', 1600000000.0), 1600000000)
+
+    @patch('app.utils.handlers.currency_extraction_handlers.time')
+    def test_get_provider_timestamp_not_reported(self, patched_time):
+        patched_time.time.return_value = 123.4
+        self.assertEqual(CurrencyExtractionHandler.get_provider_timestamp('fake', None), 123)
+        self.assertEqual(CurrencyExtractionHandler.get_provider_timestamp('fake', None, 100.5), 100)
+
     # PrivatBank Tests
     @patch('app.utils.handlers.currency_extraction_handlers.CurrencyExtractionHandler.get_currency_from_resource')
     def test_handle_privat_bank_full_response_parsed(self, patched_get_currency_from_resource):
@@ -91,9 +121,17 @@ class TestCurrencyExtractionHandler(unittest.TestCase):
             'A': (1, 11),
             'B': (2, 22),
             'C': (3, 33),
-        }
+        }, 86400
         self.assertEqual(expected, result)
 
+    @patch('app.utils.handlers.currency_extraction_handlers.CurrencyExtractionHandler.get_currency_from_resource')
+    def test_handle_privat_bank_by_date(self, patched_get_currency_from_resource):
+        patched_get_currency_from_resource.return_value = self.privat_bank_api_response
+        CurrencyExtractionHandler.handle_privat_bank(self.config_helper_2, date=datetime.date(2024, 1, 2))
+        self.assertEqual(patched_get_currency_from_resource.call_args[0][1], {'date': '02.01.2024', 'json': ''})
+        # validators of past dates are not kept
+        self.assertFalse(patched_get_currency_from_resource.call_args[1]['conditional'])
+
     @patch('app.utils.handlers.currency_extraction_handlers.CurrencyExtractionHandler.get_currency_from_resource')
     def test_handle_privat_bank_not_full_response_parsed(self, patched_get_currency_from_resource):
         patched_get_currency_from_resource.return_value = self.privat_bank_api_response
@@ -101,15 +139,21 @@ class TestCurrencyExtractionHandler(unittest.TestCase):
         expected = {
             'A': (1, 11),
             'B': (2, 22),
-        }
+        }, 86400
         self.assertEqual(expected, result)
 
+    @patch('app.utils.handlers.currency_extraction_handlers.CurrencyExtractionHandler.get_currency_from_resource')
+    def test_handle_privat_bank_response_data_passed(self, patched_get_currency_from_resource):
+        result = CurrencyExtractionHandler.handle_privat_bank(self.config_helper_1, self.privat_bank_api_response)
+        self.assertEqual(result[0], {'A': (1, 11), 'B': (2, 22)})
+        patched_get_currency_from_resource.assert_not_called()
+
     # OpenExchangeAPI Tests
     @patch('app.utils.handlers.currency_extraction_handlers.CurrencyExtractionHandler.get_currency_from_resource')
     def test_handle_open_exchange_api_failed_api_response(self, patched_get_currency_from_resource):
         patched_get_currency_from_resource.return_value = self.open_exchange_api_response_error
         result = CurrencyExtractionHandler.handle_open_exchange_api(self.config_helper_1)
-        expected = {}
+        expected = {}, None
         self.assertEqual(result, expected)
 
     @patch('app.utils.handlers.currency_extraction_handlers.CurrencyExtractionHandler.change_currency_base')
@@ -127,7 +171,7 @@ class TestCurrencyExtractionHandler(unittest.TestCase):
         expected = {
             'A': (0.5, 0.5),
             'C': (1.5, 1.5),
-        }
+        }, 1600000000
         self.assertEqual(expected, result)
 
     # CurrencyAPI Tests
@@ -137,7 +181,7 @@ class TestCurrencyExtractionHandler(unittest.TestCase):
         patched_get_currency_from_resource.return_value = self.currency_api_response_invalid
         patched_os.environ.get.return_value = 'API_KEY'
         result = CurrencyExtractionHandler.handle_currency_api(self.config_helper_2)
-        expected = {}
+        expected = {}, None
         self.assertEqual(expected, result)
 
     @patch('app.utils.handlers.currency_extraction_handlers.os')
@@ -155,7 +199,7 @@ class TestCurrencyExtractionHandler(unittest.TestCase):
         expected = {
             'A': (0.5, 0.5),
             'C': (1.5, 1.5),
-        }
+        }, 1600000001
         self.assertEqual(expected, result)
 
 
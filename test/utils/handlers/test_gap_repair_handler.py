@@ -0,0 +1,157 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from app.utils.custom_exceptions import CanNotGetCurrenciesFromService
+from app.utils.handlers.gap_repair_handler import GapRepairHandler
+from app.utils.handlers.validation_handler import ValidationHandler
+
+DAY = 86400
+
+
+class TestGapRepairHandler(unittest.TestCase):
+    def test_get_median_interval(self):
+        self.assertIsNone(GapRepairHandler.get_median_interval([1]))
+        self.assertEqual(GapRepairHandler.get_median_interval([0, 100, 200, 900, 1000]), 100)
+
+    def test_find_gaps(self):
+        gap_repair_handler = GapRepairHandler(Mock(), Mock(), {}, expected_intervals_sec={'PrivatBank': DAY})
+
+        self.assertEqual(gap_repair_handler.find_gaps('PrivatBank', [0, DAY, 2 * DAY]), [])
+        self.assertEqual(gap_repair_handler.find_gaps('PrivatBank', [0, DAY, 4 * DAY]), [2 * DAY, 3 * DAY])
+        # late record is not a gap
+        self.assertEqual(gap_repair_handler.find_gaps('PrivatBank', [0, 1.4 * DAY]), [])
+
+    def test_find_gaps_by_learned_interval(self):
+        gap_repair_handler = GapRepairHandler(Mock(), Mock(), {})
+
+        self.assertEqual(gap_repair_handler.find_gaps('resource1', [0, 60, 120, 300, 360]), [180, 240])
+        self.assertEqual(gap_repair_handler.find_gaps('resource1', [0]), [])
+
+    def test_get_repair_tasks(self):
+        gap_repair_handler = GapRepairHandler(
+            Mock(), Mock(), {'PrivatBank': Mock()}, expected_intervals_sec={'PrivatBank': DAY}, max_repairs=2
+        )
+
+        tasks = gap_repair_handler.get_repair_tasks({
+            'PrivatBank': [0, DAY, 5 * DAY],
+            'CurrencyAPI': [0, 60, 120, 300],
+        })
+
+        self.assertEqual(tasks, [('PrivatBank', 4 * DAY), ('PrivatBank', 3 * DAY)])
+
+    def test_repair(self):
+        fake_db_client = Mock()
+        fake_db_client.get_history_index.return_value = {'PrivatBank': [0, DAY, 4 * DAY]}
+        fake_db_client.upsert_records.return_value = 1
+        fake_repair_handler = Mock(side_effect=[({'USD': (38.0, 37.0)}, 3 * DAY), CanNotGetCurrenciesFromService])
+        gap_repair_handler = GapRepairHandler(
+            fake_db_client, Mock(), {'PrivatBank': fake_repair_handler}, workers=1, lookback_sec=10 * DAY
+        )
+
+        result = gap_repair_handler.repair(now=5 * DAY)
+
+        self.assertEqual(result, 1)
+        fake_db_client.get_history_index.assert_called_once_with(since_ts=-5 * DAY)
+        self.assertEqual(
+            [str(repair_call[1]['date']) for repair_call in fake_repair_handler.call_args_list],
+            ['1970-01-04', '1970-01-03'],
+        )
+        payloads = fake_db_client.upsert_records.call_args[0][0]
+        self.assertEqual(len(payloads), 1)
+        self.assertEqual(payloads[0].provider_ts, 3 * DAY)
+        self.assertEqual(payloads[0].currencies, {'USD': (38.0, 37.0)})
+
+    def test_repair_validated(self):
+        fake_db_client = Mock()
+        fake_db_client.get_history_index.return_value = {'PrivatBank': [0, DAY, 4 * DAY]}
+        fake_repair_handler = Mock(side_effect=[
+            ({'USD': (38.0, 37.0), 'EUR': (41.0, None)}, 3 * DAY), ({'EUR': (41.0, None)}, 2 * DAY),
+        ])
+        gap_repair_handler = GapRepairHandler(
+            fake_db_client, Mock(), {'PrivatBank': fake_repair_handler}, workers=1,
+            validation_handler=ValidationHandler(),
+        )
+
+        gap_repair_handler.repair(now=5 * DAY)
+
+        payloads = fake_db_client.upsert_records.call_args[0][0]
+        self.assertEqual([payload.provider_ts for payload in payloads], [3 * DAY])
+        self.assertEqual(dict(payloads[0].currencies), {'USD': (38.0, 37.0)})
+        self.assertEqual(fake_db_client.insert_quarantine.call_count, 2)
+
+    def test_repair_main_currencies(self):
+        fake_db_client = Mock()
+        fake_db_client.get_history_index.return_value = {'PrivatBank': [0, DAY, 4 * DAY]}
+        fake_repair_handler = Mock(side_effect=[
+            ({'USD': (38.0, 37.0), 'PLN': (9.0, 8.0)}, 3 * DAY), ({'PLN': (9.0, 8.0)}, 2 * DAY),
+        ])
+        gap_repair_handler = GapRepairHandler(
+            fake_db_client, Mock(), {'PrivatBank': fake_repair_handler}, workers=1, main_currencies=('USD',)
+        )
+
+        gap_repair_handler.repair(now=5 * DAY)
+
+        payloads = fake_db_client.upsert_records.call_args[0][0]
+        self.assertEqual([payload.provider_ts for payload in payloads], [3 * DAY])
+        self.assertEqual(dict(payloads[0].currencies), {'USD': (38.0, 37.0)})
+
+    def test_repair_unexpected_error(self):
+        fake_db_client = Mock()
+        fake_db_client.get_history_index.return_value = {'PrivatBank': [0, DAY, 4 * DAY]}
+        fake_db_client.upsert_records.return_value = 1
+        # unexpected response of archive
+        fake_repair_handler = Mock(side_effect=[KeyError('exchangeRate'), ({'USD': (38.0, 37.0)}, 2 * DAY)])
+        gap_repair_handler = GapRepairHandler(
+            fake_db_client, Mock(), {'PrivatBank': fake_repair_handler}, workers=1, lookback_sec=10 * DAY
+        )
+
+        result = gap_repair_handler.repair(now=5 * DAY)
+
+        self.assertEqual(result, 1)
+        payloads = fake_db_client.upsert_records.call_args[0][0]
+        self.assertEqual([payload.provider_ts for payload in payloads], [2 * DAY])
+        # failed re-fetch is counted as attempt
+        self.assertEqual(len(gap_repair_handler.attempts), 2)
+
+    def test_repair_without_gaps(self):
+        fake_db_client = Mock()
+        fake_db_client.get_history_index.return_value = {'PrivatBank': [0, DAY]}
+        gap_repair_handler = GapRepairHandler(fake_db_client, Mock(), {'PrivatBank': Mock()})
+
+        self.assertEqual(gap_repair_handler.repair(), 0)
+        fake_db_client.upsert_records.assert_not_called()
+
+    def test_repair_failed_gap_is_backed_off(self):
+        temp_dir = tempfile.mkdtemp()
+        state_path = os.path.join(temp_dir, 'gap_repair_attempts.json')
+        fake_db_client = Mock()
+        fake_db_client.get_history_index.return_value = {'PrivatBank': [0, DAY, 3 * DAY]}
+        fake_db_client.upsert_records.return_value = 0
+        fake_repair_handler = Mock(return_value=({}, None))
+        gap_repair_handler = GapRepairHandler(
+            fake_db_client, Mock(), {'PrivatBank': fake_repair_handler}, expected_intervals_sec={'PrivatBank': DAY},
+            state_path=state_path, retry_backoff_sec=100, max_attempts=2
+        )
+
+        gap_repair_handler.repair(now=4 * DAY)
+        # attempts are kept between runs
+        gap_repair_handler = GapRepairHandler(
+            fake_db_client, Mock(), {'PrivatBank': fake_repair_handler}, expected_intervals_sec={'PrivatBank': DAY},
+            state_path=state_path, retry_backoff_sec=100, max_attempts=2
+        )
+        self.assertEqual(gap_repair_handler.get_repair_tasks({'PrivatBank': [0, DAY, 3 * DAY]}, 4 * DAY + 99), [])
+        gap_repair_handler.repair(now=4 * DAY + 100)
+        # gap is given up after "max_attempts"
+        self.assertEqual(gap_repair_handler.get_repair_tasks({'PrivatBank': [0, DAY, 3 * DAY]}, 5 * DAY), [])
+        self.assertEqual(fake_repair_handler.call_count, 2)
+        # attempts of repaired gap are removed
+        gap_repair_handler.get_repair_tasks({'PrivatBank': [0, DAY, 2 * DAY, 3 * DAY]}, 5 * DAY)
+        self.assertEqual(gap_repair_handler.attempts, {})
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import unittest
+import tempfile
+import threading
+import multiprocessing
+
+from app.utils.custom_exceptions import LatestRatesCacheIsNotAvailable
+from app.utils.handlers.latest_rates_cache_handler import LatestRatesCacheHandler, SEQUENCE, SEQUENCE_OFFSET
+
+
+def _read_in_process(path: str, result_queue) -> None:
+    reader = LatestRatesCacheHandler(path)
+    result_queue.put(reader.get('PrivatBank', 'USD'))
+    reader.close()
+
+
+class TestLatestRatesCacheHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'latest_rates.cache')
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_publish_and_get(self):
+        writer = LatestRatesCacheHandler(self.path, max_entries=8, writable=True)
+        reader = LatestRatesCacheHandler(self.path)
+        try:
+            self.assertIsNone(reader.get('PrivatBank', 'USD'))
+            self.assertIsNone(reader.get_resource('PrivatBank'))
+
+            self.assertEqual(writer.publish('PrivatBank', {'USD': (38.0, 37.5), 'EUR': (41.0, None)}, 100), 2)
+            writer.publish('CurrencyAPI', {'USD': (38.1, 38.1)}, 200)
+            writer.publish('PrivatBank', {'USD': (38.2, 37.6)}, 300)
+
+            self.assertEqual(reader.get('PrivatBank', 'USD'), (38.2, 37.6))
+            self.assertEqual(reader.get('CurrencyAPI', 'USD'), (38.1, 38.1))
+            self.assertIsNone(reader.get('CurrencyAPI', 'EUR'))
+            self.assertEqual(reader.get_resource('PrivatBank'), {
+                'resource_name': 'PrivatBank', 'provider_ts': 300,
+                'currencies': {'USD': (38.2, 37.6), 'EUR': (41.0, None)},
+            })
+        finally:
+            reader.close()
+            writer.close()
+
+    def test_cache_is_full(self):
+        writer = LatestRatesCacheHandler(self.path, max_entries=2, writable=True)
+        try:
+            self.assertEqual(writer.publish('PrivatBank', {'USD': (1, 1), 'EUR': (2, 2), 'PLN': (3, 3)}, 1), 2)
+            self.assertEqual(writer.publish('PrivatBank', {'USD': (4, 4)}, 2), 1)
+        finally:
+            writer.close()
+
+    def test_writer_restart(self):
+        writer = LatestRatesCacheHandler(self.path, max_entries=8, writable=True)
+        writer.publish('PrivatBank', {'USD': (38.0, 37.5)}, 100)
+        # writer was stopped during update
+        SEQUENCE.pack_into(writer._mmap, SEQUENCE_OFFSET, 3)
+        writer.close()
+
+        writer = LatestRatesCacheHandler(self.path, max_entries=8, writable=True)
+        try:
+            writer.publish('PrivatBank', {'EUR': (41.0, 40.5)}, 200)
+            self.assertEqual(writer.get_resource('PrivatBank')['currencies'], {
+                'USD': (38.0, 37.5), 'EUR': (41.0, 40.5),
+            })
+        finally:
+            writer.close()
+
+    def test_reader_retries_during_update(self):
+        writer = LatestRatesCacheHandler(self.path, max_entries=8, writable=True)
+        writer.publish('PrivatBank', {'USD': (38.0, 37.5)}, 100)
+        reader = LatestRatesCacheHandler(self.path)
+        try:
+            SEQUENCE.pack_into(writer._mmap, SEQUENCE_OFFSET, 3)
+            timer = threading.Timer(0.05, SEQUENCE.pack_into, (writer._mmap, SEQUENCE_OFFSET, 4))
+            timer.start()
+            self.assertEqual(reader.get('PrivatBank', 'USD'), (38.0, 37.5))
+            timer.join()
+
+            SEQUENCE.pack_into(writer._mmap, SEQUENCE_OFFSET, 5)
+            with self.assertRaises(LatestRatesCacheIsNotAvailable):
+                reader.get('PrivatBank', 'USD')
+        finally:
+            reader.close()
+            writer.close()
+
+    def test_reader_in_another_process(self):
+        writer = LatestRatesCacheHandler(self.path, max_entries=8, writable=True)
+        try:
+            writer.publish('PrivatBank', {'USD': (38.0, 37.5)}, 100)
+            result_queue = multiprocessing.Queue()
+            reader_process = multiprocessing.Process(target=_read_in_process, args=(self.path, result_queue))
+            reader_process.start()
+            self.assertEqual(result_queue.get(timeout=10), (38.0, 37.5))
+            reader_process.join()
+        finally:
+            writer.close()
+
+    def test_open_not_existing_cache(self):
+        with self.assertRaises(LatestRatesCacheIsNotAvailable):
+            LatestRatesCacheHandler(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
 import unittest
 from unittest.mock import Mock, MagicMock, patch, call
 
+from pymongo.errors import ServerSelectionTimeoutError, DuplicateKeyError
+
 from app.utils.handlers.mongo_db_handler import MongoDBHandler
+from app.utils.custom_exceptions import DataBaseIsNotReachable
 
 
 HANDLER_PATH = 'app.utils.handlers.mongo_db_handler'
@@ -12,52 +15,71 @@ class TestMongoDBHandler(unittest.TestCase):
         self.os_env_patched_value = ['MONGO_DB_ADDR', '1234']
 
     @patch(f'{HANDLER_PATH}.os')
-    @patch(f'{HANDLER_PATH}.MongoClient')
+    @patch('pymongo.MongoClient')
     def test_init_no_path(self, patched_mongo_client, patched_os):
         db_path = None
         patched_os.environ.get.side_effect = self.os_env_patched_value
 
-        MongoDBHandler(db_path=db_path, db_name='test')
+        client = MongoDBHandler(db_path=db_path, db_name='test')
+        patched_mongo_client.assert_not_called()
+        client.client
 
-        calls = [call('MONGO_DB_ADDR', 1234)]
+        calls = [call('MONGO_DB_ADDR', 1234, serverSelectionTimeoutMS=2000)]
         patched_mongo_client.assert_has_calls(calls)
 
-    @patch(f'{HANDLER_PATH}.MongoClient')
+    @patch('pymongo.MongoClient')
     def test_init_with_path(self, patched_mongo_client):
         db_path = 'test://path'
-        MongoDBHandler(db_path=db_path, db_name='test')
+        client = MongoDBHandler(db_path=db_path, db_name='test', server_selection_timeout_ms=500)
+        patched_mongo_client.assert_not_called()
+        client.client
 
-        calls = [call(db_path)]
+        calls = [call(db_path, serverSelectionTimeoutMS=500)]
         patched_mongo_client.assert_has_calls(calls)
+        patched_mongo_client.assert_called_once()
+
+    @patch('pymongo.MongoClient')
+    def test_existence_is_checked_once(self, patched_mongo_client):
+        fake_db = MagicMock()
+        fake_db.list_collection_names.return_value = ('currencies',)
+        patched_mongo_client.return_value.list_database_names.return_value = ('test',)
+        patched_mongo_client.return_value.__getitem__.return_value = fake_db
+
+        client = MongoDBHandler(db_path='test://path', db_name='test')
+        client._get_collection_or_create_new('currencies')
+        client._get_collection_or_create_new('currencies')
+
+        patched_mongo_client.return_value.list_database_names.assert_called_once()
+        fake_db.list_collection_names.assert_called_once()
 
     @patch(f'{HANDLER_PATH}.os')
-    @patch(f'{HANDLER_PATH}.MongoClient')
+    @patch('pymongo.MongoClient')
     def test_insert_record_by_creating_existing_db(self, patched_mongo_client, patched_os):
         patched_os.environ.get.side_effect = self.os_env_patched_value
 
         patched_mongo_client.insert_record = MongoDBHandler.insert_record
         patched_mongo_client.client.list_database_names = ('test',)
 
-        fake_payload = {}
+        fake_payload = {'resource_name': 'fake_resource_name', 'provider_ts': 1, 'currencies': {'USD': (1, 2)}}
         client = MongoDBHandler(db_name='test')
         result = client.insert_record(fake_payload)
         self.assertTrue(result)
 
     @patch(f'{HANDLER_PATH}.os')
-    @patch(f'{HANDLER_PATH}.MongoClient')
+    @patch('pymongo.MongoClient')
     def test_insert_record_by_creating_new_db(self, patched_mongo_client, patched_os):
         patched_os.environ.get.side_effect = self.os_env_patched_value
 
         patched_mongo_client.insert_record = MongoDBHandler.insert_record
         patched_mongo_client.client.list_database_names = ()
 
-        fake_payload = {}
+        fake_payload = {'resource_name': 'fake_resource_name', 'provider_ts': 1, 'currencies': {'USD': (1, 2)}}
         client = MongoDBHandler(db_name='test')
         result = client.insert_record(fake_payload)
         self.assertTrue(result)
 
     @patch(f'{HANDLER_PATH}.os')
-    @patch(f'{HANDLER_PATH}.MongoClient')
+    @patch('pymongo.MongoClient')
     @patch(f'{HANDLER_PATH}.MongoDBHandler._get_database_or_create_new')
     def test_insert_record_by_creating_new_collection(
             self, patched_get_database_or_create_new, patched_mongo_client, patched_os
@@ -65,21 +87,21 @@ class TestMongoDBHandler(unittest.TestCase):
         patched_os.environ.get.side_effect = self.os_env_patched_value
 
         fake_result = Mock()
-        fake_result.inserted_id = True
+        fake_result.upserted_id = True
         fake_db = MagicMock()
         fake_db.list_collection_names.return_value = ()
-        fake_db.insert_one.return_value = fake_result
+        fake_db.update_one.return_value = fake_result
 
         patched_get_database_or_create_new.return_value = fake_db
         patched_mongo_client.insert_record = MongoDBHandler.insert_record
 
-        fake_payload = {}
+        fake_payload = {'resource_name': 'fake_resource_name', 'provider_ts': 1, 'currencies': {'USD': (1, 2)}}
         client = MongoDBHandler(db_name='test')
         result = client.insert_record(fake_payload)
         self.assertTrue(result)
 
     @patch(f'{HANDLER_PATH}.os')
-    @patch(f'{HANDLER_PATH}.MongoClient')
+    @patch('pymongo.MongoClient')
     @patch(f'{HANDLER_PATH}.MongoDBHandler._get_database_or_create_new')
     def test_insert_record_by_creating_use_existing_collection(
             self, patched_get_database_or_create_new, patched_mongo_client, patched_os
@@ -87,59 +109,349 @@ class TestMongoDBHandler(unittest.TestCase):
         patched_os.environ.get.side_effect = self.os_env_patched_value
 
         fake_result = Mock()
-        fake_result.inserted_id = True
+        fake_result.upserted_id = True
         fake_db = MagicMock()
         fake_db.list_collection_names.return_value = ('currencies', )
-        fake_db.insert_one.return_value = fake_result
+        fake_db.update_one.return_value = fake_result
 
         patched_get_database_or_create_new.return_value = fake_db
         patched_mongo_client.insert_record = MongoDBHandler.insert_record
 
-        fake_payload = {}
+        fake_payload = {'resource_name': 'fake_resource_name', 'provider_ts': 1, 'currencies': {'USD': (1, 2)}}
         client = MongoDBHandler(db_name='test')
         result = client.insert_record(fake_payload)
         self.assertTrue(result)
 
     @patch(f'{HANDLER_PATH}.os')
-    @patch(f'{HANDLER_PATH}.MongoClient')
+    @patch('pymongo.MongoClient')
     @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
     def test_insert_record_returns_false(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
         patched_os.environ.get.side_effect = self.os_env_patched_value
 
         fake_result = Mock()
-        fake_result.inserted_id = None
+        fake_result.upserted_id = None
+        fake_result.matched_count = 0
         fake_collection = Mock()
-        fake_collection.insert_one.return_value = fake_result
+        fake_collection.update_one.return_value = fake_result
 
         patched_get_collection_or_create_new.return_value = fake_collection
         patched_mongo_client.insert_record = MongoDBHandler.insert_record
 
-        fake_payload = {}
+        fake_payload = {'resource_name': 'fake_resource_name', 'provider_ts': 1, 'currencies': {'USD': (1, 2)}}
         client = MongoDBHandler(db_name='test')
         result = client.insert_record(fake_payload)
 
         self.assertFalse(result)
 
     @patch(f'{HANDLER_PATH}.os')
-    @patch(f'{HANDLER_PATH}.MongoClient')
+    @patch('pymongo.MongoClient')
     @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
     def test_insert_record_returns_true(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
         patched_os.environ.get.side_effect = self.os_env_patched_value
 
         fake_result = Mock()
-        fake_result.inserted_id = True
+        fake_result.upserted_id = True
         fake_collection = Mock()
-        fake_collection.insert_one.return_value = fake_result
+        fake_collection.update_one.return_value = fake_result
 
         patched_get_collection_or_create_new.return_value = fake_collection
         patched_mongo_client.insert_record = MongoDBHandler.insert_record
 
-        fake_payload = {}
+        fake_payload = {'resource_name': 'fake_resource_name', 'provider_ts': 1, 'currencies': {'USD': (1, 2)}}
         client = MongoDBHandler(db_name='test')
         result = client.insert_record(fake_payload)
 
         self.assertTrue(result)
 
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_insert_record_db_is_not_reachable(
+            self, patched_get_collection_or_create_new, patched_mongo_client, patched_os
+    ):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_collection = Mock()
+        fake_collection.update_one.side_effect = ServerSelectionTimeoutError
+
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+        with self.assertRaises(DataBaseIsNotReachable):
+            client.insert_record({'resource_name': 'fake_resource_name', 'provider_ts': 1})
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_upsert_records(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_result = Mock()
+        fake_result.upserted_count = 1
+        fake_result.matched_count = 1
+        fake_result.upserted_ids = {1: 'fake_id'}
+        fake_collection = Mock()
+        fake_collection.bulk_write.return_value = fake_result
+
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+        fake_payloads = [
+            {'resource_name': 'A', 'provider_ts': 1, 'currencies': {}},
+            {'resource_name': 'A', 'provider_ts': 2, 'currencies': {'USD': (1, 2)}},
+        ]
+        result = client.upsert_records(fake_payloads)
+
+        # already existing records are not counted
+        self.assertEqual(result, 1)
+        self.assertEqual(len(fake_collection.bulk_write.call_args_list[0][0][0]), 2)
+        # rollups are updated only by new record
+        self.assertEqual(len(fake_collection.bulk_write.call_args_list[1][0][0]), 1)
+        self.assertEqual(client.upsert_records([]), 0)
+        # replayed records are returned only if they were inserted
+        self.assertEqual(client.replay_records(fake_payloads), [fake_payloads[1]])
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_insert_record_already_exists(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_result = Mock()
+        fake_result.upserted_id = None
+        fake_result.matched_count = 1
+        fake_collection = Mock()
+        fake_collection.update_one.return_value = fake_result
+
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+        fake_payload = {'resource_name': 'fake_resource_name', 'provider_ts': 1, 'currencies': {'USD': (1, 2)}}
+        self.assertTrue(client.insert_record(fake_payload))
+        self.assertTrue(client.insert_record(fake_payload))
+
+        fake_collection.update_one.assert_called_with(
+            {'resource_name': 'fake_resource_name', 'provider_ts': 1}, {'$setOnInsert': fake_payload}, upsert=True
+        )
+        # unique index is created only once
+        fake_collection.create_index.assert_called_once()
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_acquire_lease(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_collection = Mock()
+        fake_collection.update_one.side_effect = [Mock(), DuplicateKeyError('duplicate')]
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+
+        self.assertTrue(client.acquire_lease('resource', 'worker1', 60))
+        self.assertFalse(client.acquire_lease('resource', 'worker2', 60))
+        fake_collection.create_index.assert_called_once_with('expires_at', name='expires_at_ttl', expireAfterSeconds=0)
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_renew_and_release_leases(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+        fake_collection = Mock()
+        fake_collection.update_many.return_value.matched_count = 2
+        fake_collection.delete_many.return_value.deleted_count = 1
+        fake_collection.count_documents.return_value = 3
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+
+        self.assertEqual(client.register_worker('worker1', 60), 3)
+        self.assertEqual(client.renew_leases(('A', 'B'), 'worker1', 60), 2)
+        self.assertEqual(client.release_leases(('A', 'B'), 'worker1'), 1)
+        leases_filter = {'_id': {'$in': ['A', 'B']}, 'worker_id': 'worker1'}
+        fake_collection.delete_many.assert_called_once_with(leases_filter)
+        self.assertEqual(fake_collection.update_many.call_args[0][0], leases_filter)
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_insert_and_get_consensus(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_result = Mock()
+        fake_result.inserted_id = True
+        fake_collection = Mock()
+        fake_collection.insert_one.return_value = fake_result
+        fake_collection.find_one.return_value = {'currencies': {}}
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+
+        self.assertTrue(client.insert_consensus({'currencies': {}}))
+        self.assertEqual(client.get_latest_consensus(), {'currencies': {}})
+        fake_collection.create_index.assert_called_once()
+        patched_get_collection_or_create_new.assert_called_with('consensus_rates')
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_currency_statistics(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_result = Mock()
+        fake_result.upserted_count = 1
+        fake_result.matched_count = 0
+        fake_collection = Mock()
+        fake_collection.bulk_write.return_value = fake_result
+        fake_collection.find_one.return_value = {'_id': 'A:USD'}
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+
+        self.assertEqual(client.get_currency_statistics('A', 'USD'), {'_id': 'A:USD'})
+        fake_collection.find_one.assert_called_once_with({'_id': 'A:USD'})
+        self.assertEqual(client.upsert_currency_statistics([{'_id': 'A:USD'}]), 1)
+
+    def test_prepare_rollup_updates(self):
+        fake_payloads = [
+            {'resource_name': 'A', 'provider_ts': 7300, 'currencies': {'USD': (27, 28), 'EUR': (None, None)}},
+        ]
+        result = MongoDBHandler._prepare_rollup_updates(fake_payloads, 3600)
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]._filter, {'_id': 'A:USD:7200'})
+        self.assertEqual(result[0]._doc['$inc'], {'count': 1})
+        self.assertEqual(result[0]._doc['$max'], {'high': 27.5})
+        self.assertEqual(result[0]._doc['$setOnInsert']['open'], 27.5)
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_rebuild_rollups(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_collection = Mock()
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+        client.rebuild_rollups()
+
+        fake_collection.drop.assert_not_called()
+        self.assertEqual(fake_collection.aggregate.call_count, 2)
+        pipeline = fake_collection.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[-1], {'$out': 'currencies_daily_rebuilt'})
+        # rates without sale or purchase are skipped as on write
+        self.assertIn({'$match': {'currencies.v.0': {'$ne': None}, 'currencies.v.1': {'$ne': None}}}, pipeline)
+        fake_collection.rename.assert_called_with('currencies_daily', dropTarget=True)
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_insert_record_rollups_failed(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_collection = Mock()
+        fake_collection.update_one.return_value.upserted_id = 'fake_id'
+        fake_collection.bulk_write.side_effect = [
+            ServerSelectionTimeoutError('timeout'), ServerSelectionTimeoutError('timeout'), Mock(), Mock(),
+        ]
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+        fake_payload = {'resource_name': 'A', 'provider_ts': 1, 'currencies': {'USD': (1, 2)}}
+
+        # stored record is not failed because of rollups
+        self.assertTrue(client.insert_record(fake_payload))
+        self.assertTrue(client.flush_rollups())
+        self.assertEqual(fake_collection.bulk_write.call_count, 4)
+        # failed updates are retried
+        self.assertEqual(len(fake_collection.bulk_write.call_args[0][0]), 1)
+        self.assertTrue(client.flush_rollups())
+        self.assertEqual(fake_collection.bulk_write.call_count, 4)
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_get_rates_snapshot(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_collection = Mock()
+        fake_collection.find_one.return_value = {'resource_name': 'PrivatBank', 'currencies': {}}
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+        result = client.get_rates_snapshot('PrivatBank', 100)
+
+        self.assertEqual(result, {'resource_name': 'PrivatBank', 'currencies': {}})
+        self.assertEqual(fake_collection.find_one.call_args[0][0], {
+            'resource_name': 'PrivatBank', 'provider_ts': {'$exists': True, '$lte': 100},
+        })
+        self.assertEqual(fake_collection.find_one.call_args[1]['sort'], [('provider_ts', -1)])
+
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_get_history_index(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_collection = Mock()
+        fake_collection.find.return_value = iter([
+            {'resource_name': 'CurrencyAPI', 'provider_ts': 3},
+            {'resource_name': 'PrivatBank', 'provider_ts': 1},
+            {'resource_name': 'PrivatBank', 'provider_ts': 2},
+        ])
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+        result = client.get_history_index(since_ts=1)
+
+        self.assertEqual(result, {'PrivatBank': [1, 2], 'CurrencyAPI': [3]})
+        self.assertEqual(fake_collection.find.call_args[0][0], {'provider_ts': {'$exists': True, '$gte': 1}})
+        # query is covered by unique index
+        self.assertEqual(fake_collection.find.call_args[1]['hint'], 'resource_name_provider_ts')
+        fake_collection.aggregate.assert_not_called()
+
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_insert_quarantine(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_collection = Mock()
+        fake_collection.insert_one.return_value.inserted_id = 'id'
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+
+        self.assertTrue(client.insert_quarantine({'resource_name': 'PrivatBank'}))
+        patched_get_collection_or_create_new.assert_called_with('quarantine')
+
+
+    @patch(f'{HANDLER_PATH}.os')
+    @patch('pymongo.MongoClient')
+    @patch(f'{HANDLER_PATH}.MongoDBHandler._get_collection_or_create_new')
+    def test_upsert_profile_records(self, patched_get_collection_or_create_new, patched_mongo_client, patched_os):
+        patched_os.environ.get.side_effect = self.os_env_patched_value
+
+        fake_collection = Mock()
+        fake_collection.bulk_write.return_value.upserted_count = 2
+        fake_collection.bulk_write.return_value.matched_count = 0
+        patched_get_collection_or_create_new.return_value = fake_collection
+
+        client = MongoDBHandler(db_name='test')
+        result = client.upsert_profile_records([
+            {'profile': 'profile1', 'resource_name': 'PrivatBank', 'provider_ts': 1, 'currencies': {}},
+            {'profile': 'profile2', 'resource_name': 'PrivatBank', 'provider_ts': 1, 'currencies': {}},
+        ])
+
+        self.assertEqual(result, 2)
+        patched_get_collection_or_create_new.assert_called_with('profile_currencies')
+        requests = fake_collection.bulk_write.call_args[0][0]
+        self.assertEqual(requests[1]._filter, {'profile': 'profile2', 'resource_name': 'PrivatBank', 'provider_ts': 1})
+        self.assertEqual(client.upsert_profile_records([]), 0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 from app.utils.handlers.notification_handler import NotificationHandler
 
@@ -32,6 +32,55 @@ class TestNotificationHandler(unittest.TestCase):
         patched_platform.system.return_value = 'Windows'
         self.assertRaises(NotImplementedError)
 
+    @patch('app.utils.handlers.notification_handler.platform')
+    def test_send_push_notification_not_supported_platform(self, patched_platform):
+        patched_platform.system.return_value = 'Windows'
+        notification_handler = NotificationHandler('title', 'subtitle', 'description')
+        with self.assertRaises(NotImplementedError):
+            notification_handler.send_push_notification()
+
+    @patch('app.utils.handlers.notification_handler.subprocess')
+    @patch('app.utils.handlers.notification_handler.platform')
+    def test_send_push_notification_mac_os_no_shell(self, patched_platform, patched_subprocess):
+        patched_platform.system.return_value = 'Darwin'
+        notification_handler = NotificationHandler('title', 'subtitle', 'USD: "quoted"', coalesce_sec=0)
+
+        notification_handler.send_push_notification(group_id=2)
+        notification_handler.close()
+
+        command = patched_subprocess.run.call_args[0][0]
+        self.assertEqual(command[0], 'terminal-notifier')
+        self.assertIn('USD: "quoted"', command)
+        self.assertIn('2', command)
+
+    @patch('app.utils.handlers.notification_handler.subprocess')
+    @patch('app.utils.handlers.notification_handler.platform')
+    def test_send_push_notification_linux(self, patched_platform, patched_subprocess):
+        patched_platform.system.return_value = 'Linux'
+        notification_handler = NotificationHandler('title', 'subtitle', 'description', coalesce_sec=0)
+
+        notification_handler.send_push_notification()
+        notification_handler.close()
+
+        command = patched_subprocess.run.call_args[0][0]
+        self.assertEqual(command[0], 'notify-send')
+        self.assertIn('title: subtitle', command)
+
+    @patch('requests.post')
+    def test_send_push_notification_burst_is_coalesced(self, patched_post):
+        notification_handler = NotificationHandler('title', webhook_url='http://localhost/hook', coalesce_sec=10)
+        for index in range(3):
+            notification_handler.subtitle = f'Source: {index}'
+            notification_handler.description = f'description {index}'
+            notification_handler.send_push_notification(group_id=index)
+        notification_handler.close()
+
+        patched_post.assert_called_once()
+        digest = patched_post.call_args[1]['json']
+        self.assertEqual(digest['subtitle'], '3 updates')
+        self.assertEqual(digest['group_id'], 2)
+        self.assertIn('Source: 1\ndescription 1', digest['description'])
+
 
 if __name__ == '__main__':
     unittest.main()
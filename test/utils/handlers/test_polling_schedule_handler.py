@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from app.utils.handlers.polling_schedule_handler import PollingScheduleHandler
+
+
+class TestPollingScheduleHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.temp_dir.name, 'polling_schedule.json')
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _create_handler(self) -> PollingScheduleHandler:
+        return PollingScheduleHandler(
+            state_path=self.state_path, min_interval_sec=100, max_interval_sec=1000, backoff_factor=2,
+            publish_grace_sec=10,
+        )
+
+    def test_backoff_while_rates_do_not_change(self):
+        schedule_handler = self._create_handler()
+
+        next_polls = [
+            schedule_handler.observe('resource1', {'USD': (27.5, 27.1)}, None, now=now)
+            for now in (0, 100, 300, 700, 1500, 2500)
+        ]
+
+        self.assertEqual(next_polls, [100, 200, 500, 1100, 2300, 3500])
+        self.assertEqual(schedule_handler.observe('resource1', {'USD': (27.6, 27.1)}, None, now=3500), 3600)
+
+    def test_failed_poll_is_backed_off(self):
+        schedule_handler = self._create_handler()
+
+        self.assertEqual(schedule_handler.observe('resource1', {}, None, now=0), 100)
+        self.assertEqual(schedule_handler.observe('resource1', {}, None, now=100), 300)
+
+    def test_poll_after_expected_publish_time(self):
+        schedule_handler = self._create_handler()
+        schedule_handler.observe('resource1', {'USD': (27.5, 27.1)}, 0, now=5)
+        schedule_handler.observe('resource1', {'USD': (27.6, 27.1)}, 3600, now=3605)
+
+        # the next update is expected at 7200, it is later than "max_interval_sec"
+        self.assertEqual(schedule_handler.schedule['resource1']['cadence_sec'], 3600)
+        self.assertEqual(schedule_handler.schedule['resource1']['next_poll_ts'], 3605 + 1000)
+        self.assertEqual(schedule_handler.get_due_resources(['resource1', 'resource2'], now=4000), ['resource2'])
+
+        schedule_handler.max_interval_sec = 10000
+        self.assertEqual(schedule_handler.observe('resource1', {'USD': (27.6, 27.1)}, 3600, now=4000), 7210)
+        # rates were not published in time - polling is tightened to "min_interval_sec"
+        self.assertEqual(schedule_handler.observe('resource1', {'USD': (27.6, 27.1)}, 3600, now=7210), 7310)
+
+    def test_schedule_is_saved(self):
+        schedule_handler = self._create_handler()
+        schedule_handler.observe('resource1', {'USD': (27.5, 27.1)}, 0, now=0)
+        schedule_handler.save()
+
+        loaded_schedule_handler = self._create_handler()
+
+        self.assertEqual(loaded_schedule_handler.schedule, schedule_handler.schedule)
+        self.assertEqual(loaded_schedule_handler.get_due_resources(['resource1'], now=50), [])
+        self.assertEqual(loaded_schedule_handler.get_sleep_time(now=50), 100)
+        self.assertEqual(loaded_schedule_handler.get_sleep_time(now=90), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
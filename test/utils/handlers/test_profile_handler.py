@@ -0,0 +1,39 @@
+import unittest
+
+from app.utils.rate_records import RateTable
+from app.utils.handlers.profile_handler import ProfileHandler
+
+
+class TestProfileHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.profile_handler = ProfileHandler({
+            'retail': {'main_currencies': 'USD EUR'},
+            'treasury': {'main_currencies': 'EUR UAH GBP', 'base_currency': 'USD'},
+        })
+        self.currencies = RateTable({'USD': (40.0, 39.0), 'EUR': (44.0, 43.0), 'PLN': (10.0, 9.5)})
+
+    def test_get_view(self):
+        self.assertEqual(self.profile_handler.get_view('retail', self.currencies), {
+            'USD': (40.0, 39.0), 'EUR': (44.0, 43.0),
+        })
+        self.assertEqual(self.profile_handler.get_view('treasury', self.currencies), {
+            'EUR': (44.0 / 39.0, 43.0 / 40.0), 'UAH': (1.0 / 39.0, 1.0 / 40.0),
+        })
+
+    def test_get_view_without_base_currency(self):
+        self.assertIsNone(self.profile_handler.get_view('treasury', {'EUR': (44.0, 43.0)}))
+
+    def test_derive(self):
+        payloads = self.profile_handler.derive('PrivatBank', self.currencies, 1)
+
+        self.assertEqual([payload['profile'] for payload in payloads], ['retail', 'treasury'])
+        self.assertEqual(payloads[1]['base_currency'], 'USD')
+        self.assertEqual(payloads[1]['resource_name'], 'PrivatBank')
+        self.assertEqual(payloads[1]['provider_ts'], 1)
+
+        payloads = self.profile_handler.derive('PrivatBank', {'EUR': (44.0, 43.0)}, 2)
+        self.assertEqual([payload['profile'] for payload in payloads], ['retail'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import time
+import signal
+import tempfile
+import unittest
+import tracemalloc
+
+from app.utils.handlers.profiling_handler import ProfilingHandler
+
+
+def busy_function(duration_sec: float) -> list:
+    allocations = []
+    deadline = time.monotonic() + duration_sec
+    while time.monotonic() < deadline:
+        allocations.append(str(len(allocations)) * 10)
+    return allocations
+
+
+class TestProfilingHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def test_disabled(self):
+        profiling_handler = ProfilingHandler(path=self.temp_dir.name)
+        with profiling_handler.profile_cycle():
+            busy_function(0.05)
+
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_profile_cycles(self):
+        profiling_handler = ProfilingHandler(path=self.temp_dir.name, interval_sec=0.001, enabled=True)
+        with profiling_handler.profile_cycle():
+            busy_function(0.1)
+        cpu_profile_path, memory_profile_path = profiling_handler.stop_cycle()
+        self.assertIsNone(cpu_profile_path)
+
+        profiling_handler.start_cycle()
+        kept_allocations = busy_function(0.1)
+        cpu_profile_path, memory_profile_path = profiling_handler.stop_cycle()
+
+        with open(cpu_profile_path, encoding='utf-8') as cpu_profile_file:
+            stacks = cpu_profile_file.read().splitlines()
+        self.assertTrue(stacks)
+        stack, samples_count = stacks[0].rsplit(' ', 1)
+        self.assertTrue(stack.startswith('MainThread;'))
+        self.assertGreater(int(samples_count), 0)
+        self.assertTrue(any('busy_function (test_profiling_handler.py' in stack for stack in stacks))
+
+        with open(memory_profile_path, encoding='utf-8') as memory_profile_file:
+            memory_profile = memory_profile_file.read()
+        self.assertIn('growth since the previous profiled cycle', memory_profile)
+        self.assertIn('test_profiling_handler.py', memory_profile)
+        self.assertEqual(len(os.listdir(self.temp_dir.name)), 4)
+        del kept_allocations
+
+    def test_toggle_by_signal(self):
+        profiling_handler = ProfilingHandler(path=self.temp_dir.name)
+        previous_handler = signal.getsignal(signal.SIGUSR1)
+        try:
+            profiling_handler.install_signal_handler(signal.SIGUSR1)
+            os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertTrue(profiling_handler.enabled)
+            os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertFalse(profiling_handler.enabled)
+        finally:
+            signal.signal(signal.SIGUSR1, previous_handler)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from app.utils.handlers.config_handler import ConfigHandler
+from app.utils.handlers.raw_archive_handler import RawArchiveHandler
+from app.utils.handlers.currency_extraction_handlers import CurrencyExtractionHandler
+
+
+class TestRawArchiveHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.raw_archive_handler = RawArchiveHandler(self.temp_dir, ttl_sec=60)
+        self.response_data = {
+            'date': '02.01.1970',
+            'exchangeRate': [
+                {'currency': 'UAH'},
+                {'currency': 'USD', 'saleRateNB': 27.5, 'purchaseRateNB': 27.5},
+            ]
+        }
+        # config is passed to worker process, so it can not be mocked
+        config_path = os.path.join(self.temp_dir, 'config.yml')
+        with open(config_path, 'w') as config_file:
+            config_file.write('main_currencies: USD')
+        self.config_helper = ConfigHandler(config_path)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+    def test_save_and_load(self):
+        content = json.dumps(self.response_data).encode()
+        first_path = self.raw_archive_handler.save('PrivatBank', content)
+        second_path = self.raw_archive_handler.save('PrivatBank', content)
+
+        self.assertEqual(self.raw_archive_handler.load(second_path), content)
+        # responses are compressed by the dictionary created from the first one
+        self.assertLess(os.path.getsize(second_path), len(content) // 2)
+        self.assertEqual(self.raw_archive_handler.list_archives('PrivatBank'), [first_path, second_path])
+
+        # dictionary is read from disk by the new handler
+        self.assertEqual(RawArchiveHandler(self.temp_dir).load(first_path), content)
+
+    def test_load_not_archive(self):
+        not_archive_path = os.path.join(self.temp_dir, 'fake.raw')
+        with open(not_archive_path, 'wb') as not_archive_file:
+            not_archive_file.write(b'fake content')
+
+        with self.assertRaises(ValueError):
+            self.raw_archive_handler.load(not_archive_path)
+
+    def test_evict(self):
+        archive_path = self.raw_archive_handler.save('PrivatBank', b'{}')
+        self.raw_archive_handler.save('PrivatBank', b'{}')
+        os.utime(archive_path, (0, 0))
+
+        self.assertEqual(self.raw_archive_handler.evict(), 1)
+        self.assertEqual(len(self.raw_archive_handler.list_archives('PrivatBank')), 1)
+
+    def test_reprocess(self):
+        self.raw_archive_handler.save('PrivatBank', json.dumps(self.response_data).encode())
+
+        result = self.raw_archive_handler.reprocess(
+            'PrivatBank', CurrencyExtractionHandler.handle_privat_bank, self.config_helper, workers=1
+        )
+
+        self.assertEqual(result, [({'USD': (27.5, 27.5)}, 86400)])
+        self.assertEqual(self.raw_archive_handler.reprocess('CurrencyAPI', Mock(), self.config_helper), [])
+
+    def test_reprocess_failed_archive(self):
+        archive_path = self.raw_archive_handler.save('PrivatBank', b'{"exchangeRate": []}')
+        with open(archive_path[:-len('.raw')] + '1.raw', 'wb') as broken_archive_file:
+            broken_archive_file.write(b'broken')
+
+        result = self.raw_archive_handler.reprocess(
+            'PrivatBank', CurrencyExtractionHandler.handle_privat_bank, self.config_helper, workers=1
+        )
+
+        # rates update time is not reported, so time of archived response is used
+        self.assertEqual(result, [({}, int(self.raw_archive_handler.get_archive_ts(archive_path)))])
+
+    @patch('app.utils.handlers.raw_archive_handler.MIN_ARCHIVES_PER_WORKER', 2)
+    def test_reprocess_in_pool(self):
+        archive_paths = [
+            self.raw_archive_handler.save('PrivatBank', json.dumps(self.response_data).encode()) for _ in range(4)
+        ]
+        with open(archive_paths[-1][:-len('.raw')] + '1.raw', 'wb') as broken_archive_file:
+            broken_archive_file.write(b'broken')
+
+        result = self.raw_archive_handler.reprocess(
+            'PrivatBank', CurrencyExtractionHandler.handle_privat_bank, self.config_helper, workers=2
+        )
+
+        # results of chunks are collected in order of archives, broken archive is skipped
+        self.assertEqual(result, [({'USD': (27.5, 27.5)}, 86400)] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
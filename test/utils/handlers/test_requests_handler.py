@@ -1,5 +1,10 @@
+import os
+import json
+import shutil
+import tempfile
 import unittest
 from unittest.mock import patch
+from collections import OrderedDict
 
 import requests
 
@@ -56,6 +61,92 @@ class TestRequestHandler(unittest.TestCase):
         self.assertIsInstance(result, requests.Response)
         self.assertEqual(result.status_code, 500)
 
+    @patch('requests.get')
+    def test_get_with_retry_response_is_recorded(self, patched_get_request):
+        fake_response = requests.Response()
+        fake_response.status_code = 200
+        fake_response.url = 'http://fake.host/p24api/exchange_rates?json'
+        fake_response._content = b'{"k": "v"}'
+        patched_get_request.return_value = fake_response
+        temp_dir = tempfile.mkdtemp()
+
+        with patch.object(requests_handler, 'RECORD_PATH', temp_dir):
+            requests_handler.get_with_retry('fake_url')
+
+        record_dir = os.path.join(temp_dir, 'p24api__exchange_rates')
+        with open(os.path.join(record_dir, os.listdir(record_dir)[0])) as record_file:
+            record = json.load(record_file)
+        shutil.rmtree(temp_dir)
+        self.assertEqual(record['status_code'], 200)
+        self.assertEqual(record['body'], '{"k": "v"}')
+
+    @patch('requests.get')
+    def test_get_with_retry_not_modified(self, patched_get_request):
+        fake_response = requests.Response()
+        fake_response.status_code = 200
+        fake_response.headers['ETag'] = '"v1"'
+        fake_response._content = b'{"k": "v"}'
+        not_modified_response = requests.Response()
+        not_modified_response.status_code = 304
+        patched_get_request.side_effect = [fake_response, not_modified_response]
+
+        with patch.object(requests_handler, 'VALIDATORS', OrderedDict()):
+            requests_handler.get_with_retry('fake_url', {'date': '01.01.2024'})
+            result = requests_handler.get_with_retry('fake_url', {'date': '01.01.2024'})
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.json(), {'k': 'v'})
+        self.assertEqual(patched_get_request.call_count, 2)
+        self.assertNotIn('headers', patched_get_request.call_args_list[0].kwargs)
+        self.assertEqual(patched_get_request.call_args_list[1].kwargs['headers'], {'If-None-Match': '"v1"'})
+
+    @patch('requests.get')
+    def test_get_with_retry_not_conditional(self, patched_get_request):
+        fake_response = requests.Response()
+        fake_response.status_code = 200
+        fake_response.headers['ETag'] = '"v1"'
+        patched_get_request.return_value = fake_response
+
+        with patch.object(requests_handler, 'VALIDATORS', OrderedDict()):
+            requests_handler.get_with_retry('fake_url', {'date': '01.01.2024'}, conditional=False)
+            self.assertEqual(requests_handler.VALIDATORS, {})
+        self.assertNotIn('conditional', patched_get_request.call_args.kwargs)
+
+    def test_set_validator(self):
+        with patch.object(requests_handler, 'VALIDATORS', OrderedDict()), \
+                patch.object(requests_handler, 'VALIDATORS_MAX_SIZE', 2):
+            requests_handler.set_validator('url1', {})
+            requests_handler.set_validator('url2', {})
+            requests_handler.VALIDATORS.move_to_end('url1')
+            requests_handler.set_validator('url3', {})
+
+            # the least recently used validator is evicted
+            self.assertEqual(list(requests_handler.VALIDATORS), ['url1', 'url3'])
+
+    @patch('time.sleep')
+    @patch('requests.get')
+    def test_get_with_retry_resend_count_is_traced(self, patched_get_request, _):
+        failed_response = requests.Response()
+        failed_response.status_code = 500
+        fake_response = requests.Response()
+        fake_response.status_code = 200
+        patched_get_request.side_effect = [failed_response, fake_response]
+
+        with patch.object(requests_handler.tracing_handler, 'span') as patched_span:
+            result = requests_handler.get_with_retry('fake_url')
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(
+            [span_call.kwargs['http.request.resend_count'] for span_call in patched_span.call_args_list], [0, 1],
+        )
+
+    def test_get_request_key(self):
+        self.assertEqual(requests_handler.get_request_key('fake_url'), 'fake_url')
+        self.assertEqual(
+            requests_handler.get_request_key('fake_url', {'json': '', 'date': '01.01.2024'}),
+            'fake_url?date=01.01.2024&json=',
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
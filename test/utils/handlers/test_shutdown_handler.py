@@ -0,0 +1,30 @@
+import os
+import signal
+import unittest
+
+from app.utils.handlers.shutdown_handler import ShutdownHandler
+
+
+class TestShutdownHandler(unittest.TestCase):
+    def test_request_by_signal(self):
+        shutdown_handler = ShutdownHandler()
+        previous_handler = signal.getsignal(signal.SIGUSR2)
+        try:
+            shutdown_handler.install_signal_handlers((signal.SIGUSR2,))
+            self.assertFalse(shutdown_handler.wait(0))
+            os.kill(os.getpid(), signal.SIGUSR2)
+            self.assertTrue(shutdown_handler.wait(1))
+        finally:
+            signal.signal(signal.SIGUSR2, previous_handler)
+
+    def test_second_request_interrupts_run(self):
+        shutdown_handler = ShutdownHandler()
+        shutdown_handler.request(signal.SIGTERM)
+
+        with self.assertRaises(KeyboardInterrupt):
+            shutdown_handler.request(signal.SIGTERM)
+        self.assertTrue(shutdown_handler.is_requested.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
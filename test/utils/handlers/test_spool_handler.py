@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from app.utils.handlers.spool_handler import SpoolHandler
+from app.utils.handlers.statistics_handler import StatisticsHandler
+from app.utils.custom_exceptions import DataBaseIsNotReachable
+
+
+class TestSpoolHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.spool_path = os.path.join(self.temp_dir, 'spool.jsonl')
+        self.spool_handler = SpoolHandler(self.spool_path, fsync_batch_size=2)
+
+    def tearDown(self) -> None:
+        self.spool_handler.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_append(self):
+        self.spool_handler.append({'resource_name': 'A', 'currencies': {'USD': (1, 2)}})
+        self.spool_handler.flush()
+
+        with open(self.spool_path) as spool_file:
+            lines = spool_file.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn('"resource_name": "A"', lines[0])
+
+    def test_drain_empty_spool(self):
+        fake_db_client = Mock()
+        result = self.spool_handler.drain(fake_db_client)
+
+        self.assertEqual(result, 0)
+        fake_db_client.replay_records.assert_not_called()
+
+    def test_drain(self):
+        for resource_name in ('A', 'B', 'C'):
+            self.spool_handler.append({'resource_name': resource_name, 'provider_ts': 1})
+        fake_db_client = Mock()
+
+        result = self.spool_handler.drain(fake_db_client, batch_size=2)
+
+        self.assertEqual(result, 3)
+        self.assertEqual(fake_db_client.replay_records.call_count, 2)
+        replayed = fake_db_client.replay_records.call_args_list[0][0][0]
+        self.assertEqual([payload['resource_name'] for payload in replayed], ['A', 'B'])
+        self.assertFalse(os.path.exists(self.spool_path))
+        self.assertFalse(os.path.exists(f'{self.spool_path}.draining'))
+
+    def test_drain_profile_records(self):
+        self.spool_handler.append({'resource_name': 'A', 'provider_ts': 1, 'profile': 'profile1'})
+        self.spool_handler.append({'resource_name': 'A', 'provider_ts': 1})
+        fake_db_client = Mock()
+        fake_db_client.replay_records.side_effect = lambda payloads: payloads
+        fake_statistics_handler = Mock()
+
+        result = self.spool_handler.drain(fake_db_client, statistics_handler=fake_statistics_handler)
+
+        self.assertEqual(result, 2)
+        fake_db_client.replay_records.assert_called_once_with([{'resource_name': 'A', 'provider_ts': 1}])
+        fake_db_client.upsert_profile_records.assert_called_once_with(
+            [{'resource_name': 'A', 'provider_ts': 1, 'profile': 'profile1'}]
+        )
+        # statistics are updated by main records only
+        fake_statistics_handler.update_replayed.assert_called_once_with(
+            fake_db_client, [{'resource_name': 'A', 'provider_ts': 1}]
+        )
+
+    def test_drain_duplicates_statistics(self):
+        # the same poll is spooled several times during DB outage
+        for provider_ts, rate in ((1, 10), (1, 10), (2, 20), (1, 10)):
+            payload = {'resource_name': 'A', 'provider_ts': provider_ts, 'currencies': {'USD': [rate, rate]}}
+            self.spool_handler.append(payload)
+        stored_keys = set()
+
+        def replay_records(payloads):
+            # records are unique by (resource_name, provider_ts) in DB
+            inserted_payloads = []
+            for payload in payloads:
+                key = (payload['resource_name'], payload['provider_ts'])
+                if key not in stored_keys:
+                    stored_keys.add(key)
+                    inserted_payloads.append(payload)
+            return inserted_payloads
+
+        fake_db_client = Mock()
+        fake_db_client.replay_records.side_effect = replay_records
+        fake_db_client.get_currency_statistics.return_value = None
+        statistics_handler = StatisticsHandler(window=5)
+
+        result = self.spool_handler.drain(fake_db_client, batch_size=2, statistics_handler=statistics_handler)
+
+        self.assertEqual(result, 4)
+        rollup = statistics_handler._rollups[('A', 'USD')]
+        self.assertEqual(rollup['count'], 2)
+        self.assertEqual(rollup['sma'], 15)
+
+    def test_drain_db_is_not_reachable(self):
+        for resource_name in ('A', 'B', 'C'):
+            self.spool_handler.append({'resource_name': resource_name, 'provider_ts': 1})
+        fake_db_client = Mock()
+        fake_db_client.replay_records.side_effect = [[], DataBaseIsNotReachable]
+
+        result = self.spool_handler.drain(fake_db_client, batch_size=2)
+        self.assertEqual(result, 2)
+
+        # only not replayed payloads are left in spool
+        fake_db_client.replay_records.side_effect = None
+        result = self.spool_handler.drain(fake_db_client)
+        self.assertEqual(result, 1)
+        replayed = fake_db_client.replay_records.call_args[0][0]
+        self.assertEqual([payload['resource_name'] for payload in replayed], ['C'])
+
+    def test_start_drainer(self):
+        self.spool_handler.append({'resource_name': 'A', 'provider_ts': 1})
+        fake_db_client = Mock()
+        fake_db_client.replay_records.side_effect = lambda payloads: payloads
+        fake_statistics_handler = Mock()
+
+        self.spool_handler.start_drainer(fake_db_client, fake_statistics_handler)
+        self.spool_handler.wait_drainer()
+
+        fake_db_client.replay_records.assert_called_once()
+        # statistics are updated by replayed payloads
+        fake_statistics_handler.update_replayed.assert_called_once_with(
+            fake_db_client, fake_db_client.replay_records.call_args[0][0]
+        )
+        self.assertFalse(self.spool_handler.has_pending())
+
+    def test_drain_legacy_payloads(self):
+        self.spool_handler.append({'resource_name': 'A', 'currencies': {'USD': (1, 2)}})
+        self.spool_handler.append({'resource_name': 'B', 'provider_ts': 1})
+        self.assertTrue(self.spool_handler.has_pending())
+        fake_db_client = Mock()
+
+        result = self.spool_handler.drain(fake_db_client)
+
+        self.assertEqual(result, 1)
+        replayed = fake_db_client.replay_records.call_args[0][0]
+        self.assertEqual([payload['resource_name'] for payload in replayed], ['B'])
+        with open(f'{self.spool_path}.legacy') as legacy_file:
+            self.assertIn('"resource_name": "A"', legacy_file.read())
+        self.assertFalse(self.spool_handler.has_pending())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import random
+import statistics
+import unittest
+from unittest.mock import Mock
+
+from app.utils.handlers.statistics_handler import StatisticsHandler, RollingWindow
+from app.utils.custom_exceptions import DataBaseIsNotReachable
+
+
+class TestRollingWindow(unittest.TestCase):
+    def test_append(self):
+        values = [random.uniform(20, 40) for _ in range(100)]
+        window = RollingWindow(7)
+        for index, value in enumerate(values):
+            window.append(value)
+            window_values = values[max(0, index - 6):index + 1]
+            self.assertEqual(list(window.values), window_values)
+            self.assertAlmostEqual(window.mean, statistics.mean(window_values))
+            self.assertEqual(window.minimum, min(window_values))
+            self.assertEqual(window.maximum, max(window_values))
+            if len(window_values) > 1:
+                self.assertAlmostEqual(window.volatility, statistics.stdev(window_values))
+
+    def test_init_by_values(self):
+        window = RollingWindow(2, [1.0, 2.0, 3.0])
+
+        self.assertEqual(list(window.values), [2.0, 3.0])
+        self.assertEqual(window.minimum, 2.0)
+
+
+class TestStatisticsHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.statistics_handler = StatisticsHandler(window=3, ema_alpha=0.5)
+        self.fake_db_client = Mock()
+        self.fake_db_client.get_currency_statistics.return_value = None
+
+    def test_update(self):
+        values = [27.0, 27.5, 26.0, 28.0, 27.25]
+        for ts, value in enumerate(values):
+            self.statistics_handler.update(self.fake_db_client, 'A', {'USD': (value, value)}, ts)
+
+        rollup = self.fake_db_client.upsert_currency_statistics.call_args[0][0][0]
+        self.assertEqual(rollup['_id'], 'A:USD')
+        self.assertEqual(rollup['count'], 5)
+        # min, max and volatility are calculated over window, not over all rates
+        self.assertAlmostEqual(rollup['volatility'], statistics.stdev(values[-3:]))
+        self.assertEqual(rollup['min'], 26.0)
+        self.assertEqual(rollup['max'], 28.0)
+        self.assertAlmostEqual(rollup['sma'], statistics.mean(values[-3:]))
+        self.assertAlmostEqual(rollup['ema'], 27.28125)
+        self.assertEqual(rollup['window_values'], values[-3:])
+        # statistics of previous runs are read from DB only once
+        self.fake_db_client.get_currency_statistics.assert_called_once_with('A', 'USD')
+
+    def test_update_same_rates_counted_once(self):
+        self.statistics_handler.update(self.fake_db_client, 'A', {'USD': (27, 27)}, 1)
+        result = self.statistics_handler.update(self.fake_db_client, 'A', {'USD': (27, 27), 'EUR': (None, None)}, 1)
+
+        self.assertEqual(result, [])
+        self.fake_db_client.upsert_currency_statistics.assert_called_once()
+
+    def test_update_continues_statistics_from_db(self):
+        stored_rollup = StatisticsHandler._create_rollup('A', 'USD')
+        StatisticsHandler(window=3).update_rollup(stored_rollup, 10.0, 1)
+        self.fake_db_client.get_currency_statistics.return_value = stored_rollup
+
+        result = self.statistics_handler.update(self.fake_db_client, 'A', {'USD': (20, 20)}, 2)
+
+        self.assertEqual(result[0]['count'], 2)
+        self.assertEqual(result[0]['sma'], 15.0)
+        self.assertEqual(result[0]['min'], 10.0)
+
+    def test_update_replayed(self):
+        self.statistics_handler.update(self.fake_db_client, 'A', {'USD': (20, 20)}, 2)
+        self.statistics_handler.update_replayed(self.fake_db_client, [
+            {'resource_name': 'A', 'provider_ts': 1, 'currencies': {'USD': [10, 10]}},
+        ])
+
+        rollup = self.fake_db_client.upsert_currency_statistics.call_args[0][0][0]
+        # replayed rates are older than already counted ones, but they were not counted yet
+        self.assertEqual(rollup['count'], 2)
+        self.assertEqual(rollup['last_ts'], 2)
+        self.assertEqual(rollup['window_values'], [10, 20])
+        self.assertEqual(rollup['ema'], 20)
+
+        self.fake_db_client.upsert_currency_statistics.side_effect = DataBaseIsNotReachable
+        self.statistics_handler.update_replayed(self.fake_db_client, [
+            {'resource_name': 'A', 'provider_ts': 0, 'currencies': {'USD': [10, 10]}},
+        ])
+
+    def test_update_replayed_duplicates(self):
+        self.statistics_handler.update(self.fake_db_client, 'A', {'USD': (30, 30)}, 3)
+        self.statistics_handler.update_replayed(self.fake_db_client, [
+            {'resource_name': 'A', 'provider_ts': 2, 'currencies': {'USD': [20, 20]}},
+            {'resource_name': 'A', 'provider_ts': 1, 'currencies': {'USD': [10, 10]}},
+            {'resource_name': 'A', 'provider_ts': 2, 'currencies': {'USD': [20, 20]}},
+            {'resource_name': 'A', 'provider_ts': 3, 'currencies': {'USD': [30, 30]}},
+        ])
+
+        rollup = self.statistics_handler._rollups[('A', 'USD')]
+        self.assertEqual(rollup['count'], 3)
+        self.assertEqual(rollup['window_values'], [10, 20, 30])
+        self.assertEqual(rollup['window_ts'], [1, 2, 3])
+        self.assertEqual(rollup['sma'], 20)
+        self.assertAlmostEqual(rollup['volatility'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
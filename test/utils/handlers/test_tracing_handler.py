@@ -0,0 +1,84 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.utils.handlers import tracing_handler
+from app.utils.handlers.tracing_handler import TracingHandler, STATUS_CODE_ERROR
+
+
+HANDLER_PATH = 'app.utils.handlers.tracing_handler'
+
+
+class TestTracingHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.traces_path = os.path.join(self.temp_dir.name, 'traces.jsonl')
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _read_spans(self) -> list:
+        spans = []
+        with open(self.traces_path, encoding='utf-8') as traces_file:
+            for line in traces_file:
+                for resource_spans in json.loads(line)['resourceSpans']:
+                    for scope_spans in resource_spans['scopeSpans']:
+                        spans.extend(scope_spans['spans'])
+        return spans
+
+    def test_span_is_noop_without_tracer(self):
+        with patch(f'{HANDLER_PATH}.TRACER', None):
+            with tracing_handler.span('test', resource_name='resource1') as span:
+                self.assertIsNone(span)
+
+    def test_nested_spans_are_exported(self):
+        tracer = TracingHandler(path=self.traces_path)
+        with tracer.span('cycle'):
+            with tracer.span('process_resource', resource_name='resource1'):
+                with tracer.span('GET', tracing_handler.SPAN_KIND_CLIENT, **{'url.full': 'http://test'}) as span:
+                    span.set_attribute('http.response.status_code', 200)
+        tracer.flush()
+
+        get_span, resource_span, cycle_span = self._read_spans()
+        self.assertEqual(cycle_span['parentSpanId'], '')
+        self.assertEqual(resource_span['parentSpanId'], cycle_span['spanId'])
+        self.assertEqual(get_span['parentSpanId'], resource_span['spanId'])
+        self.assertEqual({get_span['traceId'], resource_span['traceId']}, {cycle_span['traceId']})
+        self.assertEqual(get_span['kind'], tracing_handler.SPAN_KIND_CLIENT)
+        self.assertEqual(get_span['attributes'], [
+            {'key': 'url.full', 'value': {'stringValue': 'http://test'}},
+            {'key': 'resource_name', 'value': {'stringValue': 'resource1'}},
+            {'key': 'http.response.status_code', 'value': {'intValue': '200'}},
+        ])
+        self.assertLessEqual(int(get_span['startTimeUnixNano']), int(get_span['endTimeUnixNano']))
+
+    def test_error_status(self):
+        tracer = TracingHandler(path=self.traces_path)
+        with self.assertRaises(ValueError):
+            with tracer.span('test'):
+                raise ValueError('bad value')
+        tracer.flush()
+
+        span, = self._read_spans()
+        self.assertEqual(span['status'], {'code': STATUS_CODE_ERROR, 'message': 'ValueError: bad value'})
+
+    @patch('requests.post')
+    def test_batch_export_to_collector(self, patched_post):
+        tracer = TracingHandler(collector_url='http://collector:4318/', batch_size=2)
+        with tracer.span('first'):
+            pass
+        patched_post.assert_not_called()
+        with tracer.span('second'):
+            pass
+
+        patched_post.assert_called_once()
+        self.assertEqual(patched_post.call_args[0][0], 'http://collector:4318/v1/traces')
+        export_request = json.loads(patched_post.call_args[1]['data'])
+        spans = export_request['resourceSpans'][0]['scopeSpans'][0]['spans']
+        self.assertEqual([span['name'] for span in spans], ['first', 'second'])
+
+
+if __name__ == '__main__':
+    unittest.main()
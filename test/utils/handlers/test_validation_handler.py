@@ -0,0 +1,74 @@
+import unittest
+
+from app.utils.rate_records import RateTable
+from app.utils.handlers.validation_handler import ValidationHandler
+
+
+class TestValidationHandler(unittest.TestCase):
+    def test_validate(self):
+        validation_handler = ValidationHandler(ranges={'USD': [10, 200]})
+
+        valid_currencies, quarantine_payload = validation_handler.validate('resource1', RateTable({
+            'USD': (38.5, 38.0),
+            'EUR': (41.0, None),
+            'GBP': (48.0, 49.0),
+            'PLN': (9.5, 9.4),
+            'JPY': (0.27, 0.26),
+        }), 1)
+
+        self.assertEqual(valid_currencies, {'PLN': (9.5, 9.4), 'USD': (38.5, 38.0), 'JPY': (0.27, 0.26)})
+        self.assertEqual(quarantine_payload['resource_name'], 'resource1')
+        self.assertEqual(quarantine_payload['provider_ts'], 1)
+        self.assertEqual(quarantine_payload['currencies'], {
+            'EUR': {'rates': (41.0, None), 'reasons': ['missing']},
+            'GBP': {'rates': (48.0, 49.0), 'reasons': ['sale_below_purchase']},
+        })
+
+    def test_validate_out_of_range(self):
+        validation_handler = ValidationHandler(ranges={'USD': [10, 200]})
+
+        valid_currencies, quarantine_payload = validation_handler.validate('resource1', {
+            'USD': (3850.0, 3800.0), 'EUR': (-1.0, -1.0),
+        }, 1)
+
+        self.assertEqual(valid_currencies, {})
+        self.assertEqual(quarantine_payload['currencies']['USD']['reasons'], ['out_of_range'])
+        self.assertEqual(quarantine_payload['currencies']['EUR']['reasons'], ['out_of_range'])
+
+    def test_validate_all_valid(self):
+        validation_handler = ValidationHandler()
+        currencies = RateTable({'USD': (38.5, 38.0)})
+
+        valid_currencies, quarantine_payload = validation_handler.validate('resource1', currencies, 1)
+
+        self.assertIs(valid_currencies, currencies)
+        self.assertIsNone(quarantine_payload)
+
+    def test_validate_jump(self):
+        validation_handler = ValidationHandler(max_jump=0.2)
+        validation_handler.validate('resource1', {'USD': (38.0, 38.0)}, 1)
+
+        # jump is checked per resource
+        self.assertIsNone(validation_handler.validate('resource2', {'USD': (60.0, 60.0)}, 2)[1])
+        self.assertEqual(
+            validation_handler.validate('resource1', {'USD': (60.0, 60.0)}, 2)[1]['currencies']['USD']['reasons'],
+            ['jump'],
+        )
+        self.assertIsNone(validation_handler.validate('resource1', {'USD': (40.0, 40.0)}, 3)[1])
+        self.assertIsNotNone(validation_handler.validate('resource1', {'USD': (60.0, 60.0)}, 4)[1])
+        # the next rate confirms jump
+        self.assertEqual(
+            validation_handler.validate('resource1', {'USD': (61.0, 61.0)}, 5), ({'USD': (61.0, 61.0)}, None)
+        )
+
+    def test_jump_after_restored_last_rates(self):
+        validation_handler = ValidationHandler(max_jump=0.2)
+        validation_handler.restore_last_rates('resource1', {'USD': (38.5, 37.5), 'EUR': (None, 41.0)})
+
+        quarantine_payload = validation_handler.validate('resource1', {'USD': (60.0, 60.0), 'EUR': (60.0, 60.0)}, 1)[1]
+
+        self.assertEqual(list(quarantine_payload['currencies']), ['USD'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import time
+import unittest
+from unittest.mock import Mock
+
+from app.utils.handlers.work_distribution_handler import WorkDistributionHandler
+from app.utils.custom_exceptions import ConfigFieldHasIncorrectValue
+
+
+class TestWorkDistributionHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.resources = tuple(f'resource{index}' for index in range(50))
+
+    def test_init_unknown_mode(self):
+        with self.assertRaises(ConfigFieldHasIncorrectValue):
+            WorkDistributionHandler(mode='fake')
+
+    def test_get_resources_to_process_none_mode(self):
+        handler = WorkDistributionHandler()
+        self.assertEqual(handler.get_resources_to_process(self.resources), self.resources)
+
+    def test_get_resources_to_process_hash_mode(self):
+        handlers = [WorkDistributionHandler(mode='hash', worker_index=index, workers_count=3) for index in range(3)]
+        results = [handler.get_resources_to_process(self.resources) for handler in handlers]
+
+        # every resource is processed exactly once
+        self.assertEqual(sorted(sum(results, ())), sorted(self.resources))
+        self.assertTrue(all(results))
+
+    def test_get_resources_to_process_hash_mode_stable_after_adding_worker(self):
+        handler_2_workers = WorkDistributionHandler(mode='hash', worker_index=0, workers_count=2)
+        handler_3_workers = WorkDistributionHandler(mode='hash', worker_index=0, workers_count=3)
+
+        resources_2_workers = set(handler_2_workers.get_resources_to_process(self.resources))
+        resources_3_workers = set(handler_3_workers.get_resources_to_process(self.resources))
+
+        self.assertTrue(resources_3_workers.issubset(resources_2_workers))
+
+    def test_get_resources_to_process_lease_mode(self):
+        fake_db_client = Mock()
+        fake_db_client.register_worker.return_value = 1
+        fake_db_client.acquire_lease.side_effect = lambda resource_name, worker_id, ttl_sec: resource_name != 'B'
+        handler = WorkDistributionHandler(mode='lease', db_client=fake_db_client, lease_ttl_sec=30, worker_id='w1')
+
+        result = handler.get_resources_to_process(('A', 'B', 'C'))
+        handler.release()
+
+        self.assertEqual(result, ('A', 'C'))
+        self.assertEqual(fake_db_client.acquire_lease.call_count, 3)
+        fake_db_client.release_leases.assert_called_once_with(('A', 'C'), 'w1')
+        self.assertEqual(handler.leased_resources, ())
+
+    def test_lease_mode_share_of_live_workers(self):
+        fake_db_client = Mock()
+        fake_db_client.register_worker.return_value = 3
+        fake_db_client.acquire_lease.return_value = True
+        handlers = [
+            WorkDistributionHandler(mode='lease', db_client=fake_db_client, worker_id=f'w{index}') for index in range(3)
+        ]
+
+        results = [handler.get_resources_to_process(self.resources) for handler in handlers]
+        for handler in handlers:
+            handler.release()
+
+        self.assertTrue(all(len(result) == 17 for result in results))
+        # workers start leasing from different resources
+        self.assertGreater(len(set(sum(results, ()))), 17)
+
+    def test_leases_are_renewed_while_processing(self):
+        fake_db_client = Mock()
+        fake_db_client.register_worker.return_value = 1
+        fake_db_client.acquire_lease.return_value = True
+        fake_db_client.renew_leases.return_value = 1
+        handler = WorkDistributionHandler(mode='lease', db_client=fake_db_client, lease_ttl_sec=0.03, worker_id='w1')
+
+        handler.get_resources_to_process(('A',))
+        time.sleep(0.1)
+        handler.release()
+
+        fake_db_client.renew_leases.assert_called_with(('A',), 'w1', 0.03)
+        renewals_quantity = fake_db_client.renew_leases.call_count
+        time.sleep(0.05)
+        self.assertEqual(fake_db_client.renew_leases.call_count, renewals_quantity)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import decimal
+import unittest
+
+from app.utils.rate_math import RatePrecision, rebase_rates, cross_rates
+
+
+class TestRateMath(unittest.TestCase):
+    def test_rebase_rates(self):
+        rates = rebase_rates('USD', 41.5, {'USD': 1, 'UAH': 41.5, 'JPY': 150.0})
+
+        self.assertEqual(rates, {'USD': 41.5, 'UAH': 1.0, 'JPY': 41.5 / 150.0})
+        # full precision is kept, rounding to 4 places would make it 0.2767
+        self.assertEqual(rates['JPY'], 0.27666666666666667)
+
+    def test_cross_rates(self):
+        rates = cross_rates({'USD': (40.0, 39.0), 'EUR': (44.0, None), 'UAH': (1.0, 1.0)}, 'USD')
+
+        self.assertEqual(rates, {'EUR': (44.0 / 39.0, None), 'UAH': (1.0 / 39.0, 1.0 / 40.0)})
+
+    def test_rate_precision(self):
+        rate_precision = RatePrecision(default=2, currencies={'JPY': 4})
+
+        self.assertEqual(rate_precision.get('USD'), 2)
+        self.assertEqual(rate_precision.get('JPY'), 4)
+        self.assertEqual(rate_precision.quantize('USD', 41.5), decimal.Decimal('41.50'))
+        self.assertEqual(rate_precision.quantize('JPY', 0.27666666666666667), decimal.Decimal('0.2767'))
+        self.assertIsNone(rate_precision.quantize('USD', None))
+
+    def test_rate_precision_format(self):
+        rate_precision = RatePrecision()
+
+        # float rounding gives "2.67", since 2.675 is 2.67499999... in binary
+        self.assertEqual(f'{2.675:.2f}', '2.67')
+        self.assertEqual(rate_precision.format('USD', 2.675), '2.68')
+        self.assertEqual(rate_precision.format('USD', 38), '38.00')
+        self.assertEqual(rate_precision.format('USD', None), 'n/a')
+
+
+if __name__ == '__main__':
+    unittest.main()
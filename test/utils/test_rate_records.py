@@ -0,0 +1,81 @@
+import sys
+import pickle
+import unittest
+from collections import deque
+
+from app.utils.rate_records import RateTable, RateRecord, RateHistory, to_document, select_currencies
+
+
+class TestRateRecords(unittest.TestCase):
+    def test_rate_table(self):
+        rate_table = RateTable({'USD': (27.5, 27.1), 'EUR': (30.2, None)})
+
+        self.assertEqual(rate_table, {'USD': (27.5, 27.1), 'EUR': (30.2, None)})
+        self.assertEqual(rate_table['EUR'], (30.2, None))
+        self.assertEqual(list(rate_table.items()), [('USD', (27.5, 27.1)), ('EUR', (30.2, None))])
+        self.assertNotIn('GBP', rate_table)
+        self.assertEqual(len(rate_table), 2)
+        self.assertEqual(pickle.loads(pickle.dumps(rate_table)), rate_table)
+
+    def test_rate_table_iter_rates(self):
+        rates = list(RateTable({'USD': (27.5, 27.1), 'EUR': (30.2, None)}).iter_rates())
+
+        self.assertEqual(rates[0], ('USD', 27.5, 27.1))
+        self.assertEqual(rates[1][:2], ('EUR', 30.2))
+        self.assertNotEqual(rates[1][2], rates[1][2])
+
+    def test_rate_tables_share_currencies_index(self):
+        currencies = {f'X{index:04d}': (index + 0.5, index + 0.1) for index in range(1000)}
+        first_table, second_table = RateTable(currencies), RateTable(currencies)
+
+        self.assertIs(first_table._index, second_table._index)
+        # the same rates in dict of tuples take about 100 bytes per currency
+        self.assertLess(second_table.memory_size(), len(currencies) * 20)
+
+    def test_select_currencies(self):
+        rate_table = select_currencies({'USD': (27.5, 27.1), 'EUR': (30.2, None), 'PLN': (7.1, 7.0)}, ('PLN', 'USD'))
+
+        self.assertIsInstance(rate_table, RateTable)
+        self.assertEqual(rate_table, {'USD': (27.5, 27.1), 'PLN': (7.1, 7.0)})
+
+    def test_rate_record(self):
+        record = RateRecord(1.5, 0, 1, 'resource1', {'USD': (27.5, 27.1)})
+
+        expected = {
+            'utc_time': 1.5,
+            'utc_offset': 0,
+            'provider_ts': 1,
+            'resource_name': 'resource1',
+            'currencies': {'USD': (27.5, 27.1)},
+        }
+        self.assertEqual(to_document(record), expected)
+        self.assertEqual(to_document(expected), expected)
+        with self.assertRaises(AttributeError):
+            record.extra_field = 1
+
+    def test_rate_history_is_the_same_as_deque(self):
+        history, expected_history = RateHistory(maxlen=100), deque(maxlen=100)
+        for ts in range(250):
+            history.append((ts, ts / 2))
+            expected_history.append((ts, ts / 2))
+            if ts % 3 == 0:
+                self.assertEqual(history.popleft(), expected_history.popleft())
+
+        self.assertEqual(list(history), list(expected_history))
+        self.assertEqual(history[0], expected_history[0])
+        self.assertEqual(history[-1], expected_history[-1])
+        self.assertEqual(len(history), len(expected_history))
+        with self.assertRaises(IndexError):
+            history[len(history)]
+
+    def test_rate_history_memory(self):
+        history = RateHistory(maxlen=100000)
+        for ts in range(100000):
+            history.append((ts, 27.5))
+
+        memory_size = sys.getsizeof(history._timestamps) + sys.getsizeof(history._rates)
+        self.assertLess(memory_size / len(history), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+import unittest
+import threading
+
+import requests
+
+from app.utils.stand_in_server import StandInServer
+
+
+class TestStandInServer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        record_dir = os.path.join(self.temp_dir, 'v6__latest')
+        os.makedirs(record_dir)
+        with open(os.path.join(record_dir, '1.json'), 'w') as record_file:
+            json.dump({
+                'url': 'https://open.exchangerate-api.com/v6/latest',
+                'status_code': 200,
+                'content_type': 'application/json',
+                'body': json.dumps({'result': 'success', 'rates': {'USD': 1, 'UAH': 27.5}}),
+            }, record_file)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+    def _run_server(self, server: StandInServer) -> tuple:
+        loop = asyncio.new_event_loop()
+        port = loop.run_until_complete(server.start(port=0))
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        return loop, port
+
+    def _stop_server(self, server: StandInServer, loop) -> None:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    def test_replay(self):
+        server = StandInServer(self.temp_dir, extra_rates=10)
+        loop, port = self._run_server(server)
+        try:
+            with requests.Session() as session:
+                response = session.get(f'http://127.0.0.1:{port}/v6/latest')
+                prefixed_response = session.get(f'http://127.0.0.1:{port}/simulated/1/v6/latest?key=1')
+                not_found_response = session.get(f'http://127.0.0.1:{port}/fake')
+        finally:
+            self._stop_server(server, loop)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['rates']), 12)
+        self.assertEqual(prefixed_response.json(), response.json())
+        self.assertEqual(not_found_response.status_code, 404)
+
+    def test_replay_errors(self):
+        server = StandInServer(self.temp_dir, error_rate=1)
+        loop, port = self._run_server(server)
+        try:
+            response = requests.get(f'http://127.0.0.1:{port}/v6/latest')
+        finally:
+            self._stop_server(server, loop)
+
+        self.assertEqual(response.status_code, 503)
+
+
+if __name__ == '__main__':
+    unittest.main()